@@ -0,0 +1,324 @@
+﻿from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+# Permite ejecutar este script desde el repo sin instalar el paquete.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from langchain_lean.core.encoding import encode_result
+from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
+from langchain_lean.core.parser import parse_lean_json_output, parse_lean_output
+
+DEFAULT_LAKE_LATENCY = 0.005
+DEFAULT_SIZES = [1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+_GOAL_BLOCK = (
+    "check.lean:{line}:14: error: unsolved goals\n"
+    "case succ\n"
+    "n : Nat\n"
+    "ih : n + 0 = n\n"
+    "⊢ n + 1 + 0 = n + 1\n"
+    "\n"
+)
+_GOAL_MESSAGE = "unsolved goals\ncase succ\nn : Nat\nih : n + 0 = n\n⊢ n + 1 + 0 = n + 1"
+
+
+def generate_text_output(size: int) -> str:
+    """Salida textual de Lean de ~`size` bytes con un bloque de metas cada pocas líneas."""
+    blocks: list[str] = []
+    total = 0
+    line = 1
+    while total < size:
+        block = _GOAL_BLOCK.format(line=line)
+        blocks.append(block)
+        total += len(block.encode("utf-8"))
+        line += 3
+    return "".join(blocks)
+
+
+def generate_json_output(size: int) -> str:
+    """Equivalente de `generate_text_output` en formato `lean --json`."""
+    lines: list[str] = []
+    total = 0
+    line = 1
+    while total < size:
+        message = json.dumps(
+            {
+                "severity": "error",
+                "pos": {"line": line, "column": 14},
+                "endPos": {"line": line, "column": 20},
+                "fileName": "check.lean",
+                "data": _GOAL_MESSAGE,
+            },
+            ensure_ascii=False,
+        )
+        lines.append(message)
+        total += len(message.encode("utf-8")) + 1
+        line += 3
+    return "\n".join(lines) + "\n"
+
+
+def bench_parser(sizes: list[int], repeat: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for size in sizes:
+        for mode, generate, parse in (
+            ("text", generate_text_output, parse_lean_output),
+            ("json", generate_json_output, parse_lean_json_output),
+        ):
+            raw = generate(size)
+            timings = _measure(lambda: parse(raw, 1), repeat)
+            best = min(timings)
+            results[f"parser.{mode}.{size}"] = {
+                "bytes": len(raw.encode("utf-8")),
+                "best_s": best,
+                "mean_s": statistics.fmean(timings),
+                "mb_per_s": (len(raw.encode("utf-8")) / (1024 * 1024)) / best if best > 0 else None,
+            }
+    return results
+
+
+def bench_models(goal_counts: list[int], iterations: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for count in goal_counts:
+        goals = [{"context": ["n : Nat", "ih : n + 0 = n"], "goal": f"n + {idx} = n"} for idx in range(count)]
+        errors = [f"unsolved goals {idx}" for idx in range(count)]
+
+        def _build() -> LeanExecutionResult:
+            return LeanExecutionResult(success=False, goals=goals, errors=errors, raw_output="x" * 1024)
+
+        result = _build()
+        results[f"model.construct.{count}"] = _per_call(_measure(_build, iterations), iterations)
+        results[f"model.dump.{count}"] = _per_call(_measure(result.model_dump, iterations), iterations)
+        results[f"model.json.{count}"] = _per_call(
+            _measure(lambda: json.dumps(result.model_dump(), ensure_ascii=False), iterations), iterations
+        )
+        results[f"model.compact.{count}"] = _per_call(
+            _measure(lambda: encode_result(result, compact=True), iterations), iterations
+        )
+    return results
+
+
+class FakeEnvironmentManager:
+    """`LeanEnvironmentManager` en proceso: devuelve una salida fija tras `latency` segundos."""
+
+    def __init__(self, workspace: str, output: str, exit_code: int = 1, latency: float = 0.0):
+        self.workspace = workspace
+        self.cache_path = workspace
+        self.output = output
+        self.exit_code = exit_code
+        self.latency = latency
+
+    def get_workspace_abs_path(self) -> str:
+        return self.workspace
+
+    def get_runtime_image_id(self) -> str:
+        return "benchmark"
+
+    def read_lake_manifest(self) -> str:
+        return ""
+
+    def run_command_in_container(self, command, timeout=180, handle=None, on_output=None, max_output_bytes=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if on_output is not None:
+            on_output(self.output)
+        return self.exit_code, self.output
+
+
+def bench_evaluator(evaluations: int, latency: float, output_size: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    output = generate_text_output(output_size)
+    code = "theorem t (n : Nat) : n + 0 = n := by\n  induction n\n"
+    with tempfile.TemporaryDirectory() as workspace:
+        for label, kwargs in (("plain", {}), ("streaming", {"streaming": True}), ("cached", {"use_cache": True})):
+            manager = FakeEnvironmentManager(workspace, output, latency=latency)
+            evaluator = LeanEvaluator(environment_manager=manager, **kwargs)
+            latencies = []
+            for _ in range(evaluations):
+                start = time.perf_counter()
+                evaluator.evaluate_code(code)
+                latencies.append(time.perf_counter() - start)
+            results[f"evaluator.{label}"] = _percentiles(latencies)
+    return results
+
+
+class FakeLakeEnvironmentManager(FakeEnvironmentManager):
+    """Modela el arranque de lake: cada comando que invoca `lake env` tarda `lake_latency` más.
+
+    `lean -o` crea el `.olean` pedido, como la compilación real de cabeceras.
+    """
+
+    def __init__(self, workspace: str, lake_latency: float, latency: float = 0.0):
+        super().__init__(workspace, "", exit_code=0, latency=latency)
+        self.lake_latency = lake_latency
+
+    def read_lean_toolchain(self) -> str:
+        return "benchmark"
+
+    def run_command_in_container(self, command, timeout=180, handle=None, on_output=None, max_output_bytes=None):
+        if "lake env" in command:
+            time.sleep(self.lake_latency)
+        if "printenv LEAN_PATH" in command:
+            return 0, "/benchmark/.lake/build/lib\n"
+        if " -o " in command:
+            output_path = command.split(" -o ", 1)[1].split()[0]
+            with open(os.path.join(self.workspace, output_path), "wb") as file:
+                file.write(b"olean")
+            return 0, ""
+        return super().run_command_in_container(command, timeout, handle, on_output, max_output_bytes)
+
+
+def bench_headers(evaluations: int, latency: float, lake_latency: float) -> dict[str, Any]:
+    """Snippets con imports, con y sin `HeaderEnvironmentCache`.
+
+    Ambos modos pagan la misma latencia de `lean`; sin cabecera precompilada cada
+    evaluación arranca `lake env`, con ella lake solo corre al compilar la cabecera y al
+    calcular `LEAN_PATH` la primera vez.
+    """
+    results: dict[str, Any] = {}
+    code = "import Mathlib.Tactic\n\ntheorem t (n : Nat) : n + 0 = n := by\n  simp\n"
+    for label, kwargs in (("no_header", {}), ("header", {"use_header_cache": True})):
+        with tempfile.TemporaryDirectory() as workspace:
+            manager = FakeLakeEnvironmentManager(workspace, lake_latency, latency=latency)
+            evaluator = LeanEvaluator(environment_manager=manager, **kwargs)
+            latencies = []
+            for _ in range(evaluations):
+                start = time.perf_counter()
+                evaluator.evaluate_code(code)
+                latencies.append(time.perf_counter() - start)
+            results[f"headers.{label}"] = _percentiles(latencies)
+    return results
+
+
+def run_all(
+    sizes: list[int] | None = None,
+    repeat: int = 3,
+    model_iterations: int = 2000,
+    evaluations: int = 200,
+    latency: float = 0.0,
+    lake_latency: float = DEFAULT_LAKE_LATENCY,
+) -> dict[str, Any]:
+    """Corre todos los benchmarks y devuelve `{"meta": ..., "metrics": ...}`."""
+    metrics: dict[str, Any] = {}
+    metrics.update(bench_parser(sizes or DEFAULT_SIZES, repeat))
+    metrics.update(bench_models([1, 10, 100], model_iterations))
+    metrics.update(bench_evaluator(evaluations, latency, output_size=16 * 1024))
+    metrics.update(bench_headers(evaluations, latency, lake_latency))
+    return {"meta": _metadata(), "metrics": metrics}
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Métricas cuyo tiempo empeoró más de `threshold` veces respecto a `baseline`."""
+    regressions = []
+    for name, values in current["metrics"].items():
+        previous = baseline.get("metrics", {}).get(name)
+        if not previous:
+            continue
+        for field in ("best_s", "per_call_s", "p50_s"):
+            if field in values and previous.get(field):
+                ratio = values[field] / previous[field]
+                if ratio > threshold:
+                    regressions.append(f"{name}.{field}: {previous[field]:.6f}s -> {values[field]:.6f}s (x{ratio:.2f})")
+    return regressions
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _per_call(timings: list[float], iterations: int) -> dict[str, float]:
+    # `_measure` con `repeat=iterations` mide llamadas individuales.
+    return {"per_call_s": statistics.fmean(timings), "total_s": sum(timings), "calls": iterations}
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+
+    def _at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50_s": _at(0.50),
+        "p90_s": _at(0.90),
+        "p99_s": _at(0.99),
+        "max_s": ordered[-1],
+    }
+
+
+def _metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks de parser y pipeline de evaluación.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="Tamaños de salida (bytes).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por tamaño del parser.")
+    parser.add_argument("--model-iterations", type=int, default=2000, help="Iteraciones por benchmark de modelos.")
+    parser.add_argument("--evaluations", type=int, default=200, help="Evaluaciones end-to-end por modo.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada del contenedor (s).")
+    parser.add_argument(
+        "--lake-latency", type=float, default=DEFAULT_LAKE_LATENCY, help="Coste simulado de arrancar `lake env` (s)."
+    )
+    parser.add_argument("--output", help="Ruta del JSON de resultados (por defecto benchmarks/results/).")
+    parser.add_argument("--baseline", help="JSON previo contra el que comparar.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Factor de empeoramiento tolerado.")
+    args = parser.parse_args()
+
+    report = run_all(args.sizes, args.repeat, args.model_iterations, args.evaluations, args.latency, args.lake_latency)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"bench_{stamp}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Resultados guardados en {output}")
+
+    for name, values in report["metrics"].items():
+        print(f"{name}: {json.dumps(values)}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("\nRegresiones detectadas:")
+            for line in regressions:
+                print(f"- {line}")
+            sys.exit(1)
+        print("\nSin regresiones respecto al baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,31 @@
-﻿from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
-from langchain_lean.core.environment import LeanEnvironmentManager
-from langchain_lean.toolkit import LeanToolkit, create_lean_tools
-from langchain_lean.tools.repl_tool import LeanREPLTool
-from langchain_lean.tools.run_tool import LeanRunTool
-from langchain_lean.tools.search_tool import LeanSearchTool
-from langchain_lean.tools.state_tool import LeanStateTool
+﻿from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from langchain_lean._lazy import lazy_module_attributes
+
+if TYPE_CHECKING:
+    from langchain_lean.core.environment import LeanEnvironmentManager
+    from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
+    from langchain_lean.toolkit import LeanToolkit, create_lean_tools
+    from langchain_lean.tools.repl_tool import LeanREPLTool
+    from langchain_lean.tools.run_tool import LeanRunTool
+    from langchain_lean.tools.search_tool import LeanSearchTool
+    from langchain_lean.tools.state_tool import LeanStateTool
+
+# Los exports se importan al primer acceso: `import langchain_lean` no carga docker ni
+# langchain hasta que se usa algo que los necesita.
+_LAZY_ATTRIBUTES = {
+    "LeanEnvironmentManager": "langchain_lean.core.environment",
+    "LeanEvaluator": "langchain_lean.core.evaluator",
+    "LeanExecutionResult": "langchain_lean.core.evaluator",
+    "LeanToolkit": "langchain_lean.toolkit",
+    "create_lean_tools": "langchain_lean.toolkit",
+    "LeanREPLTool": "langchain_lean.tools.repl_tool",
+    "LeanRunTool": "langchain_lean.tools.run_tool",
+    "LeanStateTool": "langchain_lean.tools.state_tool",
+    "LeanSearchTool": "langchain_lean.tools.search_tool",
+}
 
 __all__ = [
     "LeanEnvironmentManager",
@@ -17,3 +38,5 @@ __all__ = [
     "LeanStateTool",
     "LeanSearchTool",
 ]
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, _LAZY_ATTRIBUTES, globals())
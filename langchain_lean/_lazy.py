@@ -0,0 +1,27 @@
+﻿from __future__ import annotations
+
+import importlib
+from typing import Any, Callable
+
+
+def lazy_module_attributes(
+    package: str, attributes: dict[str, str], namespace: dict[str, Any]
+) -> tuple[Callable[[str], Any], Callable[[], list[str]]]:
+    """Crea `__getattr__`/`__dir__` de módulo que importan cada export en su primer acceso.
+
+    `attributes` mapea nombre público -> módulo que lo define. El valor importado se guarda
+    en `namespace` (los `globals()` del paquete), así que el coste se paga una sola vez.
+    """
+
+    def __getattr__(name: str) -> Any:
+        module_name = attributes.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name), name)
+        namespace[name] = value
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(namespace) | set(attributes))
+
+    return __getattr__, __dir__
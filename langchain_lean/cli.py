@@ -0,0 +1,160 @@
+﻿from __future__ import annotations
+
+import argparse
+import logging
+from typing import Sequence
+
+from langchain_lean.core.server import DEFAULT_HOST, DEFAULT_PORT
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="langchain-lean", description="Utilidades de langchain-lean.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Sirve un pool de evaluadores Lean compartido por HTTP.")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--workspace", default="./lean_workspace", help="Workspace Lean (lakefile).")
+    serve.add_argument("--cache-path", default=None, help="Caché persistente (por defecto ~/.cache/langchain-lean).")
+    serve.add_argument("--image", default="langchain-lean:lean4-v4.11.0")
+    serve.add_argument(
+        "--backend",
+        choices=("docker", "local"),
+        default=None,
+        help="Dónde ejecutar Lean (por defecto LANGCHAIN_LEAN_BACKEND o docker).",
+    )
+    serve.add_argument("--max-processes", type=int, default=None, help="Procesos Lean simultáneos (backend local).")
+    serve.add_argument("--pool-size", type=int, default=None, help="Contenedores del pool (por defecto según RAM).")
+    serve.add_argument("--no-pool", action="store_true", help="Usar contenedores efímeros en lugar del pool.")
+    serve.add_argument("--max-concurrency", type=int, default=None, help="Evaluaciones simultáneas.")
+    serve.add_argument("--no-cache", action="store_true", help="Desactivar la caché de resultados.")
+    serve.add_argument("--json-messages", action="store_true", help="Usar `lean --json`.")
+    serve.add_argument("--trace", default=None, help="Grabar cada evaluación en esta traza JSONL.")
+    serve.add_argument("--trace-hash-only", action="store_true", help="Grabar solo el sha256 del código.")
+
+    replay = commands.add_parser("replay", help="Reproduce una traza JSONL y reporta latencias y diferencias.")
+    replay.add_argument("trace", help="Traza grabada con `--trace` o generada con `seed-trace`.")
+    replay.add_argument("--url", default=None, help="Reproducir contra un servidor `langchain-lean serve`.")
+    replay.add_argument("--workspace", default="./lean_workspace", help="Workspace Lean (lakefile).")
+    replay.add_argument("--image", default="langchain-lean:lean4-v4.11.0")
+    replay.add_argument("--backend", choices=("docker", "local"), default=None)
+    replay.add_argument(
+        "--speed", type=float, default=1.0, help="1 = ritmo original, 10 = 10x más rápido, 0 = sin esperas."
+    )
+    replay.add_argument("--concurrency", type=int, default=4, help="Llamadas simultáneas.")
+    replay.add_argument("--cache", action="store_true", help="Usar la caché de resultados (por defecto desactivada).")
+    replay.add_argument(
+        "--search-backend", choices=("loogle", "local"), default=None, help="Reproducir también búsquedas."
+    )
+    replay.add_argument("--output", default=None, help="Guardar el reporte JSON en este archivo.")
+
+    seed = commands.add_parser("seed-trace", help="Genera una traza con los snippets Lean de ejemplos y documentos.")
+    seed.add_argument("paths", nargs="+", help="Archivos `.py`, Markdown o JSONL.")
+    seed.add_argument("--output", "-o", required=True)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "serve":
+        return _serve(args)
+    if args.command == "replay":
+        return _replay(args)
+    if args.command == "seed-trace":
+        return _seed_trace(args)
+    return 2
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from langchain_lean.core.environment import LeanEnvironmentManager
+    from langchain_lean.core.evaluator import LeanEvaluator
+    from langchain_lean.core.metrics import PrometheusMetrics
+    from langchain_lean.core.server import LeanEvaluationServer
+
+    env_manager = LeanEnvironmentManager(
+        image_name=args.image,
+        workspace_path=args.workspace,
+        cache_path=args.cache_path,
+        use_pool=not args.no_pool,
+        pool_size=args.pool_size,
+        backend=args.backend,
+        max_local_processes=args.max_processes,
+    )
+    env_manager.provision_environment()
+    metrics = PrometheusMetrics()
+    hooks = [metrics]
+    if args.trace:
+        from langchain_lean.core.traces import TraceRecorder
+
+        hooks.append(TraceRecorder(args.trace, include_code=not args.trace_hash_only))
+    evaluator = LeanEvaluator(
+        environment_manager=env_manager,
+        use_cache=not args.no_cache,
+        max_concurrency=args.max_concurrency,
+        json_messages=args.json_messages,
+        metrics_hooks=hooks,
+    )
+    server = LeanEvaluationServer(evaluator, host=args.host, port=args.port, metrics=metrics)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        env_manager.close()
+    return 0
+
+
+def _replay(args: argparse.Namespace) -> int:
+    import json
+
+    from langchain_lean.core.traces import TraceReplayer, load_trace
+
+    env_manager = None
+    if args.url:
+        from langchain_lean.core.remote import RemoteLeanEvaluator
+
+        evaluator = RemoteLeanEvaluator(args.url, max_connections=args.concurrency)
+    else:
+        from langchain_lean.core.environment import LeanEnvironmentManager
+        from langchain_lean.core.evaluator import LeanEvaluator
+
+        env_manager = LeanEnvironmentManager(
+            image_name=args.image, workspace_path=args.workspace, backend=args.backend
+        )
+        env_manager.provision_environment()
+        evaluator = LeanEvaluator(
+            environment_manager=env_manager, use_cache=args.cache, max_concurrency=args.concurrency
+        )
+
+    search_tool = None
+    if args.search_backend:
+        from langchain_lean.tools.search_tool import LeanSearchTool
+
+        search_tool = LeanSearchTool(backend=args.search_backend)
+
+    replayer = TraceReplayer(evaluator, search_tool=search_tool, speed=args.speed, concurrency=args.concurrency)
+    try:
+        report = replayer.replay(load_trace(args.trace))
+    finally:
+        if env_manager is not None:
+            env_manager.close()
+        else:
+            evaluator.close()
+
+    text = json.dumps(report.to_dict(), ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    return 0
+
+
+def _seed_trace(args: argparse.Namespace) -> int:
+    from langchain_lean.core.traces import seed_trace, write_trace
+
+    count = write_trace(seed_trace(args.paths), args.output)
+    print(f"{count} snippets escritos en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,108 @@
-﻿from langchain_lean.core.environment import LeanEnvironmentManager
-from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
-from langchain_lean.core.parser import LeanGoal, ParsedLeanOutput, parse_lean_output
+﻿from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from langchain_lean._lazy import lazy_module_attributes
+
+if TYPE_CHECKING:
+    from langchain_lean.core.backends import ExecutionBackend, LocalProcessBackend
+    from langchain_lean.core.cache import LeanResultCache
+    from langchain_lean.core.declarations import LeanDeclarationIndex
+    from langchain_lean.core.environment import LeanEnvironmentManager
+    from langchain_lean.core.evaluator import LeanDeclarationResult, LeanEvaluator, LeanExecutionResult
+    from langchain_lean.core.goals import CanonicalGoals, canonicalize_goals
+    from langchain_lean.core.handles import ExecutionHandle
+    from langchain_lean.core.headers import HeaderEnvironmentCache
+    from langchain_lean.core.metrics import EvaluationEvent, PrometheusMetrics
+    from langchain_lean.core.parser import (
+        IncrementalLeanParser,
+        LeanGoal,
+        LeanMessage,
+        ParsedLeanOutput,
+        parse_lean_json_output,
+        parse_lean_output,
+    )
+    from langchain_lean.core.pool import LeanContainerPool
+    from langchain_lean.core.proof_search import (
+        AlternativeResult,
+        BestFirstProofSearch,
+        ProofSearchResult,
+        evaluate_alternatives,
+    )
+    from langchain_lean.core.remote import RemoteLeanEvaluator
+    from langchain_lean.core.server import LeanEvaluationServer
+    from langchain_lean.core.tactic_memo import TacticOutcomeMemo
+    from langchain_lean.core.tiers import DEFAULT_TIERS, EvaluationTier
+    from langchain_lean.core.traces import TraceRecorder, TraceReplayer
+
+_LAZY_ATTRIBUTES = {
+    "AlternativeResult": "langchain_lean.core.proof_search",
+    "BestFirstProofSearch": "langchain_lean.core.proof_search",
+    "CanonicalGoals": "langchain_lean.core.goals",
+    "DEFAULT_TIERS": "langchain_lean.core.tiers",
+    "EvaluationEvent": "langchain_lean.core.metrics",
+    "EvaluationTier": "langchain_lean.core.tiers",
+    "ExecutionBackend": "langchain_lean.core.backends",
+    "ExecutionHandle": "langchain_lean.core.handles",
+    "HeaderEnvironmentCache": "langchain_lean.core.headers",
+    "IncrementalLeanParser": "langchain_lean.core.parser",
+    "LeanDeclarationIndex": "langchain_lean.core.declarations",
+    "LeanDeclarationResult": "langchain_lean.core.evaluator",
+    "LeanEnvironmentManager": "langchain_lean.core.environment",
+    "LeanEvaluationServer": "langchain_lean.core.server",
+    "LeanEvaluator": "langchain_lean.core.evaluator",
+    "LeanExecutionResult": "langchain_lean.core.evaluator",
+    "LeanContainerPool": "langchain_lean.core.pool",
+    "LeanResultCache": "langchain_lean.core.cache",
+    "LeanGoal": "langchain_lean.core.parser",
+    "LeanMessage": "langchain_lean.core.parser",
+    "LocalProcessBackend": "langchain_lean.core.backends",
+    "ParsedLeanOutput": "langchain_lean.core.parser",
+    "ProofSearchResult": "langchain_lean.core.proof_search",
+    "PrometheusMetrics": "langchain_lean.core.metrics",
+    "RemoteLeanEvaluator": "langchain_lean.core.remote",
+    "TacticOutcomeMemo": "langchain_lean.core.tactic_memo",
+    "TraceRecorder": "langchain_lean.core.traces",
+    "TraceReplayer": "langchain_lean.core.traces",
+    "canonicalize_goals": "langchain_lean.core.goals",
+    "evaluate_alternatives": "langchain_lean.core.proof_search",
+    "parse_lean_json_output": "langchain_lean.core.parser",
+    "parse_lean_output": "langchain_lean.core.parser",
+}
 
 __all__ = [
+    "AlternativeResult",
+    "BestFirstProofSearch",
+    "CanonicalGoals",
+    "DEFAULT_TIERS",
+    "EvaluationEvent",
+    "EvaluationTier",
+    "ExecutionBackend",
+    "ExecutionHandle",
+    "HeaderEnvironmentCache",
+    "IncrementalLeanParser",
+    "LeanDeclarationIndex",
+    "LeanDeclarationResult",
     "LeanEnvironmentManager",
+    "LeanEvaluationServer",
     "LeanEvaluator",
     "LeanExecutionResult",
+    "LeanContainerPool",
+    "LeanResultCache",
     "LeanGoal",
+    "LeanMessage",
+    "LocalProcessBackend",
     "ParsedLeanOutput",
+    "PrometheusMetrics",
+    "ProofSearchResult",
+    "RemoteLeanEvaluator",
+    "TacticOutcomeMemo",
+    "TraceRecorder",
+    "TraceReplayer",
+    "canonicalize_goals",
+    "evaluate_alternatives",
+    "parse_lean_json_output",
     "parse_lean_output",
 ]
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, _LAZY_ATTRIBUTES, globals())
@@ -0,0 +1,179 @@
+﻿from __future__ import annotations
+
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import Any, Protocol
+
+from langchain_lean.core.handles import CANCELLED_MESSAGE, record_since
+
+logger = logging.getLogger("langchain-lean-env")
+
+BACKEND_ENV_VAR = "LANGCHAIN_LEAN_BACKEND"
+LOCAL_ERROR_PREFIX = "Error de ejecución local:"
+
+_READ_CHUNK = 64 * 1024
+
+
+class ExecutionBackend(Protocol):
+    """Interfaz que `LeanEnvironmentManager` usa para ejecutar comandos de shell.
+
+    `run` devuelve `(exit_code, salida)`; `stream` entrega la salida a un `OutputCapture`
+    y devuelve el código de salida. En ambos casos `-1` indica timeout, cancelación o
+    fallo de infraestructura, y `1` que el consumidor pidió detenerse antes de tiempo.
+    """
+
+    def run(self, command: str, timeout: int = 180, handle: Any = None) -> tuple[int, str]: ...
+
+    def stream(self, command: str, capture: Any, timeout: int = 180, handle: Any = None) -> int: ...
+
+    def shutdown(self) -> None: ...
+
+    def describe(self) -> str: ...
+
+
+class LocalProcessBackend:
+    """Ejecuta los comandos como subprocesos del host, en el workspace, sin Docker.
+
+    Pensado para hosts con elan, `lean` y Mathlib ya instalados. Cada comando corre en
+    su propio grupo de procesos (se mata entero ante timeout o cancelación) y como
+    mucho `max_processes` comandos corren a la vez.
+    """
+
+    def __init__(self, workspace_path: str, max_processes: int | None = None, env: dict[str, str] | None = None):
+        self.workspace_path = workspace_path
+        self.max_processes = max(1, max_processes or os.cpu_count() or 1)
+        self.env = env
+        self._slots = threading.BoundedSemaphore(self.max_processes)
+        self._description: str | None = None
+
+    def run(self, command: str, timeout: int = 180, handle: Any = None) -> tuple[int, str]:
+        chunks: list[bytes] = []
+
+        def _collect(data: bytes) -> bool:
+            chunks.append(data)
+            return True
+
+        exit_code, status = self._execute(command, timeout, handle, _collect)
+        output = b"".join(chunks).decode("utf-8", errors="replace")
+        if status == "cancelled":
+            return -1, CANCELLED_MESSAGE
+        if status == "timeout":
+            return -1, f"{LOCAL_ERROR_PREFIX} tiempo límite de {timeout}s excedido.\n{output}"
+        if status == "error":
+            return -1, f"{LOCAL_ERROR_PREFIX} {output}"
+        return exit_code, output
+
+    def stream(self, command: str, capture: Any, timeout: int = 180, handle: Any = None) -> int:
+        exit_code, status = self._execute(command, timeout, handle, capture.write)
+        if status == "timeout":
+            capture.write(f"\n{LOCAL_ERROR_PREFIX} tiempo límite de {timeout}s excedido.\n".encode("utf-8"))
+            return -1
+        if status == "stopped":
+            return 1
+        if status in ("cancelled", "error"):
+            return -1
+        return exit_code
+
+    def shutdown(self) -> None:
+        """Nada que liberar: los procesos no sobreviven a su comando."""
+
+    def describe(self) -> str:
+        """Identifica la toolchain del host (`lean --version`), para las claves de caché."""
+        if self._description is None:
+            exit_code, output = self.run("lean --version", timeout=60)
+            self._description = f"local:{output.strip()}" if exit_code == 0 else "local"
+        return self._description
+
+    def _execute(self, command: str, timeout: int, handle: Any, sink) -> tuple[int, str]:
+        """Corre `command` volcando la salida en `sink`; devuelve `(exit_code, estado)`."""
+        with self._slots:
+            if handle is not None and handle.cancelled:
+                return -1, "cancelled"
+            started = time.perf_counter()
+            try:
+                process = subprocess.Popen(
+                    ["bash", "-lc", command],
+                    cwd=self.workspace_path,
+                    env=self.env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=os.name == "posix",
+                )
+            except OSError as exc:
+                sink(str(exc).encode("utf-8"))
+                return -1, "error"
+
+            timed_out = threading.Event()
+
+            def _on_timeout() -> None:
+                timed_out.set()
+                _kill_process_group(process)
+
+            timer = threading.Timer(timeout, _on_timeout)
+            timer.daemon = True
+            timer.start()
+            if handle is not None:
+                handle.attach(lambda: _kill_process_group(process))
+
+            stopped_early = False
+            try:
+                assert process.stdout is not None
+                while True:
+                    data = process.stdout.read1(_READ_CHUNK)
+                    if not data:
+                        break
+                    if not sink(data):
+                        stopped_early = True
+                        _kill_process_group(process)
+                        break
+                exit_code = _wait_with_usage(process, handle)
+                record_since(handle, "lean", started)
+            finally:
+                timer.cancel()
+                if handle is not None:
+                    handle.detach()
+                if process.stdout is not None:
+                    process.stdout.close()
+
+            if handle is not None and handle.cancelled:
+                return -1, "cancelled"
+            if timed_out.is_set():
+                return -1, "timeout"
+            if stopped_early:
+                return 1, "stopped"
+            return exit_code, "ok"
+
+
+def local_toolchain_available() -> bool:
+    return shutil.which("lake") is not None or shutil.which("lean") is not None
+
+
+def _kill_process_group(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (OSError, ProcessLookupError):
+        pass
+
+
+def _wait_with_usage(process: subprocess.Popen, handle: Any) -> int:
+    """Espera al proceso; en POSIX usa `wait4` para registrar su pico de memoria."""
+    if not hasattr(os, "wait4"):
+        return process.wait()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if handle is not None and getattr(handle, "track_memory", False):
+        # `ru_maxrss` está en KiB en Linux.
+        handle.peak_memory_bytes = int(usage.ru_maxrss) * 1024
+    return process.returncode
@@ -0,0 +1,240 @@
+﻿from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+logger = logging.getLogger("langchain-lean-env")
+
+
+class _Flight:
+    """Evaluación en curso compartida por peticiones idénticas concurrentes."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: dict[str, Any] | None = None
+        self.error: BaseException | None = None
+        # False si el resultado no pasó `cacheable` (p. ej. una ejecución cancelada).
+        self.shareable = True
+
+
+class LeanResultCache:
+    """Caché de resultados direccionada por contenido: LRU en memoria + disco.
+
+    Las entradas son dicts serializables a JSON (p. ej. `LeanExecutionResult.model_dump()`).
+    Peticiones concurrentes con la misma clave comparten una única evaluación.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_memory_entries: int = 512,
+        max_disk_bytes: int = 256 * 1024**2,
+    ):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_memory_entries = max(0, max_memory_entries)
+        self.max_disk_bytes = max(0, max_disk_bytes)
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.shared_flights = 0
+
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None
+
+    @staticmethod
+    def make_key(*parts: str | bytes) -> str:
+        """Hash estable de las partes (código, imagen, manifest...)."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8") if isinstance(part, str) else part
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], dict[str, Any]],
+        cacheable: Callable[[dict[str, Any]], bool] | None = None,
+    ) -> dict[str, Any]:
+        """Devuelve la entrada cacheada o la calcula una sola vez aunque haya concurrencia.
+
+        Solo se comparte con las peticiones en espera un resultado que pasa `cacheable`;
+        si no, cada una vuelve a intentarlo y calcula el suyo.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                else:
+                    self.shared_flights += 1
+
+            if leader:
+                break
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.shareable:
+                assert flight.value is not None
+                return flight.value
+
+        try:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            else:
+                flight.shareable = False
+            flight.value = value
+            return value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "shared_flights": self.shared_flights,
+                "memory_entries": len(self._memory),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+        if os.path.isdir(self.cache_dir):
+            for path, _ in self._disk_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _remember(self, key: str, value: dict[str, Any]) -> None:
+        if self.max_memory_entries == 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> dict[str, Any] | None:
+        if self.max_disk_bytes == 0:
+            return None
+        path = self._path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                value = json.load(file)
+            os.utime(path)  # LRU aproximado por mtime.
+        except (OSError, json.JSONDecodeError):
+            return None
+        return value if isinstance(value, dict) else None
+
+    def _write_disk(self, key: str, value: dict[str, Any]) -> None:
+        if self.max_disk_bytes == 0:
+            return
+        path = self._path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escritura atómica para que lectores concurrentes nunca vean JSON parcial.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(value, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as exc:
+            logger.warning("No se pudo escribir la caché de resultados: %s", exc)
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry_size for _, entry_size in self._disk_entries())
+            else:
+                self._disk_bytes += size
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _disk_entries(self) -> list[tuple[str, int]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    entries.append((path, os.path.getsize(path)))
+                except OSError:
+                    continue
+        return entries
+
+    def _evict_disk(self) -> None:
+        """Elimina las entradas menos usadas hasta bajar al 90% del presupuesto."""
+        entries = []
+        for path, size in self._disk_entries():
+            try:
+                entries.append((os.path.getmtime(path), path, size))
+            except OSError:
+                continue
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_bytes = total
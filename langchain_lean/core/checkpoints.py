@@ -0,0 +1,265 @@
+﻿from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_lean.core.parser import LeanGoal, ParsedLeanOutput, extract_goals
+from langchain_lean.core.repl_session import LeanREPLError, LeanREPLSession, parse_repl_response
+from langchain_lean.core.source import import_header_key, split_commands, split_import_header
+from langchain_lean.core.tactic_memo import TacticOutcomeMemo
+from langchain_lean.core.tiers import is_resource_timeout
+
+_BY_RE = re.compile(r":=\s*by\b")
+
+# Líneas que continúan la táctica anterior aunque estén en la misma columna.
+_CONTINUATION_PREFIXES = ("|", "<;>")
+
+
+@dataclass(frozen=True)
+class TacticProof:
+    """Prueba táctica partida en cabecera de imports, enunciado y tácticas de primer nivel."""
+
+    header: str
+    statement: str
+    tactics: tuple[str, ...]
+
+    @property
+    def key(self) -> str:
+        """Identifica el enunciado en su contexto de imports."""
+        return f"{self.header}\x00{self.statement}"
+
+
+@dataclass
+class ProofCheckpoint:
+    """Estado del REPL tras aplicar un prefijo de tácticas."""
+
+    proof_state: int
+    goals: list[LeanGoal] = field(default_factory=list)
+    has_sorry: bool = False
+
+
+def split_tactic_proof(code: str) -> TacticProof | None:
+    """Separa `code` en imports, enunciado (hasta `:= by`) y tácticas de primer nivel.
+
+    Devuelve None si el código no termina en una prueba táctica (`:= by ...`).
+    """
+    header, body = split_import_header(code)
+    matches = list(_BY_RE.finditer(body))
+    if not matches:
+        return None
+    by_match = matches[-1]
+    statement = body[: by_match.end()].rstrip()
+    rest = body[by_match.end() :]
+
+    first_line, _, remaining = rest.partition("\n")
+    blocks: list[list[str]] = [[first_line.strip()]] if first_line.strip() else []
+
+    base_indent: int | None = None
+    for line in remaining.splitlines():
+        if not line.strip():
+            if blocks:
+                blocks[-1].append("")
+            continue
+        indent = len(line) - len(line.lstrip())
+        if base_indent is None:
+            base_indent = indent
+        if indent < base_indent:
+            # Algo dedentado tras la prueba (otra declaración): no es una prueba táctica final.
+            return None
+        stripped = line[base_indent:]
+        if indent == base_indent and not stripped.startswith(_CONTINUATION_PREFIXES):
+            blocks.append([stripped])
+        elif blocks:
+            blocks[-1].append(stripped)
+        else:
+            blocks.append([stripped])
+
+    tactics = tuple("\n".join(block).rstrip() for block in blocks if "\n".join(block).strip())
+    return TacticProof(header=header, statement=statement, tactics=tactics)
+
+
+class TacticCheckpointStore:
+    """LRU de `ProofCheckpoint` indexado por (clave del enunciado, prefijo exacto de tácticas)."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, tuple[str, ...]], ProofCheckpoint] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, tactics: tuple[str, ...]) -> ProofCheckpoint | None:
+        with self._lock:
+            checkpoint = self._entries.get((key, tactics))
+            if checkpoint is not None:
+                self._entries.move_to_end((key, tactics))
+            return checkpoint
+
+    def put(self, key: str, tactics: tuple[str, ...], checkpoint: ProofCheckpoint) -> None:
+        with self._lock:
+            self._entries[(key, tactics)] = checkpoint
+            self._entries.move_to_end((key, tactics))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def longest_prefix(self, key: str, tactics: tuple[str, ...]) -> tuple[int, ProofCheckpoint | None]:
+        """Largo del prefijo más largo de `tactics` con checkpoint (0 = solo el enunciado)."""
+        for length in range(len(tactics), -1, -1):
+            checkpoint = self.get(key, tactics[:length])
+            if checkpoint is not None:
+                return length, checkpoint
+        return 0, None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class IncrementalProofChecker:
+    """Comprueba pruebas tácticas reutilizando estados de llamadas anteriores.
+
+    Si una petición extiende un prefijo de tácticas ya visto, solo se ejecutan las
+    tácticas nuevas sobre el `proofState` guardado: el coste por paso pasa de
+    O(largo de la prueba) a O(tácticas nuevas). Los imports se elaboran una vez por sesión.
+
+    Con `memo`, antes de ejecutar una táctica se consulta su resultado sobre metas
+    equivalentes: los fallos memoizados se devuelven sin tocar el REPL, y también los
+    éxitos cuando la táctica es la última de la prueba. Los fallos por heartbeats o
+    tiempo no se guardan.
+    """
+
+    def __init__(
+        self,
+        session: LeanREPLSession,
+        store: TacticCheckpointStore | None = None,
+        memo: TacticOutcomeMemo | None = None,
+    ):
+        self.session = session
+        self.store = store or TacticCheckpointStore()
+        self.memo = memo
+        self.tactics_run = 0
+        self._header_envs: dict[str, int] = {}
+        self._generation = session.generation
+        self._lock = threading.Lock()
+
+    def check(self, code: str) -> ParsedLeanOutput:
+        with self._lock:
+            try:
+                return self._check(code)
+            except LeanREPLError as exc:
+                return ParsedLeanOutput(success=False, proof_complete=False, errors=[str(exc)])
+
+    def _check(self, code: str) -> ParsedLeanOutput:
+        self.session.start()
+        self._sync_generation()
+        proof = split_tactic_proof(code)
+        if proof is None:
+            return parse_repl_response(self.session.run_command(code))
+
+        known, checkpoint = self.store.longest_prefix(proof.key, proof.tactics)
+        if checkpoint is None:
+            root = self._start_proof(proof)
+            if isinstance(root, ParsedLeanOutput):
+                return root
+            checkpoint = root
+            self.store.put(proof.key, (), checkpoint)
+
+        context = _memo_context(proof)
+        for idx in range(known, len(proof.tactics)):
+            tactic = proof.tactics[idx]
+            if self.memo is not None:
+                memoized = self.memo.lookup(checkpoint.goals, tactic, context=context)
+                if memoized is not None and not memoized.success:
+                    return memoized.model_copy(update={"goals": memoized.goals or list(checkpoint.goals)})
+                if memoized is not None and idx == len(proof.tactics) - 1:
+                    return _final_output(memoized.goals, checkpoint.has_sorry or memoized.has_sorry)
+
+            response = self.session.run_tactic(tactic, checkpoint.proof_state)
+            self.tactics_run += 1
+            self._sync_generation()
+            parsed = parse_repl_response(response)
+            # Un timeout depende de la carga del momento, no de la táctica: no se memoiza.
+            if self.memo is not None and not is_resource_timeout(parsed):
+                self.memo.record(
+                    checkpoint.goals,
+                    tactic,
+                    parsed.model_copy(update={"has_sorry": bool(response.get("sorries"))}),
+                    context=context,
+                )
+            if not parsed.success or not isinstance(response.get("proofState"), int):
+                # Devolvemos el error junto con las metas previas a la táctica fallida.
+                return parsed.model_copy(update={"goals": parsed.goals or list(checkpoint.goals)})
+            checkpoint = ProofCheckpoint(
+                proof_state=response["proofState"],
+                goals=parsed.goals,
+                has_sorry=checkpoint.has_sorry or bool(response.get("sorries")),
+            )
+            self.store.put(proof.key, proof.tactics[: idx + 1], checkpoint)
+
+        return _final_output(checkpoint.goals, checkpoint.has_sorry)
+
+    def _start_proof(self, proof: TacticProof) -> ProofCheckpoint | ParsedLeanOutput:
+        env = self._header_env(proof.header)
+        if isinstance(env, ParsedLeanOutput):
+            return env
+        response = self.session.run_command(f"{proof.statement}\n  sorry", env=env)
+        parsed = parse_repl_response(response)
+        sorries: list[dict[str, Any]] = response.get("sorries") or []
+        if not parsed.success or not sorries or not isinstance(sorries[-1].get("proofState"), int):
+            return parsed
+        # El `sorry` que insertamos es el último del archivo: su estado es la meta inicial.
+        root_goals = extract_goals(str(sorries[-1].get("goal", "")))
+        return ProofCheckpoint(proof_state=sorries[-1]["proofState"], goals=root_goals)
+
+    def _header_env(self, header: str) -> int | None | ParsedLeanOutput:
+        if not header.strip():
+            return None
+        if header not in self._header_envs:
+            response = self.session.run_command(header)
+            parsed = parse_repl_response(response)
+            if not parsed.success or not isinstance(response.get("env"), int):
+                return parsed
+            self._header_envs[header] = response["env"]
+        return self._header_envs[header]
+
+    def _sync_generation(self) -> None:
+        """Si el REPL se reinició, los ids guardados ya no existen: se descartan."""
+        if self.session.generation != self._generation:
+            self.store.clear()
+            self._header_envs.clear()
+            self._generation = self.session.generation
+
+
+def _memo_context(proof: TacticProof) -> str:
+    """Contexto del memo: los imports y, si lo hay, una huella del preámbulo local.
+
+    Dos problemas con los mismos imports pero distintos `def`/`open`/`variable`/`notation`
+    antes del teorema no deben compartir resultados aunque sus metas se impriman igual.
+    """
+    _, commands = split_commands(proof.statement)
+    text = "".join(command.text for command in commands[:-1]).strip()
+    preamble = "\n".join(line.rstrip() for line in text.splitlines())
+    context = import_header_key(proof.header)
+    if not preamble:
+        return context
+    return f"{context}\n-- preamble {hashlib.sha256(preamble.encode('utf-8')).hexdigest()}"
+
+
+def _final_output(goals: list[LeanGoal], has_sorry: bool) -> ParsedLeanOutput:
+    return ParsedLeanOutput(
+        success=True,
+        proof_complete=not goals and not has_sorry,
+        has_sorry=has_sorry,
+        goals=list(goals),
+        raw_output="\n\n".join(goal_to_text(goal) for goal in goals),
+    )
+
+
+def goal_to_text(goal: LeanGoal) -> str:
+    return "\n".join([*goal.context, f"⊢ {goal.goal}"])
@@ -0,0 +1,192 @@
+﻿from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from typing import Any, Iterable
+
+logger = logging.getLogger("langchain-lean-env")
+
+INDEX_FILENAME = "declarations.sqlite"
+
+# Caracteres que delatan una consulta por patrón de tipo en lugar de por nombre.
+_TYPE_PATTERN_RE = re.compile(r"[\s→∀∃()=<>≤≥+*∣⊢]|(?<![\w.])_(?![\w.])")
+
+# Programa Lean que vuelca todas las declaraciones del entorno como JSON por línea.
+_DUMP_TEMPLATE = """{imports}
+open Lean Meta
+
+#eval show MetaM Unit from do
+  let env ← getEnv
+  let handle ← IO.FS.Handle.mk "{output}" .write
+  for (name, info) in env.constants.toList do
+    if name.isInternal then continue
+    let type ← try pure (toString (← ppExpr info.type)) catch _ => pure ""
+    let doc := (← findDocString? env name).getD ""
+    let module := match env.getModuleIdxFor? name with
+      | some idx => (env.header.moduleNames[idx.toNat]!).toString
+      | none => ""
+    handle.putStrLn (Json.compress (Json.mkObj [
+      ("name", Json.str name.toString), ("type", Json.str type),
+      ("doc", Json.str doc), ("module", Json.str module)]))
+"""
+
+
+class LeanDeclarationIndex:
+    """Índice local de declaraciones Lean (nombre, tipo, docstring, módulo) en SQLite.
+
+    Se construye offline a partir de Mathlib en la imagen del workspace y permite
+    buscar por subcadena del nombre o por fragmentos de tipo sin salir a la red. Si
+    SQLite trae FTS5 con tokenizer `trigram`, las búsquedas `LIKE` usan el índice.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def build_from_records(self, records: Iterable[dict[str, Any]], fingerprint: str = "") -> int:
+        """Reemplaza el contenido del índice por `records`; devuelve cuántos se guardaron."""
+        rows = [
+            (
+                str(record.get("name") or ""),
+                str(record.get("type") or ""),
+                str(record.get("doc") or ""),
+                str(record.get("module") or ""),
+            )
+            for record in records
+            if record.get("name")
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS decls")
+                self._create_table(conn)
+                conn.executemany("INSERT INTO decls(name, type, doc, module) VALUES (?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+        logger.info("Índice de declaraciones construido: %s entradas.", len(rows))
+        return len(rows)
+
+    def build_from_environment(
+        self,
+        env_manager: Any,
+        imports: str = "import Mathlib",
+        timeout: int = 3600,
+        force: bool = False,
+    ) -> int:
+        """Vuelca las declaraciones visibles tras `imports` dentro del contenedor y las indexa.
+
+        No se reconstruye si la huella (imports, manifest, imagen) coincide con la guardada.
+        """
+        fingerprint = "\x00".join(
+            [imports, env_manager.read_lake_manifest(), env_manager.get_runtime_image_id()]
+        )
+        if not force and self.fingerprint() == fingerprint and self.count() > 0:
+            return self.count()
+
+        workspace = env_manager.get_workspace_abs_path()
+        scratch = f".langchain_lean_scratch/decls_{uuid.uuid4().hex}"
+        source_path = f"{scratch}/dump.lean"
+        output_path = f"{scratch}/decls.jsonl"
+        os.makedirs(os.path.join(workspace, scratch), exist_ok=True)
+        try:
+            with open(os.path.join(workspace, source_path), "w", encoding="utf-8") as file:
+                file.write(_DUMP_TEMPLATE.format(imports=imports, output=output_path))
+            cmd = (
+                "if command -v lake >/dev/null 2>&1; "
+                f"then lake env lean {source_path}; else lean {source_path}; fi"
+            )
+            exit_code, output = env_manager.run_command_in_container(command=cmd, timeout=timeout)
+            records_path = os.path.join(workspace, output_path)
+            if exit_code != 0 or not os.path.exists(records_path):
+                raise RuntimeError(f"No se pudo volcar las declaraciones (código {exit_code}):\n{output.strip()}")
+            with open(records_path, "r", encoding="utf-8") as file:
+                records = [json.loads(line) for line in file if line.strip()]
+            return self.build_from_records(records, fingerprint=fingerprint)
+        finally:
+            for name in (output_path, source_path):
+                try:
+                    os.remove(os.path.join(workspace, name))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(os.path.join(workspace, scratch))
+            except OSError:
+                pass
+
+    def search(self, query: str, limit: int = 5) -> list[dict[str, str]]:
+        """Busca por subcadena del nombre o, si `query` parece un tipo, por sus fragmentos."""
+        query = query.strip()
+        if not query:
+            return []
+        if _TYPE_PATTERN_RE.search(query):
+            return self.search_type(query, limit=limit)
+        return self.search_name(query, limit=limit)
+
+    def search_name(self, fragment: str, limit: int = 5) -> list[dict[str, str]]:
+        needle = fragment.strip().lower()
+        return self._query(
+            "SELECT name, type, doc, module FROM decls WHERE name LIKE ? ESCAPE '\\' "
+            "ORDER BY (lower(name) = ?) DESC, length(name) ASC LIMIT ?",
+            (f"%{_like_literal(needle)}%", needle, limit),
+        )
+
+    def search_type(self, pattern: str, limit: int = 5) -> list[dict[str, str]]:
+        """Todos los fragmentos del patrón (separados por espacios, `_` = comodín) deben aparecer."""
+        fragments = [piece for piece in re.split(r"\s+|(?<![\w.])_(?![\w.])", pattern) if piece and piece != "_"]
+        if not fragments:
+            return []
+        clauses = " AND ".join("type LIKE ? ESCAPE '\\'" for _ in fragments)
+        return self._query(
+            f"SELECT name, type, doc, module FROM decls WHERE {clauses} ORDER BY length(type) ASC LIMIT ?",
+            (*(f"%{_like_literal(piece)}%" for piece in fragments), limit),
+        )
+
+    def count(self) -> int:
+        rows = self._query("SELECT count(*) AS n FROM decls", ())
+        return int(rows[0]["n"]) if rows else 0
+
+    def fingerprint(self) -> str:
+        rows = self._query("SELECT value FROM meta WHERE key = 'fingerprint'", ())
+        return rows[0]["value"] if rows else ""
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _query(self, sql: str, params: tuple[Any, ...]) -> list[dict[str, str]]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(sql, params)
+            except sqlite3.OperationalError:
+                # Índice aún no construido.
+                return []
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        return self._conn
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection) -> None:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE decls USING fts5(name, type, doc, module, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # SQLite sin FTS5/trigram: tabla normal, mismas consultas con escaneo completo.
+            conn.execute("CREATE TABLE decls (name TEXT, type TEXT, doc TEXT, module TEXT)")
+
+
+def _like_literal(text: str) -> str:
+    """Escapa `\\`, `%` y `_` para que LIKE (con `ESCAPE '\\'`) busque la subcadena literal."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
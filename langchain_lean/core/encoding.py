@@ -0,0 +1,101 @@
+﻿from __future__ import annotations
+
+import json
+from collections import Counter
+from typing import Any, Iterable
+
+from langchain_lean.core.evaluator import LeanDeclarationResult, LeanExecutionResult
+
+# Caracteres de `raw_output` que se conservan en modo compacto (inicio y final de la salida).
+DEFAULT_COMPACT_RAW_CHARS = 2000
+
+# Campos que devuelve `LeanStateTool`.
+STATE_FIELDS = ("success", "proof_complete", "has_sorry", "goals", "errors", "warnings", "raw_output")
+
+
+def result_payload(
+    result: LeanExecutionResult,
+    fields: Iterable[str] | None = None,
+    compact: bool = False,
+    max_raw_output_chars: int = DEFAULT_COMPACT_RAW_CHARS,
+) -> dict[str, Any]:
+    """Dict serializable de `result`, leyendo los atributos sin pasar por `model_dump`.
+
+    En modo compacto se omiten los campos vacíos, los errores y warnings repetidos se
+    agrupan (`"... (x3)"`) y `raw_output` se recorta a `max_raw_output_chars` (0 lo
+    elimina). Sin `compact` el resultado es idéntico a `result.model_dump()`.
+    """
+    names = tuple(fields) if fields is not None else tuple(LeanExecutionResult.model_fields)
+    payload: dict[str, Any] = {}
+    for name in names:
+        value = getattr(result, name)
+        if compact:
+            if name in ("errors", "warnings"):
+                value = dedupe_messages(value)
+            elif name == "raw_output":
+                value = truncate_middle(value, max_raw_output_chars)
+            if value in (None, "", [], {}):
+                continue
+        payload[name] = value
+    return payload
+
+
+def encode_result(
+    result: LeanExecutionResult,
+    fields: Iterable[str] | None = None,
+    compact: bool = False,
+    max_raw_output_chars: int = DEFAULT_COMPACT_RAW_CHARS,
+) -> str:
+    """JSON de `result` para devolver a un LLM (sin espacios superfluos en modo compacto)."""
+    payload = result_payload(result, fields, compact=compact, max_raw_output_chars=max_raw_output_chars)
+    if compact:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def encode_declarations(
+    declarations: list[LeanDeclarationResult],
+    fields: Iterable[str] | None = None,
+    compact: bool = False,
+    max_raw_output_chars: int = DEFAULT_COMPACT_RAW_CHARS,
+) -> str:
+    """JSON de `evaluate_declarations`: `success` global y un resultado por declaración."""
+    payload = {
+        "success": all(item.result.success for item in declarations),
+        "declarations": [
+            {
+                "name": item.name,
+                "kind": item.kind,
+                "line": item.line,
+                **result_payload(item.result, fields, compact=compact, max_raw_output_chars=max_raw_output_chars),
+            }
+            for item in declarations
+        ],
+    }
+    if compact:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def dedupe_messages(messages: list[str]) -> list[str]:
+    """Conserva la primera aparición de cada mensaje, anotando cuántas veces se repitió."""
+    counts = Counter(messages)
+    if len(counts) == len(messages):
+        return list(messages)
+    deduped: list[str] = []
+    for message in counts:
+        count = counts[message]
+        deduped.append(f"{message} (x{count})" if count > 1 else message)
+    return deduped
+
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    """Recorta `text` a `max_chars` conservando el inicio y el final."""
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n... [{omitted} caracteres omitidos] ...\n{text[len(text) - tail:]}"
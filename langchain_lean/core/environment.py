@@ -1,13 +1,37 @@
-﻿import logging
+﻿import json
+import logging
 import os
 import shutil
+import threading
+import time
 from pathlib import Path
 
 import docker
 
-logging.basicConfig(level=logging.INFO)
+from langchain_lean.core.backends import (
+    BACKEND_ENV_VAR,
+    ExecutionBackend,
+    LocalProcessBackend,
+    local_toolchain_available,
+)
+from langchain_lean.core.handles import CANCELLED_MESSAGE, ExecutionHandle, record_since
+from langchain_lean.core.pool import LeanContainerPool
+from langchain_lean.core.streaming import OutputCallback, OutputCapture
+
 logger = logging.getLogger("langchain-lean-env")
 
+PROBE_CACHE_FILENAME = "image_probes.json"
+
+# Resultado de `_image_has_lake` por id de imagen, compartido por todos los managers del proceso.
+_PROBE_RESULTS: dict[str, bool] = {}
+
+# Sufijo que imprime el pico de memoria del cgroup del contenedor (v2 o v1) al terminar.
+MEMORY_MARKER = "<<<LANGCHAIN_LEAN_MEM"
+_MEMORY_PROBE = (
+    f'status=$?; echo "{MEMORY_MARKER} $(cat /sys/fs/cgroup/memory.peak 2>/dev/null '
+    '|| cat /sys/fs/cgroup/memory/memory.max_usage_in_bytes 2>/dev/null)"; exit $status'
+)
+
 
 class LeanEnvironmentManager:
     """Gestiona Docker y los volúmenes persistentes para ejecutar Lean 4."""
@@ -18,6 +42,11 @@ class LeanEnvironmentManager:
         fallback_image: str = "leanprover/lean4:v4.11.0",
         workspace_path: str = "./lean_workspace",
         cache_path: str | None = None,
+        use_pool: bool = False,
+        pool_size: int | None = None,
+        max_runs_per_worker: int = 50,
+        backend: str | None = None,
+        max_local_processes: int | None = None,
     ):
         self.image_name = image_name
         self.fallback_image = fallback_image
@@ -25,19 +54,57 @@ class LeanEnvironmentManager:
         self.workspace_path = os.path.abspath(workspace_path)
         default_cache = os.path.join(Path.home(), ".cache", "langchain-lean")
         self.cache_path = os.path.abspath(cache_path or default_cache)
+        # Modo pool: contenedores de larga vida reutilizados vía `exec`. El camino
+        # efímero sigue disponible como fallback si el pool no puede operar.
+        self.use_pool = use_pool
+        self.pool_size = pool_size
+        self.max_runs_per_worker = max_runs_per_worker
+        self._pool: LeanContainerPool | None = None
+        self._pool_lock = threading.Lock()
+        self._runtime_image_id: tuple[str, str] | None = None
+        # Construir el manager no toca Docker: el cliente se conecta en el primer uso y
+        # `ensure_provisioned` aprovisiona una sola vez, cuando hace falta ejecutar algo.
+        self._client = None
+        self._provisioned = False
+        self._provision_lock = threading.Lock()
+        # "docker" (por defecto) o "local": subprocesos en el host con la toolchain instalada.
+        self.backend_name = (backend or os.environ.get(BACKEND_ENV_VAR) or "docker").lower()
+        if self.backend_name not in ("docker", "local"):
+            raise ValueError(f"Backend de ejecución desconocido: {self.backend_name!r} (usa 'docker' o 'local').")
+        self.backend: ExecutionBackend | None = None
+        if self.backend_name == "local":
+            self.backend = LocalProcessBackend(self.workspace_path, max_processes=max_local_processes)
 
-        try:
-            self.client = docker.from_env()
-        except docker.errors.DockerException as exc:
-            raise RuntimeError(
-                "No se pudo conectar con Docker. Verifica que Docker esté instalado y en ejecución."
-            ) from exc
+    @property
+    def client(self):
+        """Cliente Docker, conectado en el primer acceso (`None` con el backend local)."""
+        if self._client is None and self.backend is None:
+            try:
+                self._client = docker.from_env()
+            except docker.errors.DockerException as exc:
+                raise RuntimeError(
+                    "No se pudo conectar con Docker. Verifica que Docker esté instalado y en ejecución."
+                ) from exc
+        return self._client
+
+    def ensure_provisioned(self) -> None:
+        """Aprovisiona el entorno si aún no se hizo (idempotente y seguro entre hilos)."""
+        if self._provisioned:
+            return
+        with self._provision_lock:
+            if not self._provisioned:
+                self.provision_environment()
 
     def provision_environment(self) -> None:
         logger.info("Verificando entorno Lean...")
         self._ensure_workspace_exists()
         self._ensure_cache_exists()
-        self._ensure_image_is_ready()
+        if self.backend is not None:
+            if not local_toolchain_available():
+                logger.warning("Backend local: no se encontró `lake` ni `lean` en PATH.")
+        else:
+            self._ensure_image_is_ready()
+        self._provisioned = True
         logger.info("Entorno Lean listo.")
 
     def _ensure_workspace_exists(self) -> None:
@@ -83,7 +150,31 @@ class LeanEnvironmentManager:
         self.runtime_image = self.fallback_image
 
     def _image_has_lake(self, image_name: str) -> bool:
-        """Valida si la imagen provee lake en PATH."""
+        """Valida si la imagen provee lake en PATH.
+
+        El resultado se memoiza por id de imagen (en proceso y en `cache_path`), así que
+        solo se lanza el contenedor de prueba la primera vez que se ve una imagen.
+        """
+        try:
+            image_id = self.client.images.get(image_name).id
+        except Exception:
+            image_id = None
+
+        if image_id is not None:
+            cached = _PROBE_RESULTS.get(image_id)
+            if cached is None:
+                cached = self._read_probe_cache().get(image_id)
+            if isinstance(cached, bool):
+                _PROBE_RESULTS[image_id] = cached
+                return cached
+
+        has_lake = self._probe_image_for_lake(image_name)
+        if image_id is not None:
+            _PROBE_RESULTS[image_id] = has_lake
+            self._write_probe_cache(image_id, has_lake)
+        return has_lake
+
+    def _probe_image_for_lake(self, image_name: str) -> bool:
         try:
             output = self.client.containers.run(
                 image_name,
@@ -96,41 +187,318 @@ class LeanEnvironmentManager:
         except Exception:
             return False
 
-    def run_command_in_container(self, command: str, timeout: int = 180) -> tuple[int, str]:
-        """Ejecuta un comando en un contenedor efímero con caché persistente."""
-        volumes = {
+    def _probe_cache_file(self) -> str:
+        return os.path.join(self.cache_path, PROBE_CACHE_FILENAME)
+
+    def _read_probe_cache(self) -> dict[str, object]:
+        try:
+            with open(self._probe_cache_file(), "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write_probe_cache(self, image_id: str, has_lake: bool) -> None:
+        data = self._read_probe_cache()
+        data[image_id] = has_lake
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            tmp_path = f"{self._probe_cache_file()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self._probe_cache_file())
+        except OSError as exc:
+            logger.warning("No se pudo guardar la caché de sondeo de imágenes: %s", exc)
+
+    def _volumes(self) -> dict[str, dict[str, str]]:
+        return {
             self.workspace_path: {"bind": "/workspace", "mode": "rw"},
             os.path.join(self.cache_path, ".cache"): {"bind": "/root/.cache", "mode": "rw"},
         }
 
+    def get_pool(self) -> LeanContainerPool:
+        """Devuelve (creándolo si hace falta) el pool de contenedores de larga vida."""
+        pool = self._pool
+        if pool is None:
+            # Varios hilos pueden pedir el pool a la vez (lotes, búsqueda, declaraciones):
+            # solo uno lo crea, si no los contenedores de los pools descartados quedarían vivos.
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = LeanContainerPool(
+                        client=self.client,
+                        image=self.runtime_image,
+                        volumes=self._volumes(),
+                        size=self.pool_size,
+                        max_runs_per_worker=self.max_runs_per_worker,
+                    )
+                pool = self._pool
+        return pool
+
+    def run_command_in_container(
+        self,
+        command: str,
+        timeout: int = 180,
+        handle: ExecutionHandle | None = None,
+        on_output: OutputCallback | None = None,
+        max_output_bytes: int | None = None,
+    ) -> tuple[int, str]:
+        """Ejecuta un comando en el pool (si está activo) o en un contenedor efímero.
+
+        Si se pasa `handle`, `handle.cancel()` mata el contenedor/proceso en curso.
+        Con `on_output` o `max_output_bytes` la salida se lee en streaming: `on_output`
+        recibe cada fragmento y puede devolver False para abortar la ejecución, y lo que
+        exceda `max_output_bytes` se vuelca a `<cache_path>/spill` en lugar de a memoria.
+        """
+        if handle is not None and handle.cancelled:
+            return -1, CANCELLED_MESSAGE
+        if self.backend is not None and on_output is None and max_output_bytes is None:
+            return self.backend.run(command, timeout=timeout, handle=handle)
+        if on_output is not None or max_output_bytes is not None:
+            return self._run_streaming(command, timeout, handle, on_output, max_output_bytes)
+        if self.use_pool:
+            try:
+                started = time.perf_counter()
+                result = self.get_pool().run(command, timeout=timeout, handle=handle)
+                if handle is not None:
+                    handle.record("exec", time.perf_counter() - started)
+                return result
+            except Exception as exc:
+                if handle is not None and handle.cancelled:
+                    return -1, CANCELLED_MESSAGE
+                logger.warning("Pool de contenedores no disponible (%s). Usando contenedor efímero.", exc)
+        return self._run_in_ephemeral_container(command, timeout=timeout, handle=handle)
+
+    def _run_streaming(
+        self,
+        command: str,
+        timeout: int,
+        handle: ExecutionHandle | None,
+        on_output: OutputCallback | None,
+        max_output_bytes: int | None,
+    ) -> tuple[int, str]:
+        def _new_capture() -> OutputCapture:
+            return OutputCapture(
+                max_bytes=max_output_bytes,
+                spill_dir=os.path.join(self.cache_path, "spill"),
+                on_output=on_output,
+            )
+
+        if self.backend is not None:
+            capture = _new_capture()
+            exit_code = self.backend.stream(command, capture, timeout=timeout, handle=handle)
+            if exit_code == -1 and handle is not None and handle.cancelled:
+                capture.close()
+                return -1, CANCELLED_MESSAGE
+            return exit_code, capture.getvalue()
+
+        if self.use_pool:
+            capture = _new_capture()
+            try:
+                started = time.perf_counter()
+                exit_code = self.get_pool().stream(command, capture, timeout=timeout, handle=handle)
+                if handle is not None:
+                    handle.record("exec", time.perf_counter() - started)
+                return exit_code, capture.getvalue()
+            except Exception as exc:
+                capture.close()
+                if handle is not None and handle.cancelled:
+                    return -1, CANCELLED_MESSAGE
+                logger.warning("Pool de contenedores no disponible (%s). Usando contenedor efímero.", exc)
+
+        capture = _new_capture()
+        exit_code = self._stream_in_ephemeral_container(command, capture, timeout=timeout, handle=handle)
+        if exit_code == -1 and handle is not None and handle.cancelled:
+            capture.close()
+            return -1, CANCELLED_MESSAGE
+        return exit_code, capture.getvalue()
+
+    def _run_in_ephemeral_container(
+        self, command: str, timeout: int = 180, handle: ExecutionHandle | None = None
+    ) -> tuple[int, str]:
+        """Ejecuta un comando en un contenedor efímero con caché persistente."""
         container = None
+        track_memory = handle is not None and handle.track_memory
+        if track_memory:
+            command = f"{command}; {_MEMORY_PROBE}"
         try:
+            started = time.perf_counter()
             container = self.client.containers.run(
                 self.runtime_image,
                 command=f"bash -lc '{command}'",
-                volumes=volumes,
+                volumes=self._volumes(),
                 working_dir="/workspace",
                 detach=True,
                 remove=False,
                 stdout=True,
                 stderr=True,
             )
+            record_since(handle, "container_start", started)
+            if handle is not None:
+                handle.attach(container.kill)
+            started = time.perf_counter()
             result = container.wait(timeout=timeout)
+            record_since(handle, "lean", started)
+            started = time.perf_counter()
             output = container.logs(stdout=True, stderr=True).decode("utf-8", errors="replace")
+            record_since(handle, "logs", started)
+            if track_memory:
+                output = _pop_memory_marker(output, handle)
             exit_code = int(result.get("StatusCode", 1))
             return exit_code, output
         except Exception as exc:
+            if handle is not None and handle.cancelled:
+                return -1, CANCELLED_MESSAGE
             return -1, f"Error Docker: {exc}"
         finally:
+            if handle is not None:
+                handle.detach()
             if container is not None:
                 try:
                     container.remove(force=True)
                 except Exception:
                     pass
 
+    def _stream_in_ephemeral_container(
+        self, command: str, capture: OutputCapture, timeout: int = 180, handle: ExecutionHandle | None = None
+    ) -> int:
+        """Como `_run_in_ephemeral_container`, pero sigue los logs a medida que se producen."""
+        container = None
+        timed_out = threading.Event()
+        timer: threading.Timer | None = None
+        try:
+            started = time.perf_counter()
+            container = self.client.containers.run(
+                self.runtime_image,
+                command=f"bash -lc '{command}'",
+                volumes=self._volumes(),
+                working_dir="/workspace",
+                detach=True,
+                remove=False,
+                stdout=True,
+                stderr=True,
+            )
+            record_since(handle, "container_start", started)
+            started = time.perf_counter()
+            if handle is not None:
+                handle.attach(container.kill)
+
+            def _on_timeout() -> None:
+                timed_out.set()
+                container.kill()
+
+            timer = threading.Timer(timeout, _on_timeout)
+            timer.daemon = True
+            timer.start()
+
+            stopped_early = False
+            for chunk in container.logs(stdout=True, stderr=True, stream=True, follow=True):
+                if not capture.write(chunk):
+                    stopped_early = True
+                    container.kill()
+                    break
+
+            if timed_out.is_set():
+                capture.write(f"\nError Docker: tiempo límite de {timeout}s excedido.\n".encode("utf-8"))
+                return -1
+            if stopped_early:
+                return 1
+            result = container.wait(timeout=30)
+            record_since(handle, "lean", started)
+            return int(result.get("StatusCode", 1))
+        except Exception as exc:
+            if handle is None or not handle.cancelled:
+                capture.write(f"Error Docker: {exc}".encode("utf-8"))
+            return -1
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if handle is not None:
+                handle.detach()
+            if container is not None:
+                try:
+                    container.remove(force=True)
+                except Exception:
+                    pass
+
+    def repl_command(self) -> list[str]:
+        """Comando para lanzar un REPL de Lean interactivo (stdin/stdout).
+
+        En un contenedor con el backend Docker; con el backend local, en el host (el
+        llamador lo lanza con `cwd=workspace_path`).
+        """
+        if self.backend is not None:
+            return ["bash", "-lc", "lake env repl"]
+        return [
+            "docker",
+            "run",
+            "-i",
+            "--rm",
+            "-v",
+            f"{self.workspace_path}:/workspace",
+            "-v",
+            f"{os.path.join(self.cache_path, '.cache')}:/root/.cache",
+            "-w",
+            "/workspace",
+            self.runtime_image,
+            "bash",
+            "-lc",
+            "lake env repl",
+        ]
+
+    def close(self) -> None:
+        """Libera los contenedores del pool, si existe."""
+        if self.backend is not None:
+            self.backend.shutdown()
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def get_runtime_image_id(self) -> str:
+        """Id de la imagen en uso (cambia si la imagen se reconstruye con el mismo tag).
+
+        Con el backend local identifica la toolchain del host (`lean --version`).
+        """
+        if self.backend is not None:
+            return self.backend.describe()
+        if self._runtime_image_id is None or self._runtime_image_id[0] != self.runtime_image:
+            try:
+                image_id = self.client.images.get(self.runtime_image).id
+            except Exception:
+                image_id = self.runtime_image
+            self._runtime_image_id = (self.runtime_image, image_id)
+        return self._runtime_image_id[1]
+
+    def read_lake_manifest(self) -> str:
+        """Contenido de `lake-manifest.json` del workspace (vacío si no existe)."""
+        try:
+            with open(os.path.join(self.workspace_path, "lake-manifest.json"), "r", encoding="utf-8") as file:
+                return file.read()
+        except OSError:
+            return ""
+
+    def read_lean_toolchain(self) -> str:
+        """Contenido de `lean-toolchain` del workspace (vacío si no existe)."""
+        try:
+            with open(os.path.join(self.workspace_path, "lean-toolchain"), "r", encoding="utf-8") as file:
+                return file.read()
+        except OSError:
+            return ""
+
     def get_workspace_abs_path(self) -> str:
         return self.workspace_path
 
     def cleanup_workspace(self) -> None:
         if os.path.exists(self.workspace_path):
             shutil.rmtree(self.workspace_path)
+
+
+def _pop_memory_marker(output: str, handle: ExecutionHandle | None) -> str:
+    """Quita la línea de `_MEMORY_PROBE` de la salida y guarda el pico en `handle`."""
+    head, marker, tail = output.rpartition(MEMORY_MARKER)
+    if not marker:
+        return output
+    value = tail.strip().split("\n", 1)[0].strip()
+    if handle is not None and value.isdigit():
+        handle.peak_memory_bytes = int(value)
+    return head
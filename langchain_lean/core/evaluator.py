@@ -1,11 +1,49 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import functools
 import os
-from typing import Optional
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
 
 from pydantic import BaseModel, Field
 
-from langchain_lean.core.parser import ParsedLeanOutput, parse_lean_output
+from langchain_lean.core.cache import LeanResultCache
+from langchain_lean.core.handles import ExecutionHandle, record_since
+from langchain_lean.core.headers import HeaderEnvironmentCache, lean_command_with_path, lean_path_export
+from langchain_lean.core.metrics import EvaluationEvent, MetricsHook, emit_event
+from langchain_lean.core.parser import (
+    IncrementalLeanParser,
+    ParsedLeanOutput,
+    parse_lean_json_output,
+    parse_lean_output,
+)
+from langchain_lean.core.source import declaration_check_code, import_header_key, split_commands
+from langchain_lean.core.tiers import EvaluationTier, is_resource_timeout, tiers_signature
+
+
+# Directorio (relativo al workspace) donde viven los archivos temporales por petición.
+SCRATCH_DIR = ".langchain_lean_scratch"
+DEFAULT_FILENAME = "check.lean"
+
+# Marcadores para separar la salida de cada snippet dentro de una invocación batch.
+BATCH_BEGIN_MARKER = "<<<LANGCHAIN_LEAN_BEGIN"
+BATCH_END_MARKER = "<<<LANGCHAIN_LEAN_END"
+SNIPPET_TIMEOUT = 240
+DEFAULT_TIMEOUT = 240
+
+_TRANSIENT_ERROR_MARKERS = (
+    "Error Docker:",
+    "Error de ejecución local:",
+    "No se pudo escribir el archivo Lean",
+    "Lean no produjo salida",
+)
+
+# Campos que describen una ejecución concreta, no al código: no se guardan en caché.
+_EXECUTION_FIELDS = {"timings", "peak_memory_bytes"}
 
 
 class LeanExecutionResult(BaseModel):
@@ -17,26 +55,418 @@ class LeanExecutionResult(BaseModel):
     goals: list[dict[str, object]] = Field(default_factory=list, description="Metas abiertas parseadas.")
     errors: list[str] = Field(default_factory=list, description="Errores de compilación/verificación.")
     warnings: list[str] = Field(default_factory=list, description="Warnings reportados por Lean.")
+    messages: list[dict[str, object]] = Field(
+        default_factory=list, description="Diagnósticos con posición (solo con `json_messages=True`)."
+    )
+    timings: Optional[dict[str, float]] = Field(
+        default=None, description="Duración por fase en segundos (solo con `collect_timings=True`)."
+    )
+    peak_memory_bytes: Optional[int] = Field(default=None, description="Pico de memoria del contenedor, si se midió.")
+    tier: Optional[str] = Field(default=None, description="Tier de presupuesto en el que terminó (modo por tiers).")
     raw_output: str = Field(default="", description="Salida cruda de Lean.")
 
+    @classmethod
+    def from_parsed(cls, parsed: ParsedLeanOutput) -> "LeanExecutionResult":
+        """Construye el resultado directamente desde la salida parseada, sin pasar por JSON."""
+        return cls(
+            success=parsed.success,
+            proof_complete=parsed.proof_complete,
+            has_sorry=parsed.has_sorry,
+            goals=[goal.model_dump() for goal in parsed.goals],
+            errors=parsed.errors,
+            warnings=parsed.warnings,
+            messages=[message.model_dump() for message in parsed.messages],
+            raw_output=parsed.raw_output,
+        )
+
+
+class LeanDeclarationResult(BaseModel):
+    """Resultado de verificar una declaración por separado (`evaluate_declarations`)."""
+
+    name: str = Field(default="", description="Nombre declarado (vacío para `example`, `mutual` o anónimos).")
+    kind: str = Field(..., description="Comando que la declara: theorem, lemma, def, instance...")
+    line: int = Field(..., description="Línea (desde 1) donde empieza en el archivo original.")
+    result: LeanExecutionResult
+
 
 class LeanEvaluator:
-    """Ejecuta código Lean sobre Docker y retorna salida parseada."""
+    """Ejecuta código Lean (sobre Docker o en el host) y retorna salida parseada."""
 
-    def __init__(self, environment_manager: Optional["LeanEnvironmentManager"] = None):
+    def __init__(
+        self,
+        environment_manager: Optional["LeanEnvironmentManager"] = None,
+        use_cache: bool = False,
+        cache: Optional[LeanResultCache] = None,
+        max_concurrency: int | None = None,
+        streaming: bool = False,
+        max_output_bytes: int | None = None,
+        use_header_cache: bool = False,
+        json_messages: bool = False,
+        collect_timings: bool = False,
+        track_memory: bool = False,
+        metrics_hooks: Optional[list[MetricsHook]] = None,
+        tiers: Optional[Sequence[EvaluationTier]] = None,
+        backend: str | None = None,
+    ):
         if environment_manager is not None:
             self.env_manager = environment_manager
         else:
             from langchain_lean.core.environment import LeanEnvironmentManager
 
-            self.env_manager = LeanEnvironmentManager()
+            # `backend`: "docker" o "local" (por defecto, `LANGCHAIN_LEAN_BACKEND` o "docker").
+            self.env_manager = LeanEnvironmentManager(backend=backend)
             self.env_manager.provision_environment()
 
-    def evaluate_code(self, lean_code: str, filename: str = "check.lean") -> LeanExecutionResult:
+        # Caché opt-in: se activa con `use_cache=True` o pasando una instancia propia.
+        if cache is None and use_cache:
+            cache = LeanResultCache(os.path.join(self.env_manager.cache_path, "results"))
+        self.cache = cache
+
+        # Límite de evaluaciones simultáneas en `aevaluate_code` (por defecto, núcleos del host).
+        self.max_concurrency = max(1, max_concurrency or os.cpu_count() or 1)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+        # Streaming: la salida se parsea mientras se produce y lo que exceda
+        # `max_output_bytes` se vuelca a disco. `fail_fast` siempre usa streaming.
+        self.streaming = streaming
+        self.max_output_bytes = max_output_bytes
+
+        # Cabeceras de imports precompiladas a un módulo `.olean` reutilizable (opt-in).
+        self.header_cache = HeaderEnvironmentCache(self.env_manager) if use_header_cache else None
+
+        # Modo `lean --json`: diagnósticos estructurados con posición y texto completo.
+        # El parser de texto queda como fallback (`json_messages=False`).
+        self.json_messages = json_messages
+
+        # Instrumentación: tiempos por fase en el resultado y hooks que reciben un
+        # `EvaluationEvent` por evaluación (p. ej. `PrometheusMetrics`).
+        self.collect_timings = collect_timings
+        self.track_memory = track_memory
+        self.metrics_hooks: list[MetricsHook] = list(metrics_hooks or [])
+
+        # Modo por tiers: cada evaluación empieza con el presupuesto más chico y solo se
+        # repite con el siguiente si falla por heartbeats o tiempo (ver `DEFAULT_TIERS`).
+        self.tiers: tuple[EvaluationTier, ...] = tuple(tiers or ())
+
+    def add_metrics_hook(self, hook: MetricsHook) -> None:
+        self.metrics_hooks.append(hook)
+
+    def evaluate_code(
+        self,
+        lean_code: str,
+        filename: str | None = None,
+        handle: ExecutionHandle | None = None,
+        fail_fast: bool = False,
+        source: str = "evaluate_code",
+    ) -> LeanExecutionResult:
+        """Evalúa `lean_code`.
+
+        Sin `filename`, cada llamada usa un archivo temporal propio que se borra al terminar,
+        por lo que el evaluador puede usarse desde muchos hilos/tareas a la vez. Con `filename`
+        se escribe en esa ruta del workspace (comportamiento histórico, no concurrente).
+        Con `fail_fast=True` la ejecución se detiene en cuanto Lean reporta el primer error.
+        `source` etiqueta la evaluación en las métricas (p. ej. el nombre de la tool).
+        """
+        instrumented = self.collect_timings or bool(self.metrics_hooks)
+        if instrumented and handle is None:
+            handle = ExecutionHandle()
+        if handle is not None and self.track_memory:
+            handle.track_memory = True
+        started = time.perf_counter()
+
+        if self.cache is None:
+            result = self._evaluate(lean_code, filename, handle, fail_fast)
+            cached = False
+        else:
+            fresh: list[LeanExecutionResult] = []
+
+            def _compute() -> dict[str, object]:
+                fresh.append(self._evaluate(lean_code, filename, handle, fail_fast))
+                return fresh[0].model_dump(exclude=_EXECUTION_FIELDS)
+
+            # Sin `fail_fast` la clave es la misma que usa `evaluate_many`.
+            key = self._cache_key(lean_code, filename, *(("fail_fast",) if fail_fast else ()))
+            payload = self.cache.get_or_compute(
+                key,
+                _compute,
+                # Un resultado de una ejecución cancelada no describe al código: no se guarda.
+                cacheable=lambda result: _is_cacheable(result) and not (handle is not None and handle.cancelled),
+            )
+            cached = not fresh
+            result = fresh[0] if fresh else LeanExecutionResult.model_validate(payload)
+
+        if instrumented:
+            self._finish_metrics(lean_code, result, handle, started, source, cached)
+        return result
+
+    def _finish_metrics(
+        self,
+        lean_code: str,
+        result: LeanExecutionResult,
+        handle: ExecutionHandle | None,
+        started: float,
+        source: str,
+        cached: bool,
+    ) -> None:
+        duration = time.perf_counter() - started
+        timings = dict(handle.timings) if handle is not None else {}
+        if cached:
+            timings["cache"] = duration
+        peak_memory = handle.peak_memory_bytes if handle is not None else None
+        if self.collect_timings:
+            result.timings = {**timings, "total": duration}
+            result.peak_memory_bytes = peak_memory
+        emit_event(
+            self.metrics_hooks,
+            EvaluationEvent(
+                source=source,
+                duration=duration,
+                success=result.success,
+                cached=cached,
+                timings=timings,
+                peak_memory_bytes=peak_memory,
+                codes=[lean_code],
+                results=[result],
+            ),
+        )
+
+    async def aevaluate_code(
+        self,
+        lean_code: str,
+        filename: str | None = None,
+        fail_fast: bool = False,
+        source: str = "evaluate_code",
+    ) -> LeanExecutionResult:
+        """Versión asíncrona de `evaluate_code` que no bloquea el event loop.
+
+        Respeta `max_concurrency`. Si la tarea se cancela, se mata el contenedor o
+        proceso subyacente en lugar de dejarlo corriendo en segundo plano.
+        """
+        return await self._run_cancellable(
+            self.evaluate_code, lean_code, filename, fail_fast=fail_fast, source=source
+        )
+
+    def evaluate_declarations(
+        self,
+        lean_code: str,
+        handle: ExecutionHandle | None = None,
+        source: str = "evaluate_declarations",
+    ) -> list[LeanDeclarationResult]:
+        """Verifica cada declaración de `lean_code` por separado, en paralelo.
+
+        Cada declaración se verifica en su propio archivo con la cabecera de imports y los
+        comandos anteriores como contexto (ver `declaration_check_code`): los teoremas
+        previos entran como `axiom`, así que una prueba lenta o rota solo afecta a su
+        propio resultado y las siguientes pueden usar su enunciado. Las posiciones de los
+        mensajes son las del archivo original. Se usan hasta `max_concurrency` hilos y
+        los resultados se devuelven en el orden del archivo.
+        """
+        header, commands = split_commands(lean_code)
+        targets = [idx for idx, command in enumerate(commands) if command.is_declaration]
+        if not targets:
+            # Sin declaraciones que separar, el archivo se verifica entero.
+            result = self.evaluate_code(lean_code, handle=handle, source=source)
+            return [LeanDeclarationResult(kind="file", line=1, result=result)]
+
+        handles = [ExecutionHandle() for _ in targets]
+
+        def _cancel_all() -> None:
+            for child in handles:
+                child.cancel()
+
+        if handle is not None:
+            handle.attach(_cancel_all)
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(targets), self.max_concurrency)) as executor:
+                futures = [
+                    executor.submit(
+                        self.evaluate_code,
+                        declaration_check_code(header, commands, idx),
+                        handle=child,
+                        source=source,
+                    )
+                    for idx, child in zip(targets, handles)
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            if handle is not None:
+                handle.detach()
+
+        return [
+            LeanDeclarationResult(
+                name=commands[idx].name, kind=commands[idx].kind, line=commands[idx].line, result=result
+            )
+            for idx, result in zip(targets, results)
+        ]
+
+    async def aevaluate_declarations(
+        self, lean_code: str, source: str = "evaluate_declarations"
+    ) -> list[LeanDeclarationResult]:
+        """Versión asíncrona de `evaluate_declarations` (cancelable)."""
+        return await self._run_cancellable(self.evaluate_declarations, lean_code, source=source)
+
+    def evaluate_many(
+        self, codes: list[str], handle: ExecutionHandle | None = None, source: str = "evaluate_many"
+    ) -> list[LeanExecutionResult]:
+        """Evalúa varios snippets independientes y devuelve un resultado por entrada.
+
+        Los snippets con la misma cabecera de imports se verifican en una sola invocación
+        del contenedor. Cada snippet corre en su propio proceso `lean`, así que un fallo
+        (o un timeout) en uno no afecta a los demás.
+        """
+        started = time.perf_counter()
+        results: list[LeanExecutionResult | None] = [None] * len(codes)
+        keys: list[str | None] = [None] * len(codes)
+        groups: dict[str, list[int]] = {}
+
+        for idx, code in enumerate(codes):
+            if self.cache is not None:
+                keys[idx] = self._cache_key(code, None)
+                cached = self.cache.get(keys[idx])
+                if cached is not None:
+                    results[idx] = LeanExecutionResult.model_validate(cached)
+                    continue
+            groups.setdefault(import_header_key(code), []).append(idx)
+
+        first_tier = self.tiers[0] if self.tiers else None
+
+        def _run_group(indices: list[int], group_handle: ExecutionHandle | None) -> None:
+            group_results = self._evaluate_batch_uncached([codes[idx] for idx in indices], group_handle, first_tier)
+            for idx, result in zip(indices, group_results):
+                cancelled = group_handle is not None and group_handle.cancelled
+                if first_tier is not None:
+                    result.tier = first_tier.name
+                    if len(self.tiers) > 1 and not cancelled and is_resource_timeout(result):
+                        # Solo los snippets que agotaron el presupuesto se repiten, uno a uno.
+                        result = self._evaluate_tiered(codes[idx], None, group_handle, False, start=1)
+                        cancelled = group_handle is not None and group_handle.cancelled
+                results[idx] = result
+                key = keys[idx]
+                payload = result.model_dump(exclude=_EXECUTION_FIELDS)
+                if self.cache is not None and key is not None and not cancelled and _is_cacheable(payload):
+                    self.cache.put(key, payload)
+
+        pending = list(groups.values())
+        if len(pending) == 1:
+            _run_group(pending[0], handle)
+        elif pending:
+            # Cada grupo corre en su propio contenedor: un handle por grupo, y cancelar
+            # `handle` los cancela todos (un handle solo recuerda la última ejecución).
+            handles = [ExecutionHandle() for _ in pending]
+
+            def _cancel_all() -> None:
+                for child in handles:
+                    child.cancel()
+
+            if handle is not None:
+                handle.attach(_cancel_all)
+            try:
+                with ThreadPoolExecutor(max_workers=min(len(pending), self.max_concurrency)) as executor:
+                    list(executor.map(_run_group, pending, handles))
+            finally:
+                if handle is not None:
+                    handle.detach()
+
+        finished = [result for result in results if result is not None]
+        if self.metrics_hooks:
+            # Un evento por llamada: el lote comparte contenedor, no hay tiempos por snippet.
+            emit_event(
+                self.metrics_hooks,
+                EvaluationEvent(
+                    source=source,
+                    duration=time.perf_counter() - started,
+                    success=all(result.success for result in finished),
+                    cached=not pending,
+                    codes=list(codes),
+                    results=finished,
+                ),
+            )
+        return finished
+
+    async def aevaluate_many(self, codes: list[str], source: str = "evaluate_many") -> list[LeanExecutionResult]:
+        """Versión asíncrona de `evaluate_many` (cancelable, respeta `max_concurrency`)."""
+        return await self._run_cancellable(self.evaluate_many, codes, source=source)
+
+    async def _run_cancellable(self, func, *args, **kwargs):
+        """Corre `func(*args, handle=...)` en un hilo; si la tarea se cancela, mata la ejecución."""
+        async with self._get_semaphore():
+            handle = ExecutionHandle()
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, functools.partial(func, *args, handle=handle, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                handle.cancel()
+                raise
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _cache_key(self, lean_code: str, filename: str | None, *extra: str) -> str:
+        return LeanResultCache.make_key(
+            lean_code,
+            filename or DEFAULT_FILENAME,
+            *extra,
+            *(("json",) if self.json_messages else ()),
+            *((f"tiers:{tiers_signature(self.tiers)}",) if self.tiers else ()),
+            self.env_manager.get_runtime_image_id(),
+            self.env_manager.read_lake_manifest(),
+        )
+
+    def cache_stats(self) -> dict[str, int]:
+        """Contadores de aciertos/fallos de la caché (vacío si está desactivada)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _evaluate(
+        self, lean_code: str, filename: str | None, handle: ExecutionHandle | None, fail_fast: bool
+    ) -> LeanExecutionResult:
+        if self.tiers:
+            return self._evaluate_tiered(lean_code, filename, handle, fail_fast)
+        return self._evaluate_uncached(lean_code, filename, handle, fail_fast)
+
+    def _evaluate_tiered(
+        self,
+        lean_code: str,
+        filename: str | None,
+        handle: ExecutionHandle | None,
+        fail_fast: bool,
+        start: int = 0,
+    ) -> LeanExecutionResult:
+        result = LeanExecutionResult(success=False)
+        for tier in self.tiers[start:]:
+            result = self._evaluate_uncached(lean_code, filename, handle, fail_fast, tier)
+            result.tier = tier.name
+            if (handle is not None and handle.cancelled) or not is_resource_timeout(result):
+                break
+        return result
+
+    def _evaluate_uncached(
+        self,
+        lean_code: str,
+        filename: str | None,
+        handle: ExecutionHandle | None = None,
+        fail_fast: bool = False,
+        tier: EvaluationTier | None = None,
+    ) -> LeanExecutionResult:
         workspace_path = self.env_manager.get_workspace_abs_path()
-        full_path = os.path.join(workspace_path, filename)
+        scratch = filename is None
+        relative_path = _new_scratch_path() if scratch else filename
+        full_path = os.path.join(workspace_path, relative_path)
+        module_dir = None
+        if self.header_cache is not None:
+            started = time.perf_counter()
+            lean_code, module_dir = self.header_cache.prepare(lean_code)
+            record_since(handle, "header", started)
 
+        started = time.perf_counter()
         try:
+            if scratch:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
             with open(full_path, "w", encoding="utf-8") as file:
                 file.write(lean_code)
         except OSError as exc:
@@ -44,19 +474,181 @@ class LeanEvaluator:
                 success=False,
                 errors=[f"No se pudo escribir el archivo Lean: {exc}"],
             )
+        record_since(handle, "write_file", started)
 
-        # Preferimos `lake env lean` para respetar el workspace; si `lake` no existe,
-        # hacemos fallback a `lean` para mantener el MVP usable.
-        cmd = f"if command -v lake >/dev/null 2>&1; then lake env lean {filename}; else lean {filename}; fi"
-        exit_code, output = self.env_manager.run_command_in_container(command=cmd, timeout=240)
+        try:
+            # Preferimos `lake env lean` para respetar el workspace; si `lake` no existe,
+            # hacemos fallback a `lean` para mantener el MVP usable.
+            options = self._lean_options(tier)
+            timeout = tier.timeout if tier is not None else DEFAULT_TIMEOUT
+            cmd = (
+                "if command -v lake >/dev/null 2>&1; "
+                f"then lake env lean {options}{relative_path}; else lean {options}{relative_path}; fi"
+            )
+            if module_dir is not None:
+                cmd = lean_command_with_path(relative_path, module_dir, options, self.header_cache.lean_path())
+            if self.streaming or fail_fast or self.max_output_bytes is not None:
+                parser = IncrementalLeanParser(
+                    max_retained_chars=self.max_output_bytes, json_messages=self.json_messages
+                )
 
-        parsed: ParsedLeanOutput = parse_lean_output(output, exit_code)
-        return LeanExecutionResult(
-            success=parsed.success,
-            proof_complete=parsed.proof_complete,
-            has_sorry=parsed.has_sorry,
-            goals=[goal.model_dump() for goal in parsed.goals],
-            errors=parsed.errors,
-            warnings=parsed.warnings,
-            raw_output=parsed.raw_output,
-        )
+                def _on_output(chunk: str) -> bool:
+                    parser.feed(chunk)
+                    # Lean emite cada mensaje completo; cortamos al final del fragmento que
+                    # trae el error para no perder su contexto (p. ej. las metas).
+                    return not (fail_fast and parser.has_errors and chunk.endswith("\n"))
+
+                exit_code, output = self.env_manager.run_command_in_container(
+                    command=cmd,
+                    timeout=timeout,
+                    handle=handle,
+                    on_output=_on_output,
+                    max_output_bytes=self.max_output_bytes,
+                )
+            else:
+                parser = None
+                exit_code, output = self.env_manager.run_command_in_container(
+                    command=cmd, timeout=timeout, handle=handle
+                )
+        finally:
+            if scratch:
+                _remove_quietly(full_path)
+
+        started = time.perf_counter()
+        if scratch:
+            # Los mensajes de Lean citan el archivo temporal; mostramos el nombre estable.
+            output = output.replace(relative_path, DEFAULT_FILENAME)
+        if parser is not None:
+            parsed = parser.finish(exit_code, raw_output=output)
+            if scratch:
+                parsed = _rename_messages(parsed, relative_path, DEFAULT_FILENAME)
+            result = LeanExecutionResult.from_parsed(parsed)
+        else:
+            result = _result_from_output(output, exit_code, self.json_messages)
+        record_since(handle, "parse", started)
+        return result
+
+    def _evaluate_batch_uncached(
+        self, codes: list[str], handle: ExecutionHandle | None = None, tier: EvaluationTier | None = None
+    ) -> list[LeanExecutionResult]:
+        workspace_path = self.env_manager.get_workspace_abs_path()
+        batch_dir = f"{SCRATCH_DIR}/batch_{uuid.uuid4().hex}"
+        relative_paths = [f"{batch_dir}/snippet_{idx}.lean" for idx in range(len(codes))]
+        snippet_timeout = tier.timeout if tier is not None else SNIPPET_TIMEOUT
+        module_dir = None
+        if self.header_cache is not None:
+            # Todos los snippets del lote comparten cabecera (ver `evaluate_many`).
+            prepared = [self.header_cache.prepare(code) for code in codes]
+            if all(item_dir is not None for _, item_dir in prepared):
+                codes = [code for code, _ in prepared]
+                module_dir = prepared[0][1]
+
+        try:
+            os.makedirs(os.path.join(workspace_path, batch_dir), exist_ok=True)
+            for relative_path, code in zip(relative_paths, codes):
+                with open(os.path.join(workspace_path, relative_path), "w", encoding="utf-8") as file:
+                    file.write(code)
+        except OSError as exc:
+            shutil.rmtree(os.path.join(workspace_path, batch_dir), ignore_errors=True)
+            error = LeanExecutionResult(success=False, errors=[f"No se pudo escribir el archivo Lean: {exc}"])
+            return [error.model_copy(deep=True) for _ in codes]
+
+        try:
+            if module_dir is None:
+                prelude = 'if command -v lake >/dev/null 2>&1; then RUN="lake env lean"; else RUN="lean"; fi; '
+            else:
+                prelude = lean_path_export(module_dir, self.header_cache.lean_path()) + 'RUN="lean"; '
+            cmd = (
+                prelude
+                + f"for f in {' '.join(relative_paths)}; do "
+                f'echo "{BATCH_BEGIN_MARKER} $f"; timeout {snippet_timeout} $RUN {self._lean_options(tier)}"$f" 2>&1; '
+                f'echo "{BATCH_END_MARKER} $f $?"; done'
+            )
+            exit_code, output = self.env_manager.run_command_in_container(
+                command=cmd, timeout=snippet_timeout * len(codes) + 60, handle=handle
+            )
+        finally:
+            shutil.rmtree(os.path.join(workspace_path, batch_dir), ignore_errors=True)
+
+        sections = _split_batch_output(output)
+        results = []
+        for relative_path in relative_paths:
+            section = sections.get(relative_path)
+            if section is None:
+                # El contenedor no llegó a este snippet (error Docker, cancelación...).
+                detail = output.strip().splitlines()[0] if exit_code == -1 and output.strip() else ""
+                message = f"Lean no produjo salida para este snippet (código {exit_code}). {detail}".strip()
+                results.append(LeanExecutionResult(success=False, errors=[message], raw_output=output))
+                continue
+            snippet_exit, snippet_output = section
+            snippet_output = snippet_output.replace(relative_path, DEFAULT_FILENAME)
+            if snippet_exit == 124:
+                # `timeout` mató el proceso: lo dejamos explícito (y fuera de la caché).
+                snippet_output += f"\nError Docker: tiempo límite de {snippet_timeout}s excedido.\n"
+            results.append(_result_from_output(snippet_output, snippet_exit, self.json_messages))
+        return results
+
+    def _lean_options(self, tier: EvaluationTier | None = None) -> str:
+        """Opciones de línea de comandos de `lean` (con espacio final si hay alguna)."""
+        options = "--json " if self.json_messages else ""
+        if tier is not None:
+            options += tier.lean_options
+        return options
+
+
+def _split_batch_output(output: str) -> dict[str, tuple[int, str]]:
+    """Separa la salida de un batch por snippet usando los marcadores BEGIN/END."""
+    sections: dict[str, tuple[int, str]] = {}
+    current: str | None = None
+    buffer: list[str] = []
+    for line in output.splitlines(keepends=True):
+        if line.startswith(BATCH_BEGIN_MARKER):
+            current = line[len(BATCH_BEGIN_MARKER) :].strip()
+            buffer = []
+        elif line.startswith(BATCH_END_MARKER) and current is not None:
+            parts = line[len(BATCH_END_MARKER) :].split()
+            try:
+                snippet_exit = int(parts[-1])
+            except (IndexError, ValueError):
+                snippet_exit = -1
+            sections[current] = (snippet_exit, "".join(buffer))
+            current = None
+        elif current is not None:
+            buffer.append(line)
+    return sections
+
+
+def _result_from_output(output: str, exit_code: int, json_messages: bool = False) -> LeanExecutionResult:
+    if json_messages:
+        return LeanExecutionResult.from_parsed(parse_lean_json_output(output, exit_code))
+    return LeanExecutionResult.from_parsed(parse_lean_output(output, exit_code))
+
+
+def _rename_messages(parsed: ParsedLeanOutput, path: str, display_name: str) -> ParsedLeanOutput:
+    """Reemplaza la ruta temporal por el nombre estable en los diagnósticos JSON."""
+    if not parsed.messages:
+        return parsed
+    messages = [
+        message.model_copy(update={"file_name": message.file_name.replace(path, display_name)})
+        for message in parsed.messages
+    ]
+    return parsed.model_copy(update={"messages": messages})
+
+
+def _new_scratch_path() -> str:
+    return f"{SCRATCH_DIR}/check_{uuid.uuid4().hex}.lean"
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _is_cacheable(payload: dict[str, object]) -> bool:
+    """No cacheamos fallos de infraestructura (Docker, disco): son transitorios."""
+    errors = payload.get("errors") or []
+    return not any(
+        marker in str(error) for error in errors for marker in _TRANSIENT_ERROR_MARKERS  # type: ignore[union-attr]
+    )
@@ -0,0 +1,114 @@
+﻿from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from langchain_lean.core.parser import LeanGoal
+
+# Identificador Lean suelto (no la parte tras un `.` de un nombre calificado).
+_IDENT_RE = re.compile(r"(?<![\w.'✝!?])[^\W\d][\w'✝!?]*")
+# Hipótesis `a b : T` (o `x : T := v`): nombres separados por espacios y luego ` : `.
+_HYPOTHESIS_RE = re.compile(r"^((?:[^\W\d][\w'✝!?]*\s+)*[^\W\d][\w'✝!?]*)\s+:\s+(.*)$", flags=re.DOTALL)
+# Binder seguido de sus variables, hasta `,`, `=>` o `↦`.
+_BINDER_RE = re.compile(r"(?:∀|∃!?|fun|λ|Π|Σ|∑|∏|⋃|⋂)\s+([^,]+?)\s*(?:,|=>|↦)")
+# Lo que sigue a los nombres dentro de un grupo de binder (`x : T`, `x ∈ s`, `x < n`...).
+_BINDER_TAIL_RE = re.compile(r"\s*(?::|∈|∉|⊆|<|≤|>|≥|≠).*$", flags=re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_HYPOTHESIS_PREFIX = "h✝"
+_BOUND_PREFIX = "b✝"
+
+
+@dataclass(frozen=True)
+class CanonicalGoals:
+    """Forma canónica de una lista de metas.
+
+    `renaming` lleva cada nombre de hipótesis original a su nombre canónico; sirve para
+    traducir tácticas (`exact h`) y resultados entre metas equivalentes.
+    """
+
+    text: str
+    fingerprint: str
+    renaming: dict[str, str] = field(default_factory=dict)
+
+
+def canonicalize_goals(goals: Sequence[LeanGoal | dict[str, Any]]) -> CanonicalGoals:
+    """Normaliza espacios, ordena hipótesis y renombra hipótesis y variables ligadas.
+
+    Dos listas de metas que solo difieren en nombres de hipótesis, nombres de variables
+    ligadas, orden de hipótesis independientes o espacios producen el mismo `fingerprint`.
+    Es una aproximación sintáctica: metas equivalentes pueden no coincidir, pero metas
+    con la misma huella son iguales salvo renombrado.
+    """
+    renaming: dict[str, str] = {}
+    rendered: list[str] = []
+    for goal in goals:
+        context, target = _goal_parts(goal)
+        hypotheses = _split_hypotheses(context)
+        names = {name for name, _ in hypotheses if name}
+        # Ordenamos por la forma del tipo (sin nombres de hipótesis); el orden original desempata.
+        ordered = sorted(
+            enumerate(hypotheses), key=lambda item: (_mask_names(item[1][1], names), item[0])
+        )
+        for _, (name, _type) in ordered:
+            if name:
+                renaming.setdefault(name, f"{_HYPOTHESIS_PREFIX}{len(renaming)}")
+        lines = [
+            f"{renaming[name]} : {rename_identifiers(_type, renaming)}" if name else rename_identifiers(_type, renaming)
+            for _, (name, _type) in ordered
+        ]
+        lines.append(f"⊢ {rename_identifiers(target, renaming)}")
+        rendered.append(_rename_bound_variables("\n".join(lines)))
+
+    text = "\n\n".join(rendered)
+    return CanonicalGoals(text=text, fingerprint=hashlib.sha256(text.encode("utf-8")).hexdigest(), renaming=renaming)
+
+
+def goal_fingerprint(goals: Sequence[LeanGoal | dict[str, Any]]) -> str:
+    return canonicalize_goals(goals).fingerprint
+
+
+def rename_identifiers(text: str, mapping: dict[str, str]) -> str:
+    """Sustituye identificadores completos de `text` según `mapping` (normalizando espacios)."""
+    normalized = _WHITESPACE_RE.sub(" ", text).strip()
+    if not mapping:
+        return normalized
+    return _IDENT_RE.sub(lambda match: mapping.get(match.group(0), match.group(0)), normalized)
+
+
+def _goal_parts(goal: LeanGoal | dict[str, Any]) -> tuple[list[str], str]:
+    if isinstance(goal, LeanGoal):
+        return list(goal.context), goal.goal
+    return [str(line) for line in goal.get("context") or []], str(goal.get("goal", ""))
+
+
+def _split_hypotheses(context: list[str]) -> list[tuple[str, str]]:
+    """Parte el contexto en `(nombre, tipo)`, separando `a b : T` y uniendo líneas de continuación."""
+    grouped: list[tuple[list[str], str]] = []
+    for line in context:
+        match = _HYPOTHESIS_RE.match(line.strip())
+        if match:
+            grouped.append((match.group(1).split(), match.group(2)))
+        elif grouped:
+            names, _type = grouped[-1]
+            grouped[-1] = (names, f"{_type} {line.strip()}")
+        else:
+            grouped.append(([], line.strip()))
+    return [(name, _type) for names, _type in grouped for name in names or [""]]
+
+
+def _mask_names(text: str, names: set[str]) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", text).strip()
+    return _IDENT_RE.sub(lambda match: "_" if match.group(0) in names else match.group(0), normalized)
+
+
+def _rename_bound_variables(text: str) -> str:
+    bound: dict[str, str] = {}
+    for match in _BINDER_RE.finditer(text):
+        for segment in re.split(r"[()\[\]{}⦃⦄]", match.group(1)):
+            for name in _IDENT_RE.findall(_BINDER_TAIL_RE.sub("", segment)):
+                if not name.startswith(_HYPOTHESIS_PREFIX):
+                    bound.setdefault(name, f"{_BOUND_PREFIX}{len(bound)}")
+    return _IDENT_RE.sub(lambda match: bound.get(match.group(0), match.group(0)), text) if bound else text
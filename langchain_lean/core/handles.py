@@ -0,0 +1,60 @@
+﻿from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+CANCELLED_MESSAGE = "Ejecución cancelada."
+
+
+class ExecutionHandle:
+    """Permite cancelar (matar) una ejecución en curso desde otro hilo o tarea.
+
+    También acumula la duración de cada fase de la ejecución (`timings`) y, si el
+    backend puede medirlo, el pico de memoria del contenedor.
+    """
+
+    def __init__(self, track_memory: bool = False) -> None:
+        self._lock = threading.Lock()
+        self._kill: Callable[[], None] | None = None
+        self.cancelled = False
+        self.track_memory = track_memory
+        self.timings: dict[str, float] = {}
+        self.peak_memory_bytes: int | None = None
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Suma `seconds` a la fase `phase`."""
+        with self._lock:
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def attach(self, kill: Callable[[], None]) -> None:
+        """Registra cómo matar la ejecución; si ya se canceló, la mata de inmediato."""
+        with self._lock:
+            self._kill = kill
+            cancelled = self.cancelled
+        if cancelled:
+            _call_quietly(kill)
+
+    def detach(self) -> None:
+        with self._lock:
+            self._kill = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            kill = self._kill
+        if kill is not None:
+            _call_quietly(kill)
+
+
+def record_since(handle: ExecutionHandle | None, phase: str, started: float) -> None:
+    """Registra en `handle` (si existe) el tiempo transcurrido desde `started` (`perf_counter`)."""
+    if handle is not None:
+        handle.record(phase, time.perf_counter() - started)
+
+
+def _call_quietly(func: Callable[[], None]) -> None:
+    try:
+        func()
+    except Exception:
+        pass
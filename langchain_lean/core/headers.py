@@ -0,0 +1,161 @@
+﻿from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shlex
+import threading
+from typing import Any
+
+from langchain_lean.core.source import import_header_key, split_import_header
+
+logger = logging.getLogger("langchain-lean-env")
+
+# Directorio (relativo al workspace) con los módulos de cabecera precompilados.
+HEADERS_DIR = ".langchain_lean_headers"
+MODULE_PREFIX = "LangchainLeanHeader_"
+
+
+class HeaderEnvironmentCache:
+    """Precompila la cabecera de imports de los snippets a un módulo `.olean` reutilizable.
+
+    El primer snippet con una cabecera dada paga la compilación de un módulo que solo
+    contiene esos imports; los siguientes reemplazan su cabecera por `import` de ese
+    módulo. La huella incluye `lake-manifest.json`, `lean-toolchain` y el id de imagen,
+    así que un cambio de dependencias o de toolchain invalida los módulos automáticamente.
+
+    El `LEAN_PATH` de lake también se calcula una sola vez por entorno (ver `lean_path`),
+    de modo que los snippets con cabecera precompilada corren `lean` sin arrancar lake.
+    """
+
+    def __init__(self, env_manager: Any, build_timeout: int = 1200):
+        self.env_manager = env_manager
+        self.build_timeout = build_timeout
+        self.builds = 0
+        self.hits = 0
+
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._failed: set[str] = set()
+        self._lean_paths: dict[str, str | None] = {}
+        self._lean_paths_lock = threading.Lock()
+
+    def prepare(self, code: str) -> tuple[str, str | None]:
+        """Devuelve `(código, dir_para_LEAN_PATH)`; el dir es None si no se usa módulo."""
+        key = import_header_key(code)
+        if not key:
+            return code, None
+
+        fingerprint = self.fingerprint(key)
+        module_dir = self._ensure_built(key, fingerprint)
+        if module_dir is None:
+            return code, None
+
+        header, body = split_import_header(code)
+        # Mantenemos el mismo número de líneas para que las posiciones de Lean no cambien.
+        padding = "\n" * max(1, header.count("\n"))
+        return f"import {MODULE_PREFIX}{fingerprint}{padding}{body}", module_dir
+
+    def fingerprint(self, header_key: str) -> str:
+        digest = hashlib.sha256()
+        for part in (
+            header_key,
+            self.env_manager.read_lake_manifest(),
+            self.env_manager.read_lean_toolchain(),
+            self.env_manager.get_runtime_image_id(),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()[:24]
+
+    def lean_path(self) -> str | None:
+        """`LEAN_PATH` que calcula `lake env` para el entorno actual, o None si no hay lake.
+
+        `lake env printenv LEAN_PATH` relee el manifiesto y la configuración del workspace
+        en cada llamada; el valor solo cambia con las dependencias o el toolchain, así que
+        se guarda por huella de entorno.
+        """
+        key = self.fingerprint("")
+        with self._lean_paths_lock:
+            if key not in self._lean_paths:
+                self._lean_paths[key] = self._resolve_lean_path()
+            return self._lean_paths[key]
+
+    def _resolve_lean_path(self) -> str | None:
+        cmd = "if command -v lake >/dev/null 2>&1; then lake env printenv LEAN_PATH; else exit 127; fi"
+        exit_code, output = self.env_manager.run_command_in_container(command=cmd, timeout=self.build_timeout)
+        lines = output.strip().splitlines()
+        if exit_code != 0 or not lines:
+            logger.warning("No se pudo obtener LEAN_PATH de lake (%s): %s", exit_code, output.strip()[:500])
+            return None
+        return lines[-1].strip()
+
+    def _ensure_built(self, header_key: str, fingerprint: str) -> str | None:
+        if fingerprint in self._failed:
+            return None
+        module_dir = f"{HEADERS_DIR}/{fingerprint}"
+        module_name = f"{MODULE_PREFIX}{fingerprint}"
+        workspace = self.env_manager.get_workspace_abs_path()
+        olean_path = os.path.join(workspace, module_dir, f"{module_name}.olean")
+
+        if os.path.exists(olean_path):
+            self.hits += 1
+            return module_dir
+
+        with self._lock_for(fingerprint):
+            if os.path.exists(olean_path):
+                self.hits += 1
+                return module_dir
+            if fingerprint in self._failed:
+                return None
+
+            source = f"{module_dir}/{module_name}.lean"
+            try:
+                os.makedirs(os.path.join(workspace, module_dir), exist_ok=True)
+                with open(os.path.join(workspace, source), "w", encoding="utf-8") as file:
+                    file.write(header_key + "\n")
+            except OSError as exc:
+                logger.warning("No se pudo escribir el módulo de cabecera: %s", exc)
+                self._failed.add(fingerprint)
+                return None
+
+            output_path = f"{module_dir}/{module_name}.olean"
+            cmd = (
+                "if command -v lake >/dev/null 2>&1; "
+                f"then lake env lean -o {output_path} {source}; else lean -o {output_path} {source}; fi"
+            )
+            logger.info("Compilando cabecera de imports %s...", module_name)
+            exit_code, output = self.env_manager.run_command_in_container(command=cmd, timeout=self.build_timeout)
+            if exit_code != 0 or not os.path.exists(olean_path):
+                logger.warning("No se pudo compilar la cabecera (%s): %s", exit_code, output.strip()[:500])
+                self._failed.add(fingerprint)
+                return None
+
+            self.builds += 1
+            return module_dir
+
+    def _lock_for(self, fingerprint: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(fingerprint, threading.Lock())
+
+
+def lean_path_export(module_dir: str, lean_path: str | None = None) -> str:
+    """Prefijo de shell que agrega `module_dir` al `LEAN_PATH` de lake.
+
+    Con `lean_path` (ver `HeaderEnvironmentCache.lean_path`) se exporta directamente; sin
+    él se pregunta a lake en el propio comando.
+    """
+    if lean_path is not None:
+        return f'export LEAN_PATH={shlex.quote(lean_path)}:"$PWD/{module_dir}"; '
+    return (
+        "if command -v lake >/dev/null 2>&1; "
+        f'then export LEAN_PATH="$(lake env printenv LEAN_PATH):$PWD/{module_dir}"; '
+        f'else export LEAN_PATH="$LEAN_PATH:$PWD/{module_dir}"; fi; '
+    )
+
+
+def lean_command_with_path(
+    relative_path: str, module_dir: str, options: str = "", lean_path: str | None = None
+) -> str:
+    """Comando `lean` con `module_dir` agregado al `LEAN_PATH` de lake."""
+    return f"{lean_path_export(module_dir, lean_path)}lean {options}{relative_path}"
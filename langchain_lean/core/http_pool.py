@@ -0,0 +1,74 @@
+﻿from __future__ import annotations
+
+import http.client
+import queue
+import threading
+from urllib.parse import urlsplit
+
+# Errores tras los que una conexión keep-alive se descarta y se reintenta con una nueva.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError, BrokenPipeError)
+
+
+class HTTPConnectionPool:
+    """Conexiones HTTP keep-alive reutilizables hacia un único host (hasta `max_connections`)."""
+
+    def __init__(self, base_url: str, timeout: float = 12, max_connections: int = 4):
+        parts = urlsplit(base_url)
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.requests = 0
+        self.prefix = parts.path.rstrip("/")
+
+        self._scheme = parts.scheme or "https"
+        self._host = parts.hostname or ""
+        self._port = parts.port
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None, headers: dict[str, str] | None = None
+    ) -> tuple[int, str, bytes]:
+        """Envía la petición y devuelve `(status, reason, cuerpo)`."""
+        request_headers = {"Connection": "keep-alive", **(headers or {})}
+        with self._slots:
+            for attempt in range(2):
+                connection = self._checkout()
+                try:
+                    connection.request(method, f"{self.prefix}{path}", body=body, headers=request_headers)
+                    response = connection.getresponse()
+                    payload = response.read()
+                except _STALE_CONNECTION_ERRORS:
+                    connection.close()
+                    if attempt == 0:
+                        # El servidor cerró la conexión reutilizada: reintentamos con una nueva.
+                        continue
+                    raise
+                except Exception:
+                    connection.close()
+                    raise
+
+                with self._lock:
+                    self.requests += 1
+                if response.will_close:
+                    connection.close()
+                else:
+                    self._idle.put(connection)
+                return response.status, response.reason, payload
+        raise RuntimeError("No se pudo completar la petición HTTP.")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _checkout(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
@@ -0,0 +1,122 @@
+﻿from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger("langchain-lean-env")
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 240.0)
+
+
+@dataclass
+class EvaluationEvent:
+    """Una evaluación terminada, tal como la reciben los hooks de métricas."""
+
+    source: str
+    duration: float
+    success: bool
+    cached: bool = False
+    timings: dict[str, float] = field(default_factory=dict)
+    peak_memory_bytes: int | None = None
+    # Snippets evaluados y sus resultados, en orden (p. ej. para `TraceRecorder`).
+    codes: list[str] = field(default_factory=list)
+    results: list[Any] = field(default_factory=list)
+
+
+MetricsHook = Callable[[EvaluationEvent], None]
+
+
+def emit_event(hooks: list[MetricsHook], event: EvaluationEvent) -> None:
+    """Entrega `event` a cada hook; un hook que falla no afecta a la evaluación."""
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as exc:
+            logger.warning("Hook de métricas falló: %s", exc)
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+        self.total += value
+        self.count += 1
+
+
+class PrometheusMetrics:
+    """Hook de métricas que acumula contadores e histogramas en formato texto de Prometheus.
+
+    Se registra como cualquier hook (`LeanEvaluator(metrics_hooks=[metrics])`) y
+    `render()` devuelve el texto listo para servir en `/metrics`.
+    """
+
+    def __init__(self, namespace: str = "langchain_lean", buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._evaluations: dict[tuple[str, str], int] = {}
+        self._durations: dict[str, _Histogram] = {}
+        self._phases: dict[tuple[str, str], _Histogram] = {}
+        self._peak_memory: dict[str, int] = {}
+
+    def __call__(self, event: EvaluationEvent) -> None:
+        outcome = "cached" if event.cached else ("success" if event.success else "failure")
+        with self._lock:
+            key = (event.source, outcome)
+            self._evaluations[key] = self._evaluations.get(key, 0) + 1
+            self._durations.setdefault(event.source, _Histogram(self.buckets)).observe(event.duration)
+            for phase, seconds in event.timings.items():
+                self._phases.setdefault((event.source, phase), _Histogram(self.buckets)).observe(seconds)
+            if event.peak_memory_bytes is not None:
+                previous = self._peak_memory.get(event.source, 0)
+                self._peak_memory[event.source] = max(previous, event.peak_memory_bytes)
+
+    def render(self) -> str:
+        ns = self.namespace
+        lines: list[str] = []
+        with self._lock:
+            lines.append(f"# HELP {ns}_evaluations_total Evaluaciones Lean por fuente y resultado.")
+            lines.append(f"# TYPE {ns}_evaluations_total counter")
+            for (source, outcome), value in sorted(self._evaluations.items()):
+                lines.append(f'{ns}_evaluations_total{{source="{_escape(source)}",outcome="{outcome}"}} {value}')
+
+            lines.append(f"# HELP {ns}_evaluation_seconds Latencia total de cada evaluación.")
+            lines.append(f"# TYPE {ns}_evaluation_seconds histogram")
+            for source, histogram in sorted(self._durations.items()):
+                lines.extend(_render_histogram(f"{ns}_evaluation_seconds", f'source="{_escape(source)}"', histogram))
+
+            lines.append(f"# HELP {ns}_phase_seconds Duración por fase (escritura, contenedor, Lean, parseo...).")
+            lines.append(f"# TYPE {ns}_phase_seconds histogram")
+            for (source, phase), histogram in sorted(self._phases.items()):
+                labels = f'source="{_escape(source)}",phase="{_escape(phase)}"'
+                lines.extend(_render_histogram(f"{ns}_phase_seconds", labels, histogram))
+
+            lines.append(f"# HELP {ns}_peak_memory_bytes Pico de memoria observado en el contenedor.")
+            lines.append(f"# TYPE {ns}_peak_memory_bytes gauge")
+            for source, value in sorted(self._peak_memory.items()):
+                lines.append(f'{ns}_peak_memory_bytes{{source="{_escape(source)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(name: str, labels: str, histogram: _Histogram) -> list[str]:
+    lines = [
+        f'{name}_bucket{{{labels},le="{bound:g}"}} {count}'
+        for bound, count in zip(histogram.buckets, histogram.counts)
+    ]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
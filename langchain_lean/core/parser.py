@@ -1,4 +1,5 @@
-﻿import re
+﻿import json
+import re
 from typing import Any
 
 from pydantic import BaseModel, Field
@@ -11,6 +12,18 @@ class LeanGoal(BaseModel):
     goal: str
 
 
+class LeanMessage(BaseModel):
+    """Diagnóstico de Lean con posición, tal como lo emite `lean --json`."""
+
+    file_name: str = ""
+    line: int | None = None
+    column: int | None = None
+    end_line: int | None = None
+    end_column: int | None = None
+    severity: str
+    text: str
+
+
 class ParsedLeanOutput(BaseModel):
     """Salida normalizada para que el agente consuma Lean como JSON."""
 
@@ -20,11 +33,13 @@ class ParsedLeanOutput(BaseModel):
     errors: list[str] = Field(default_factory=list)
     warnings: list[str] = Field(default_factory=list)
     goals: list[LeanGoal] = Field(default_factory=list)
+    messages: list[LeanMessage] = Field(default_factory=list)
     raw_output: str = ""
 
 
 _ERROR_RE = re.compile(r"\berror:\s*(.+)", flags=re.IGNORECASE)
 _WARNING_RE = re.compile(r"\bwarning:\s*(.+)", flags=re.IGNORECASE)
+_SORRY_WARNING = "declaration uses 'sorry'"
 
 
 def parse_lean_output(raw_output: str, exit_code: int) -> ParsedLeanOutput:
@@ -55,6 +70,154 @@ def parse_lean_output(raw_output: str, exit_code: int) -> ParsedLeanOutput:
     )
 
 
+def parse_lean_json_output(raw_output: str, exit_code: int) -> ParsedLeanOutput:
+    """Parsea la salida de `lean --json` (un mensaje JSON por línea) en una sola pasada.
+
+    Cada mensaje conserva archivo, posición, severidad y texto completo. `has_sorry` solo
+    se activa con el warning `declaration uses 'sorry'` y las metas se toman únicamente
+    de los errores `unsolved goals`. Las líneas que no son JSON (p. ej. salida de lake)
+    se tratan como en `parse_lean_output`.
+    """
+    parser = IncrementalLeanParser(json_messages=True)
+    parser.feed(raw_output or "")
+    return parser.finish(exit_code, raw_output=raw_output or "")
+
+
+class IncrementalLeanParser:
+    """Versión incremental de `parse_lean_output` para salida leída en streaming.
+
+    Errores y warnings se detectan línea a línea según llegan los fragmentos, lo que
+    permite abortar en el primer error. Solo se retienen `max_retained_chars` de texto
+    para extraer metas al final. Con `json_messages=True` interpreta la salida de
+    `lean --json` (ver `parse_lean_json_output`).
+    """
+
+    def __init__(self, max_retained_chars: int | None = None, json_messages: bool = False):
+        self.max_retained_chars = max_retained_chars
+        self.json_messages = json_messages
+        self.errors: list[str] = []
+        self.warnings: list[str] = []
+        self.messages: list[LeanMessage] = []
+        self.has_sorry = False
+        self._goals: list[LeanGoal] = []
+        self._pending = ""
+        self._lines: list[str] = []
+        self._retained_chars = 0
+
+    @property
+    def has_errors(self) -> bool:
+        return bool(self.errors)
+
+    def feed(self, chunk: str) -> None:
+        text = self._pending + chunk
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._consume(line)
+
+    def finish(self, exit_code: int, raw_output: str | None = None) -> ParsedLeanOutput:
+        if self._pending:
+            self._consume(self._pending)
+            self._pending = ""
+        text = raw_output if raw_output is not None else "\n".join(self._lines)
+
+        errors = list(self.errors)
+        if exit_code != 0 and not errors:
+            fallback = text.strip()
+            if fallback:
+                errors = [fallback]
+        goals = list(self._goals) if self.json_messages else _extract_goals(self._lines)
+        success = exit_code == 0 and not errors
+        return ParsedLeanOutput(
+            success=success,
+            proof_complete=success and not goals and not self.has_sorry,
+            has_sorry=self.has_sorry,
+            errors=errors,
+            warnings=list(self.warnings),
+            goals=goals,
+            messages=list(self.messages),
+            raw_output=text,
+        )
+
+    def _consume(self, line: str) -> None:
+        if self.json_messages and (message := _message_from_json(line)) is not None:
+            self._consume_message(message)
+            return
+        if (match := _ERROR_RE.search(line)) is not None:
+            self.errors.append(match.group(1).strip())
+        if (match := _WARNING_RE.search(line)) is not None:
+            self.warnings.append(match.group(1).strip())
+        if not self.json_messages and "sorry" in line.lower():
+            self.has_sorry = True
+        if self.max_retained_chars is None or self._retained_chars + len(line) <= self.max_retained_chars:
+            self._lines.append(line)
+            self._retained_chars += len(line) + 1
+
+    def _consume_message(self, message: LeanMessage) -> None:
+        self.messages.append(message)
+        if message.severity == "error":
+            self.errors.append(message.text)
+            if message.text.startswith("unsolved goals"):
+                self._goals.extend(_extract_goals_forward(message.text.splitlines()))
+        elif message.severity == "warning":
+            self.warnings.append(message.text)
+            if message.text.startswith(_SORRY_WARNING):
+                self.has_sorry = True
+
+
+def _message_from_json(line: str) -> LeanMessage | None:
+    stripped = line.strip()
+    if not stripped.startswith("{"):
+        return None
+    try:
+        payload = json.loads(stripped)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or "severity" not in payload or "data" not in payload:
+        return None
+    pos = payload.get("pos") or {}
+    end_pos = payload.get("endPos") or {}
+    return LeanMessage(
+        file_name=str(payload.get("fileName") or ""),
+        line=pos.get("line"),
+        column=pos.get("column"),
+        end_line=end_pos.get("line"),
+        end_column=end_pos.get("column"),
+        severity=str(payload["severity"]),
+        text=str(payload["data"]).strip(),
+    )
+
+
+def _extract_goals_forward(lines: list[str]) -> list[LeanGoal]:
+    """Extrae metas en una pasada: el contexto se acumula hasta el `⊢` que lo cierra."""
+    goals: list[LeanGoal] = []
+    context: list[str] = []
+    in_goal = False
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            context = []
+            in_goal = False
+            continue
+        marker = stripped.find("⊢")
+        if marker >= 0:
+            goals.append(LeanGoal(context=context, goal=stripped[marker + 1 :].strip() or "(meta vacía)"))
+            context = []
+            in_goal = True
+        elif in_goal and line[:1].isspace():
+            # Meta partida en varias líneas por el pretty-printer.
+            goals[-1].goal = f"{goals[-1].goal} {stripped}"
+        elif not stripped.startswith("unsolved goals"):
+            in_goal = False
+            context.append(stripped)
+    return goals
+
+
+def extract_goals(text: str) -> list[LeanGoal]:
+    """Extrae metas (`⊢`) con su contexto desde un bloque de texto de Lean."""
+    return _extract_goals((text or "").splitlines())
+
+
 def _extract_goals(lines: list[str]) -> list[LeanGoal]:
     goals: list[LeanGoal] = []
     for idx, line in enumerate(lines):
@@ -0,0 +1,266 @@
+﻿from __future__ import annotations
+
+import logging
+import os
+import queue
+import shlex
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger("langchain-lean-env")
+
+# Memoria estimada por worker con Mathlib cargado; se usa para acotar el tamaño por defecto.
+DEFAULT_WORKER_MEMORY_BYTES = 4 * 1024**3
+
+# Código de salida de `timeout` cuando el comando excede el tiempo límite.
+TIMEOUT_EXIT_CODE = 124
+
+
+def default_pool_size(worker_memory_bytes: int = DEFAULT_WORKER_MEMORY_BYTES) -> int:
+    """Calcula un tamaño de pool razonable según núcleos y memoria del host."""
+    cores = os.cpu_count() or 1
+    try:
+        total_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return cores
+    by_memory = max(1, total_memory // max(1, worker_memory_bytes))
+    return max(1, min(cores, by_memory))
+
+
+@dataclass(eq=False)
+class _PoolWorker:
+    container: Any
+    runs: int = 0
+    last_check: float = field(default_factory=time.monotonic)
+
+
+class LeanContainerPool:
+    """Mantiene contenedores Lean de larga vida y les envía comandos vía `exec`."""
+
+    def __init__(
+        self,
+        client: Any,
+        image: str,
+        volumes: dict[str, dict[str, str]],
+        size: int | None = None,
+        max_runs_per_worker: int = 50,
+        health_check_interval: float = 30.0,
+    ):
+        self.client = client
+        self.image = image
+        self.volumes = volumes
+        self.size = max(1, size or default_pool_size())
+        self.max_runs_per_worker = max(1, max_runs_per_worker)
+        self.health_check_interval = health_check_interval
+
+        self._idle: queue.Queue[_PoolWorker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers: list[_PoolWorker] = []
+        self._closed = False
+
+    def run(self, command: str, timeout: int = 180, handle: Any = None) -> tuple[int, str]:
+        """Ejecuta `command` en un worker libre y lo devuelve al pool.
+
+        `handle` (un `ExecutionHandle`) permite cancelar: un `exec` no se puede matar por
+        separado, así que se mata el contenedor del worker y este se recicla.
+        """
+        worker = self._acquire()
+        healthy = True
+        if handle is not None:
+            handle.attach(worker.container.kill)
+        try:
+            wrapped = f"timeout -k 5 {int(timeout)} bash -lc {shlex.quote(command)}"
+            result = worker.container.exec_run(["bash", "-lc", wrapped], workdir="/workspace")
+            if handle is not None and handle.cancelled:
+                healthy = False
+            exit_code = int(result.exit_code if result.exit_code is not None else 1)
+            output = (result.output or b"").decode("utf-8", errors="replace")
+            if exit_code == TIMEOUT_EXIT_CODE:
+                return -1, f"Error Docker: tiempo límite de {timeout}s excedido.\n{output}"
+            return exit_code, output
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if handle is not None:
+                handle.detach()
+            worker.runs += 1
+            self._release(worker, healthy=healthy)
+
+    def stream(self, command: str, capture: Any, timeout: int = 180, handle: Any = None) -> int:
+        """Como `run`, pero entrega la salida a `capture` (un `OutputCapture`) a medida que llega.
+
+        Si `capture` pide detenerse (p. ej. fail-fast tras el primer error) solo se mata el
+        proceso del comando, no el contenedor, así que el worker sigue siendo reutilizable.
+        """
+        worker = self._acquire()
+        healthy = True
+        pid_file = f"/tmp/langchain_lean_{uuid.uuid4().hex}.pid"
+        api = self.client.api
+
+        def _kill_command() -> None:
+            worker.container.exec_run(["bash", "-lc", f"kill -TERM $(cat {pid_file}) 2>/dev/null"])
+
+        if handle is not None:
+            handle.attach(_kill_command)
+        try:
+            wrapped = (
+                f"echo $$ > {pid_file}; "
+                f"exec timeout -k 5 {int(timeout)} bash -lc {shlex.quote(command)}"
+            )
+            exec_id = api.exec_create(worker.container.id, ["bash", "-lc", wrapped], workdir="/workspace")["Id"]
+            stopped_early = False
+            for chunk in api.exec_start(exec_id, stream=True):
+                if not capture.write(chunk):
+                    stopped_early = True
+                    _kill_command()
+                    break
+
+            exit_code = self._wait_exec_exit_code(api, exec_id)
+            if stopped_early:
+                return 1
+            if exit_code == TIMEOUT_EXIT_CODE:
+                capture.write(f"\nError Docker: tiempo límite de {timeout}s excedido.\n".encode("utf-8"))
+                return -1
+            return exit_code
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if handle is not None:
+                handle.detach()
+            try:
+                worker.container.exec_run(["rm", "-f", pid_file])
+            except Exception:
+                healthy = False
+            worker.runs += 1
+            self._release(worker, healthy=healthy)
+
+    @staticmethod
+    def _wait_exec_exit_code(api: Any, exec_id: str, attempts: int = 50) -> int:
+        for _ in range(attempts):
+            info = api.exec_inspect(exec_id)
+            if not info.get("Running") and info.get("ExitCode") is not None:
+                return int(info["ExitCode"])
+            time.sleep(0.1)
+        return -1
+
+    def start(self) -> None:
+        """Arranca todos los workers por adelantado (opcional; por defecto son perezosos)."""
+        started = []
+        for _ in range(self.size):
+            worker = self._try_create_worker()
+            if worker is None:
+                break
+            started.append(worker)
+        for worker in started:
+            self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        """Detiene y elimina todos los contenedores del pool."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for worker in workers:
+            self._remove_container(worker)
+
+    @property
+    def worker_count(self) -> int:
+        with self._lock:
+            return len(self._workers)
+
+    def _acquire(self) -> _PoolWorker:
+        while True:
+            worker = self._next_worker()
+            if self._needs_health_check(worker) and not self._is_healthy(worker):
+                logger.warning("Worker del pool no saludable; reemplazando contenedor.")
+                self._discard(worker)
+                continue
+            return worker
+
+    def _next_worker(self) -> _PoolWorker:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            worker = self._try_create_worker()
+            if worker is not None:
+                return worker
+            # Si un worker se recicla mientras esperamos, se libera cupo para crear otro.
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _release(self, worker: _PoolWorker, healthy: bool) -> None:
+        if self._closed:
+            self._remove_container(worker)
+            return
+        if not healthy or worker.runs >= self.max_runs_per_worker:
+            self._discard(worker)
+            return
+        self._idle.put(worker)
+
+    def _try_create_worker(self) -> _PoolWorker | None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de contenedores Lean fue cerrado.")
+            if len(self._workers) >= self.size:
+                return None
+            # Reservamos el cupo antes de crear el contenedor para no exceder `size`.
+            placeholder = _PoolWorker(container=None)
+            self._workers.append(placeholder)
+
+        try:
+            placeholder.container = self.client.containers.run(
+                self.image,
+                command="sleep infinity",
+                volumes=self.volumes,
+                working_dir="/workspace",
+                detach=True,
+                remove=False,
+                labels={"langchain-lean.pool": "1"},
+            )
+        except Exception:
+            with self._lock:
+                self._workers.remove(placeholder)
+            raise
+        placeholder.last_check = time.monotonic()
+        return placeholder
+
+    def _needs_health_check(self, worker: _PoolWorker) -> bool:
+        return time.monotonic() - worker.last_check >= self.health_check_interval
+
+    def _is_healthy(self, worker: _PoolWorker) -> bool:
+        try:
+            worker.container.reload()
+            healthy = worker.container.status == "running"
+        except Exception:
+            healthy = False
+        worker.last_check = time.monotonic()
+        return healthy
+
+    def _discard(self, worker: _PoolWorker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        self._remove_container(worker)
+
+    @staticmethod
+    def _remove_container(worker: _PoolWorker) -> None:
+        if worker.container is None:
+            return
+        try:
+            worker.container.remove(force=True)
+        except Exception:
+            pass
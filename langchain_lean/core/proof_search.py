@@ -0,0 +1,315 @@
+﻿from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import textwrap
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Union
+
+from langchain_lean.core.checkpoints import split_tactic_proof
+from langchain_lean.core.handles import ExecutionHandle
+
+# Un candidato es una táctica o `(táctica, puntuación)`; a mayor puntuación, antes se expande.
+TacticCandidate = Union[str, tuple[str, float]]
+# Recibe las metas abiertas y las tácticas aplicadas hasta el nodo; devuelve candidatos.
+TacticGenerator = Callable[[list[dict[str, Any]], tuple[str, ...]], Iterable[TacticCandidate]]
+
+# Táctica neutra para obtener las metas iniciales sin cerrar nada (Lean reporta `unsolved goals`).
+_ROOT_PROBE = "skip"
+_UNSOLVED_GOALS = "unsolved goals"
+
+
+@dataclass
+class ProofSearchStats:
+    """Contadores de una búsqueda."""
+
+    nodes_expanded: int = 0
+    candidates_evaluated: int = 0
+    failed_candidates: int = 0
+    duplicate_states: int = 0
+    max_depth: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class ProofSearchResult:
+    """Resultado de `BestFirstProofSearch.search`.
+
+    `stop_reason` es `"proved"`, `"exhausted"` (no quedan nodos), `"node_budget"`,
+    `"time_budget"` o `"invalid_statement"`.
+    """
+
+    success: bool
+    stop_reason: str
+    tactics: list[str] = field(default_factory=list)
+    code: str = ""
+    errors: list[str] = field(default_factory=list)
+    stats: ProofSearchStats = field(default_factory=ProofSearchStats)
+
+
+@dataclass
+class AlternativeResult:
+    """Resultado de una continuación en `evaluate_alternatives`.
+
+    `result` es None si la evaluación se canceló porque otra alternativa cerró la prueba.
+    """
+
+    index: int
+    continuation: str
+    code: str
+    result: Any = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.result is None
+
+
+@dataclass(order=True)
+class _Node:
+    priority: tuple[float, int, int]
+    order: int
+    tactics: tuple[str, ...] = field(compare=False)
+    goals: list[dict[str, Any]] = field(compare=False)
+    score: float = field(compare=False, default=0.0)
+
+
+class BestFirstProofSearch:
+    """Búsqueda best-first de pruebas tácticas sobre un `LeanEvaluator`.
+
+    Cada nodo es un prefijo de tácticas con sus metas abiertas. Se expande siempre el
+    nodo de mayor puntuación acumulada (a igualdad, el de menos metas y menor profundidad)
+    y los candidatos de `generator` se evalúan en paralelo en hasta `max_workers` hilos.
+    La búsqueda termina con la primera prueba completa o al agotar `node_budget`
+    (candidatos evaluados) o `time_budget` (segundos); las evaluaciones en curso se
+    cancelan al terminar.
+    """
+
+    def __init__(
+        self,
+        evaluator: Any,
+        generator: TacticGenerator,
+        max_workers: int | None = None,
+        node_budget: int = 200,
+        time_budget: float = 300.0,
+        max_depth: int = 32,
+    ):
+        self.evaluator = evaluator
+        self.generator = generator
+        self.max_workers = max(1, max_workers or getattr(evaluator, "max_concurrency", None) or os.cpu_count() or 1)
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+
+    def search(self, theorem: str) -> ProofSearchResult:
+        """Busca una prueba de `theorem` (enunciado, con o sin `:= by` y tácticas iniciales)."""
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        stats = ProofSearchStats()
+
+        proof = split_tactic_proof(theorem if _has_tactic_proof(theorem) else f"{theorem.rstrip()} := by")
+        if proof is None:
+            return ProofSearchResult(
+                success=False,
+                stop_reason="invalid_statement",
+                errors=["El enunciado no termina en una prueba táctica (`:= by`)."],
+                stats=stats,
+            )
+
+        def _code(tactics: tuple[str, ...]) -> str:
+            body = "\n".join(_indent(tactic) for tactic in tactics or (_ROOT_PROBE,))
+            return f"{proof.header}{proof.statement}\n{body}\n"
+
+        root = self.evaluator.evaluate_code(_code(proof.tactics), source="proof_search")
+        if root.proof_complete:
+            stats.elapsed = time.monotonic() - started
+            return ProofSearchResult(True, "proved", list(proof.tactics), _code(proof.tactics), stats=stats)
+        if not _is_open_state(root):
+            stats.elapsed = time.monotonic() - started
+            return ProofSearchResult(False, "invalid_statement", errors=list(root.errors), stats=stats)
+
+        counter = itertools.count()
+        frontier: list[_Node] = []
+        seen: set[tuple[str, ...]] = {_state_key(root.goals)}
+        heapq.heappush(frontier, _new_node(proof.tactics, root.goals, 0.0, next(counter)))
+
+        pending: dict[Future, tuple[_Node, str, float, ExecutionHandle]] = {}
+        found: tuple[str, ...] | None = None
+        stop_reason = "exhausted"
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="langchain-lean-search")
+        try:
+            while found is None:
+                # Llenamos los workers con candidatos de los mejores nodos de la frontera.
+                while frontier and len(pending) < self.max_workers and stats.candidates_evaluated < self.node_budget:
+                    node = heapq.heappop(frontier)
+                    stats.nodes_expanded += 1
+                    for tactic, score in _normalize(self.generator(node.goals, node.tactics)):
+                        if stats.candidates_evaluated >= self.node_budget:
+                            break
+                        handle = ExecutionHandle()
+                        future = executor.submit(
+                            self.evaluator.evaluate_code,
+                            _code((*node.tactics, tactic)),
+                            handle=handle,
+                            source="proof_search",
+                        )
+                        pending[future] = (node, tactic, score, handle)
+                        stats.candidates_evaluated += 1
+
+                if not pending:
+                    if stats.candidates_evaluated >= self.node_budget:
+                        stop_reason = "node_budget"
+                    break
+
+                remaining = deadline - time.monotonic()
+                done = wait(list(pending), timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)[0]
+                if not done:
+                    stop_reason = "time_budget"
+                    break
+
+                for future in done:
+                    node, tactic, score, _ = pending.pop(future)
+                    result = future.result()
+                    tactics = (*node.tactics, tactic)
+                    if result.proof_complete:
+                        found = tactics
+                        stop_reason = "proved"
+                        break
+                    if not _is_open_state(result):
+                        stats.failed_candidates += 1
+                        continue
+                    key = _state_key(result.goals)
+                    if key in seen:
+                        stats.duplicate_states += 1
+                        continue
+                    seen.add(key)
+                    depth = len(tactics) - len(proof.tactics)
+                    stats.max_depth = max(stats.max_depth, depth)
+                    if depth < self.max_depth:
+                        heapq.heappush(frontier, _new_node(tactics, result.goals, node.score + score, next(counter)))
+        finally:
+            # Las evaluaciones que siguen en curso ya no importan: se cancelan sus contenedores.
+            for *_, handle in pending.values():
+                handle.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        stats.elapsed = time.monotonic() - started
+        if found is not None:
+            return ProofSearchResult(True, "proved", list(found), _code(found), stats=stats)
+        return ProofSearchResult(False, stop_reason, stats=stats)
+
+
+def evaluate_alternatives(
+    evaluator: Any,
+    prefix: str,
+    continuations: list[str],
+    max_workers: int | None = None,
+    stop_on_success: bool = True,
+    handle: ExecutionHandle | None = None,
+    source: str = "alternatives",
+) -> list[AlternativeResult]:
+    """Evalúa en paralelo varias continuaciones tácticas de la misma prueba parcial.
+
+    Cada continuación se agrega como táctica tras las de `prefix` y se verifica en su
+    propio hilo (hasta `max_workers`, por defecto `max_concurrency` del evaluador). Con
+    `stop_on_success` la primera que cierra la prueba termina la espera y las demás
+    evaluaciones se cancelan (se matan sus contenedores o procesos). Cancelar `handle`
+    cancela todas. Devuelve las alternativas ordenadas: pruebas completas, luego estados
+    abiertos por número de metas, luego fallos y por último las canceladas.
+    """
+    proof = split_tactic_proof(prefix if _has_tactic_proof(prefix) else f"{prefix.rstrip()} := by")
+
+    def _code(continuation: str) -> str:
+        tactic = textwrap.dedent(continuation).strip()
+        if proof is None:
+            return f"{prefix.rstrip()}\n{continuation}\n"
+        body = "\n".join(_indent(step) for step in (*proof.tactics, tactic))
+        return f"{proof.header}{proof.statement}\n{body}\n"
+
+    alternatives = [
+        AlternativeResult(index, continuation, _code(continuation)) for index, continuation in enumerate(continuations)
+    ]
+    if not alternatives:
+        return []
+    handles = [ExecutionHandle() for _ in alternatives]
+
+    def _cancel_all() -> None:
+        for child in handles:
+            child.cancel()
+
+    if handle is not None:
+        handle.attach(_cancel_all)
+    workers = max(1, max_workers or getattr(evaluator, "max_concurrency", None) or os.cpu_count() or 1)
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(alternatives)), thread_name_prefix="langchain-lean-alt")
+    try:
+        pending = {
+            executor.submit(evaluator.evaluate_code, alternative.code, handle=child, source=source): alternative
+            for alternative, child in zip(alternatives, handles)
+        }
+        while pending:
+            done = wait(list(pending), return_when=FIRST_COMPLETED)[0]
+            for future in done:
+                alternative = pending.pop(future)
+                if not handles[alternative.index].cancelled:
+                    alternative.result = future.result()
+            if stop_on_success and any(alt.result is not None and alt.result.proof_complete for alt in alternatives):
+                break
+    finally:
+        # Lo que siga en curso ya no cambia la respuesta: se cancela en lugar de esperarlo.
+        _cancel_all()
+        executor.shutdown(wait=False, cancel_futures=True)
+        if handle is not None:
+            handle.detach()
+
+    return sorted(alternatives, key=_alternative_rank)
+
+
+def _alternative_rank(alternative: AlternativeResult) -> tuple[int, int, int]:
+    result = alternative.result
+    if result is None:
+        return (3, 0, alternative.index)
+    if result.proof_complete:
+        return (0, 0, alternative.index)
+    if _is_open_state(result):
+        return (1, len(result.goals), alternative.index)
+    return (2, 0, alternative.index)
+
+
+def _has_tactic_proof(theorem: str) -> bool:
+    return split_tactic_proof(theorem) is not None
+
+
+def _indent(tactic: str) -> str:
+    return "\n".join(f"  {line}" if line.strip() else line for line in tactic.splitlines())
+
+
+def _normalize(candidates: Iterable[TacticCandidate]) -> list[tuple[str, float]]:
+    normalized: list[tuple[str, float]] = []
+    seen: set[str] = set()
+    for candidate in candidates:
+        tactic, score = (candidate, 0.0) if isinstance(candidate, str) else (candidate[0], float(candidate[1]))
+        tactic = tactic.strip()
+        if tactic and tactic not in seen:
+            seen.add(tactic)
+            normalized.append((tactic, score))
+    return normalized
+
+
+def _is_open_state(result: Any) -> bool:
+    """Si la prueba elaboró y solo faltan metas (el único error es `unsolved goals`)."""
+    if not result.goals or result.has_sorry:
+        return False
+    return all(str(error).startswith(_UNSOLVED_GOALS) for error in result.errors)
+
+
+def _state_key(goals: list[dict[str, Any]]) -> tuple[str, ...]:
+    return tuple(
+        "\n".join([*map(str, goal.get("context") or []), f"⊢ {goal.get('goal', '')}"]) for goal in goals
+    )
+
+
+def _new_node(tactics: tuple[str, ...], goals: list[dict[str, Any]], score: float, order: int) -> _Node:
+    return _Node(priority=(-score, len(goals), len(tactics)), order=order, tactics=tactics, goals=goals, score=score)
@@ -0,0 +1,138 @@
+﻿from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from typing import Any
+
+from langchain_lean.core.evaluator import LeanDeclarationResult, LeanExecutionResult
+from langchain_lean.core.handles import ExecutionHandle
+from langchain_lean.core.http_pool import HTTPConnectionPool
+from langchain_lean.core.server import DEFAULT_HOST, DEFAULT_PORT
+
+REMOTE_ERROR_PREFIX = "Error del servidor de evaluación:"
+
+
+class RemoteLeanEvaluator:
+    """Cliente de `langchain-lean serve` con la misma interfaz que `LeanEvaluator`.
+
+    No aprovisiona Docker: cada evaluación se envía al servidor, que comparte sus
+    workers y su caché entre todos los procesos cliente. Se puede pasar a las tools
+    y a `LeanToolkit` como `evaluator=`; los modos que necesitan una sesión REPL local
+    no están disponibles (`LeanStateTool(incremental=True)` evalúa el archivo completo y
+    `LeanREPLTool(stateful=True)` se rechaza al construirse).
+
+    Cancelar el `handle` de una evaluación envía `POST /cancel` al servidor, que mata
+    la ejecución en curso.
+    """
+
+    # Las tools consultan `evaluator.env_manager`; en modo remoto no hay uno local.
+    env_manager = None
+
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 900, max_connections: int = 8):
+        self.url = url.rstrip("/")
+        self._http = HTTPConnectionPool(self.url, timeout=timeout, max_connections=max_connections)
+        # Las cancelaciones no esperan a que se libere una conexión de evaluación.
+        self._control = HTTPConnectionPool(self.url, timeout=30, max_connections=2)
+
+    def evaluate_code(
+        self,
+        lean_code: str,
+        filename: str | None = None,
+        handle: ExecutionHandle | None = None,
+        fail_fast: bool = False,
+        source: str = "evaluate_code",
+    ) -> LeanExecutionResult:
+        payload = {"code": lean_code, "filename": filename, "fail_fast": fail_fast, "source": source}
+        try:
+            response = self._post_cancellable("/evaluate", payload, handle)
+        except Exception as exc:
+            return LeanExecutionResult(success=False, errors=[f"{REMOTE_ERROR_PREFIX} {exc}"])
+        return LeanExecutionResult.model_validate(response)
+
+    async def aevaluate_code(
+        self,
+        lean_code: str,
+        filename: str | None = None,
+        fail_fast: bool = False,
+        source: str = "evaluate_code",
+    ) -> LeanExecutionResult:
+        return await asyncio.to_thread(self.evaluate_code, lean_code, filename, None, fail_fast, source)
+
+    def evaluate_many(
+        self, codes: list[str], handle: ExecutionHandle | None = None, source: str = "evaluate_many"
+    ) -> list[LeanExecutionResult]:
+        try:
+            response = self._post_cancellable("/evaluate_many", {"codes": codes, "source": source}, handle)
+        except Exception as exc:
+            error = LeanExecutionResult(success=False, errors=[f"{REMOTE_ERROR_PREFIX} {exc}"])
+            return [error.model_copy(deep=True) for _ in codes]
+        return [LeanExecutionResult.model_validate(item) for item in response["results"]]
+
+    async def aevaluate_many(self, codes: list[str], source: str = "evaluate_many") -> list[LeanExecutionResult]:
+        return await asyncio.to_thread(self.evaluate_many, codes, None, source)
+
+    def evaluate_declarations(
+        self, lean_code: str, handle: ExecutionHandle | None = None, source: str = "evaluate_declarations"
+    ) -> list[LeanDeclarationResult]:
+        """Verificación por declaración en el servidor (ver `LeanEvaluator.evaluate_declarations`)."""
+        try:
+            response = self._post_cancellable(
+                "/evaluate_declarations", {"code": lean_code, "source": source}, handle
+            )
+        except Exception as exc:
+            error = LeanExecutionResult(success=False, errors=[f"{REMOTE_ERROR_PREFIX} {exc}"])
+            return [LeanDeclarationResult(kind="file", line=1, result=error)]
+        return [LeanDeclarationResult.model_validate(item) for item in response["declarations"]]
+
+    async def aevaluate_declarations(
+        self, lean_code: str, source: str = "evaluate_declarations"
+    ) -> list[LeanDeclarationResult]:
+        return await asyncio.to_thread(self.evaluate_declarations, lean_code, None, source)
+
+    def stats(self) -> dict[str, Any]:
+        """Cola, evaluaciones en curso, workers y caché del servidor."""
+        return self._get("/stats")
+
+    def metrics_text(self) -> str:
+        """Métricas del servidor en formato texto de Prometheus."""
+        status, reason, data = self._http.request("GET", "/metrics")
+        if status != 200:
+            raise RuntimeError(f"HTTP {status} {reason}")
+        return data.decode("utf-8")
+
+    def cache_stats(self) -> dict[str, int]:
+        return self.stats().get("cache", {})
+
+    def close(self) -> None:
+        self._http.close()
+        self._control.close()
+
+    def _post_cancellable(self, path: str, payload: dict[str, Any], handle: ExecutionHandle | None) -> Any:
+        if handle is None:
+            return self._post(path, payload)
+        request_id = uuid.uuid4().hex
+        handle.attach(lambda: self._post("/cancel", {"request_id": request_id}, self._control))
+        try:
+            return self._post(path, {**payload, "request_id": request_id})
+        finally:
+            handle.detach()
+
+    def _post(self, path: str, payload: dict[str, Any], http: HTTPConnectionPool | None = None) -> Any:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        status, reason, data = (http or self._http).request(
+            "POST", path, body=body, headers={"Content-Type": "application/json"}
+        )
+        return _decode(status, reason, data)
+
+    def _get(self, path: str) -> Any:
+        status, reason, data = self._http.request("GET", path)
+        return _decode(status, reason, data)
+
+
+def _decode(status: int, reason: str, data: bytes) -> Any:
+    payload = json.loads(data.decode("utf-8")) if data else {}
+    if status != 200:
+        detail = payload.get("error") if isinstance(payload, dict) else None
+        raise RuntimeError(f"HTTP {status} {reason}: {detail or ''}".strip())
+    return payload
@@ -0,0 +1,189 @@
+﻿from __future__ import annotations
+
+import json
+import logging
+import queue
+import subprocess
+import threading
+from typing import Any
+
+from langchain_lean.core.parser import LeanGoal, ParsedLeanOutput, extract_goals
+
+logger = logging.getLogger("langchain-lean-env")
+
+
+class LeanREPLError(RuntimeError):
+    """Error de comunicación con el proceso REPL de Lean."""
+
+
+class LeanREPLSession:
+    """Sesión persistente con el REPL JSON de Lean (`leanprover-community/repl`).
+
+    El proceso se mantiene vivo entre comandos: cada respuesta trae un `env` que
+    puede reutilizarse para que los comandos siguientes partan de las declaraciones
+    (e imports) ya elaborados, sin volver a pagarlos.
+    """
+
+    def __init__(self, command: list[str], cwd: str | None = None, timeout: float = 240):
+        self.command = command
+        self.cwd = cwd
+        self.timeout = timeout
+        self.env: int | None = None
+        # Se incrementa en cada (re)arranque: los ids de `env`/`proofState` previos dejan de valer.
+        self.generation = 0
+
+        self._process: subprocess.Popen[str] | None = None
+        self._lines: queue.Queue[str | None] = queue.Queue()
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        if self.is_alive:
+            return
+        self._lines = queue.Queue()
+        self._process = subprocess.Popen(
+            self.command,
+            cwd=self.cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self.env = None
+        self.generation += 1
+        threading.Thread(target=self._pump_stdout, args=(self._process, self._lines), daemon=True).start()
+        logger.info("Sesión REPL de Lean iniciada: %s", " ".join(self.command))
+
+    def run_command(self, code: str, env: int | None = None) -> dict[str, Any]:
+        """Elabora `code` sobre el entorno `env` (o uno nuevo si es None)."""
+        payload: dict[str, Any] = {"cmd": code}
+        if env is not None:
+            payload["env"] = env
+        return self.send(payload)
+
+    def run_tactic(self, tactic: str, proof_state: int) -> dict[str, Any]:
+        """Aplica una táctica sobre un `proofState` devuelto por el REPL."""
+        return self.send({"tactic": tactic, "proofState": proof_state})
+
+    def send(self, payload: dict[str, Any]) -> dict[str, Any]:
+        with self._lock:
+            self.start()
+            assert self._process is not None and self._process.stdin is not None
+            try:
+                self._process.stdin.write(json.dumps(payload, ensure_ascii=False) + "\n\n")
+                self._process.stdin.flush()
+            except OSError as exc:
+                self._kill()
+                raise LeanREPLError(f"No se pudo escribir en el REPL de Lean: {exc}") from exc
+            return self._read_response()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is None:
+                return
+            try:
+                if self._process.stdin is not None:
+                    self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._kill()
+            self._process = None
+            self.env = None
+
+    def __enter__(self) -> "LeanREPLSession":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _read_response(self) -> dict[str, Any]:
+        buffer: list[str] = []
+        while True:
+            try:
+                line = self._lines.get(timeout=self.timeout)
+            except queue.Empty:
+                self._kill()
+                raise LeanREPLError(f"El REPL de Lean no respondió en {self.timeout}s.") from None
+            if line is None:
+                self._kill()
+                raise LeanREPLError("El proceso REPL de Lean terminó inesperadamente:\n" + "".join(buffer))
+            if line.strip():
+                buffer.append(line)
+                continue
+            if buffer:
+                break
+
+        text = "".join(buffer)
+        try:
+            response = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise LeanREPLError(f"Respuesta no JSON del REPL de Lean:\n{text}") from exc
+        if isinstance(response, dict) and isinstance(response.get("env"), int):
+            self.env = response["env"]
+        return response
+
+    def _kill(self) -> None:
+        if self._process is not None:
+            try:
+                self._process.kill()
+            except Exception:
+                pass
+            self._process = None
+        self.env = None
+
+    @staticmethod
+    def _pump_stdout(process: subprocess.Popen[str], lines: queue.Queue[str | None]) -> None:
+        assert process.stdout is not None
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+
+def parse_repl_response(response: dict[str, Any]) -> ParsedLeanOutput:
+    """Convierte una respuesta JSON del REPL en `ParsedLeanOutput`."""
+    raw_output = json.dumps(response, ensure_ascii=False)
+    if "message" in response and "env" not in response and "proofState" not in response:
+        # Error a nivel de protocolo (p. ej. `env` desconocido).
+        return ParsedLeanOutput(
+            success=False, proof_complete=False, errors=[str(response["message"])], raw_output=raw_output
+        )
+
+    errors: list[str] = []
+    warnings: list[str] = []
+    goals: list[LeanGoal] = []
+    has_sorry = bool(response.get("sorries"))
+
+    for message in response.get("messages") or []:
+        data = str(message.get("data", "")).strip()
+        severity = message.get("severity")
+        if severity == "error":
+            errors.append(data)
+            if data.startswith("unsolved goals"):
+                goals.extend(extract_goals(data))
+        elif severity == "warning":
+            warnings.append(data)
+            if "sorry" in data:
+                has_sorry = True
+
+    for sorry in response.get("sorries") or []:
+        goals.extend(extract_goals(str(sorry.get("goal", ""))))
+    for goal_text in response.get("goals") or []:
+        goals.extend(extract_goals(str(goal_text)))
+
+    success = not errors
+    return ParsedLeanOutput(
+        success=success,
+        proof_complete=success and not goals and not has_sorry,
+        has_sorry=has_sorry,
+        errors=errors,
+        warnings=warnings,
+        goals=goals,
+        raw_output=raw_output,
+    )
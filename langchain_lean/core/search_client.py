@@ -0,0 +1,162 @@
+﻿from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from urllib.parse import quote_plus
+
+from langchain_lean.core.http_pool import HTTPConnectionPool
+
+logger = logging.getLogger("langchain-lean-env")
+
+LOOGLE_URL = "https://loogle.lean-lang.org"
+
+
+class LoogleClient:
+    """Cliente HTTP de Loogle con conexiones keep-alive y caché TTL+LRU de respuestas.
+
+    Las conexiones se reutilizan entre consultas (hasta `max_connections` abiertas a la
+    vez). Las respuestas exitosas se guardan `cache_ttl` segundos en memoria y, si se
+    indica `cache_dir`, también en disco para sobrevivir entre procesos.
+    """
+
+    def __init__(
+        self,
+        base_url: str = LOOGLE_URL,
+        timeout: float = 12,
+        max_connections: int = 4,
+        cache_ttl: float = 3600,
+        max_cache_entries: int = 1024,
+        cache_dir: str | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.cache_ttl = cache_ttl
+        self.max_cache_entries = max_cache_entries
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir)) if cache_dir else None
+        self.cache_hits = 0
+
+        self._http = HTTPConnectionPool(self.base_url, timeout=timeout, max_connections=self.max_connections)
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def web_url(self, query: str) -> str:
+        return f"{self.base_url}/?q={quote_plus(query)}"
+
+    def fetch(self, query: str) -> Any:
+        """Payload JSON de Loogle para `query` (de caché si sigue vigente)."""
+        path = f"/json?q={quote_plus(query)}"
+        cached = self._cache_get(path)
+        if cached is not None:
+            return cached
+
+        payload = self._get_json(path)
+        self._cache_put(path, payload)
+        return payload
+
+    def fetch_many(self, queries: list[str], max_workers: int | None = None) -> list[Any]:
+        """Consulta `queries` en paralelo; cada entrada es el payload o la excepción capturada."""
+        if not queries:
+            return []
+        workers = min(len(queries), max_workers or self.max_connections)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="langchain-lean-search") as executor:
+            futures = [executor.submit(self.fetch, query) for query in queries]
+            return [_result_or_exception(future) for future in futures]
+
+    async def afetch_many(self, queries: list[str], max_concurrency: int | None = None) -> list[Any]:
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_connections)
+
+        async def _one(query: str) -> Any:
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.fetch, query)
+                except Exception as exc:
+                    return exc
+
+        return await asyncio.gather(*(_one(query) for query in queries))
+
+    @property
+    def requests(self) -> int:
+        """Peticiones HTTP efectivamente enviadas (sin contar aciertos de caché)."""
+        return self._http.requests
+
+    def close(self) -> None:
+        self._http.close()
+
+    def _get_json(self, path: str) -> Any:
+        status, reason, body = self._http.request("GET", path, headers={"Accept": "application/json"})
+        if status != 200:
+            raise RuntimeError(f"HTTP {status} {reason}")
+        return json.loads(body.decode("utf-8"))
+
+    def _cache_get(self, path: str) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(path)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(path)
+                    self.cache_hits += 1
+                    return entry[1]
+                del self._memory[path]
+
+        disk_path = self._disk_path(path)
+        if disk_path is None:
+            return None
+        try:
+            with open(disk_path, "r", encoding="utf-8") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if float(stored.get("expires", 0)) <= now:
+            return None
+        with self._lock:
+            self._remember(path, float(stored["expires"]), stored.get("payload"))
+            self.cache_hits += 1
+        return stored.get("payload")
+
+    def _cache_put(self, path: str, payload: Any) -> None:
+        if self.cache_ttl <= 0:
+            return
+        expires = time.time() + self.cache_ttl
+        with self._lock:
+            self._remember(path, expires, payload)
+
+        disk_path = self._disk_path(path)
+        if disk_path is None:
+            return
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"expires": expires, "payload": payload}, file, ensure_ascii=False)
+            os.replace(tmp_path, disk_path)
+        except OSError as exc:
+            logger.debug("No se pudo guardar la respuesta de búsqueda en disco: %s", exc)
+
+    def _remember(self, path: str, expires: float, payload: Any) -> None:
+        self._memory[path] = (expires, payload)
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.max_cache_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, path: str) -> str | None:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(f"{self.base_url}{path}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+
+def _result_or_exception(future: Any) -> Any:
+    try:
+        return future.result()
+    except Exception as exc:
+        return exc
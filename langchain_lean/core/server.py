@@ -0,0 +1,237 @@
+﻿from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.handles import ExecutionHandle
+from langchain_lean.core.metrics import PrometheusMetrics
+
+logger = logging.getLogger("langchain-lean-env")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class LeanEvaluationServer:
+    """Expone un `LeanEvaluator` por HTTP para que varios procesos compartan workers y caché.
+
+    Endpoints:
+    - `POST /evaluate` `{"code", "filename"?, "fail_fast"?, "source"?}` -> `LeanExecutionResult`
+    - `POST /evaluate_many` `{"codes": [...], "source"?}` -> `{"results": [...]}`
+    - `POST /evaluate_declarations` `{"code", "source"?}` -> `{"declarations": [...]}`
+    - `POST /cancel` `{"request_id"}`: cancela la evaluación enviada con ese `request_id`
+    - `GET /stats`: cola, evaluaciones en curso, workers del pool y caché
+    - `GET /metrics`: métricas en formato Prometheus
+    - `GET /health`
+    """
+
+    def __init__(
+        self,
+        evaluator: LeanEvaluator,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_concurrency: int | None = None,
+        metrics: PrometheusMetrics | None = None,
+    ):
+        self.evaluator = evaluator
+        self.max_concurrency = max(1, max_concurrency or evaluator.max_concurrency)
+        self.metrics = metrics
+        if metrics is not None and metrics not in evaluator.metrics_hooks:
+            evaluator.add_metrics_hook(metrics)
+
+        self.completed = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        # `request_id` -> handle de las evaluaciones en cola o en curso (ver `cancel`).
+        self._handles: dict[str, ExecutionHandle] = {}
+
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        host, port = self._httpd.server_address[:2]
+        return str(host), int(port)
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        logger.info("Servidor de evaluación Lean escuchando en %s", self.url)
+        self._httpd.serve_forever()
+
+    def start(self) -> "LeanEvaluationServer":
+        """Arranca el servidor en un hilo de fondo (útil en tests y embebido)."""
+        self._thread = threading.Thread(target=self.serve_forever, name="langchain-lean-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats: dict[str, Any] = {
+                "queue_depth": self._waiting,
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "completed": self.completed,
+                "failed": self.failed,
+                "uptime_s": round(time.time() - self.started_at, 3),
+            }
+        env_manager = self.evaluator.env_manager
+        pool = getattr(env_manager, "_pool", None)
+        stats["pool_workers"] = pool.worker_count if pool is not None else 0
+        stats["cache"] = self.evaluator.cache_stats()
+        return stats
+
+    def evaluate(self, payload: dict[str, Any]) -> dict[str, Any]:
+        code = payload.get("code")
+        if not isinstance(code, str):
+            raise ValueError("Falta `code` (string).")
+        result = self._run(
+            payload,
+            lambda handle: self.evaluator.evaluate_code(
+                code,
+                filename=payload.get("filename"),
+                handle=handle,
+                fail_fast=bool(payload.get("fail_fast", False)),
+                source=str(payload.get("source") or "remote"),
+            ),
+        )
+        return result.model_dump()
+
+    def evaluate_many(self, payload: dict[str, Any]) -> dict[str, Any]:
+        codes = payload.get("codes")
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            raise ValueError("Falta `codes` (lista de strings).")
+        source = str(payload.get("source") or "remote")
+        results = self._run(payload, lambda handle: self.evaluator.evaluate_many(codes, handle=handle, source=source))
+        return {"results": [result.model_dump() for result in results]}
+
+    def evaluate_declarations(self, payload: dict[str, Any]) -> dict[str, Any]:
+        code = payload.get("code")
+        if not isinstance(code, str):
+            raise ValueError("Falta `code` (string).")
+        source = str(payload.get("source") or "remote")
+        declarations = self._run(
+            payload, lambda handle: self.evaluator.evaluate_declarations(code, handle=handle, source=source)
+        )
+        return {"declarations": [item.model_dump() for item in declarations]}
+
+    def cancel(self, payload: dict[str, Any]) -> dict[str, Any]:
+        request_id = payload.get("request_id")
+        if not isinstance(request_id, str):
+            raise ValueError("Falta `request_id` (string).")
+        with self._lock:
+            # La cancelación puede llegar antes que la evaluación: queda registrada y esta
+            # arranca ya cancelada.
+            handle = self._handles.setdefault(request_id, ExecutionHandle())
+        handle.cancel()
+        return {"cancelled": True}
+
+    def _run(self, payload: dict[str, Any], func):
+        request_id = payload.get("request_id")
+        handle = None
+        if isinstance(request_id, str):
+            with self._lock:
+                handle = self._handles.setdefault(request_id, ExecutionHandle())
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+        try:
+            result = func(handle)
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                if isinstance(request_id, str):
+                    self._handles.pop(request_id, None)
+            self._slots.release()
+
+
+def _make_handler(server: LeanEvaluationServer) -> type[BaseHTTPRequestHandler]:
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            try:
+                if self.path == "/health":
+                    self._send_json(200, {"status": "ok"})
+                elif self.path == "/stats":
+                    self._send_json(200, server.stats())
+                elif self.path == "/metrics":
+                    text = server.metrics.render() if server.metrics is not None else ""
+                    self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+                else:
+                    self._send_json(404, {"error": f"Ruta desconocida: {self.path}"})
+            except Exception as exc:
+                logger.exception("Error atendiendo %s", self.path)
+                self._send_json(500, {"error": str(exc)})
+
+        def do_POST(self) -> None:
+            routes = {
+                "/evaluate": server.evaluate,
+                "/evaluate_many": server.evaluate_many,
+                "/evaluate_declarations": server.evaluate_declarations,
+                "/cancel": server.cancel,
+            }
+            handler = routes.get(self.path)
+            if handler is None:
+                self._send_json(404, {"error": f"Ruta desconocida: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("El cuerpo debe ser un objeto JSON.")
+            except ValueError as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            try:
+                self._send_json(200, handler(payload))
+            except ValueError as exc:
+                self._send_json(400, {"error": str(exc)})
+            except Exception as exc:
+                logger.exception("Error evaluando petición remota")
+                self._send_json(500, {"error": str(exc)})
+
+        def _send_json(self, status: int, payload: Any) -> None:
+            self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("serve: " + format, *args)
+
+    return _Handler
@@ -0,0 +1,244 @@
+﻿"""Utilidades para separar código Lean en cabecera de imports y cuerpo."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+# Palabras que abren un comando de nivel superior (en columna 0, tras atributos y modificadores).
+_COMMAND_KEYWORDS = frozenset(
+    {
+        "theorem", "lemma", "def", "example", "instance", "abbrev", "structure", "inductive",
+        "class", "opaque", "axiom", "mutual", "namespace", "section", "end", "open", "export",
+        "variable", "universe", "set_option", "attribute", "notation", "infix", "infixl",
+        "infixr", "prefix", "postfix", "macro", "macro_rules", "syntax", "elab", "deriving",
+        "initialize", "alias", "#eval", "#check", "#print", "#reduce", "#synth", "#exit",
+    }
+)
+# Comandos que declaran algo y reciben un resultado propio en `evaluate_declarations`.
+DECLARATION_KINDS = frozenset(
+    {
+        "theorem", "lemma", "def", "example", "instance", "abbrev", "structure", "inductive",
+        "class", "opaque", "axiom", "mutual",
+    }
+)
+# Comandos que no aportan nada a las declaraciones siguientes.
+_STANDALONE_KINDS = frozenset({"example", "#eval", "#check", "#print", "#reduce", "#synth"})
+_PROOF_KINDS = frozenset({"theorem", "lemma"})
+
+_COMMAND_RE = re.compile(
+    r"^((?:@\[[^\]]*\]\s*|(?:private|protected|noncomputable|partial|unsafe|nonrec|scoped|local)\s+)*)(#?[A-Za-z_]\w*)?"
+)
+_NAME_RE = re.compile(r"\s+([^\s(\[{:⦃⟨]+)")
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+$")
+_OPEN_BRACKETS = "([{⟨⦃"
+_CLOSE_BRACKETS = ")]}⟩⦄"
+
+
+@dataclass(frozen=True)
+class LeanCommand:
+    """Comando de nivel superior de un archivo Lean.
+
+    `text` incluye los comentarios, docstrings y atributos que lo preceden; `line` es
+    la línea (desde 1) donde empieza `text` en el archivo original.
+    """
+
+    kind: str
+    name: str
+    text: str
+    line: int
+
+    @property
+    def is_declaration(self) -> bool:
+        return self.kind in DECLARATION_KINDS
+
+
+def split_import_header(code: str) -> tuple[str, str]:
+    """Separa el bloque inicial de `import` (con comentarios/líneas vacías) del resto.
+
+    Lean exige que los imports vayan al principio del archivo, así que la cabecera
+    termina en la primera línea que no es import, comentario (de línea o de bloque,
+    como el docstring de módulo `/-! ... -/`) ni vacía.
+    """
+    code = code or ""
+    lines = _LINE_RE.findall(code)
+    masked_lines = _LINE_RE.findall(_mask_comments(code))
+    header_end = 0
+    for idx, masked in enumerate(masked_lines):
+        stripped = masked.strip()
+        if stripped.startswith("import "):
+            header_end = idx + 1
+        elif stripped:
+            break
+    return "".join(lines[:header_end]), "".join(lines[header_end:])
+
+
+def import_header_key(code: str) -> str:
+    """Clave normalizada de la cabecera: imports ordenados, sin comentarios ni espacios."""
+    header, _ = split_import_header(code)
+    lines = _mask_comments(header).splitlines()
+    imports = sorted(line.strip() for line in lines if line.strip().startswith("import "))
+    return "\n".join(imports)
+
+
+def split_commands(code: str) -> tuple[str, list[LeanCommand]]:
+    """Separa `code` en cabecera de imports y comandos de nivel superior.
+
+    Un comando empieza en una línea sin sangría cuya primera palabra (tras `@[...]` y
+    modificadores como `private`) es un comando conocido; las líneas con sangría o en
+    blanco pertenecen al comando anterior y los comentarios en columna 0, al siguiente.
+    Un bloque `mutual ... end` es un único comando. La concatenación de los `text`
+    reproduce el cuerpo original.
+    """
+    header, body = split_import_header(code)
+    first_line = len(header.splitlines()) + 1
+    lines = _LINE_RE.findall(body)
+    masked_lines = _LINE_RE.findall(_mask_comments(body))
+
+    chunks: list[tuple[str, int, list[str]]] = []
+    prefix: list[str] = []
+    prefix_start = first_line
+    in_mutual = False
+    for offset, (line, masked) in enumerate(zip(lines, masked_lines)):
+        kind = ""
+        if line[:1].strip():
+            if not masked.strip() or _command_kind(masked) == "@":
+                # Comentario, docstring o atributo suelto: se pega al comando siguiente.
+                if not prefix:
+                    prefix_start = first_line + offset
+                prefix.append(line)
+                continue
+            kind = _command_kind(masked)
+            if in_mutual:
+                in_mutual = kind != "end"
+                kind = ""
+            elif kind == "mutual":
+                in_mutual = True
+        if kind:
+            start = prefix_start if prefix else first_line + offset
+            chunks.append((kind, start, [*prefix, line]))
+        elif chunks:
+            chunks[-1][2].extend([*prefix, line])
+        else:
+            if not prefix:
+                prefix_start = first_line + offset
+            prefix.append(line)
+            continue
+        prefix = []
+    if prefix:
+        if chunks:
+            chunks[-1][2].extend(prefix)
+        else:
+            chunks.append(("", prefix_start, prefix))
+
+    commands = []
+    for kind, start, chunk in chunks:
+        text = "".join(chunk)
+        commands.append(LeanCommand(kind=kind, name=_declaration_name(text, kind), text=text, line=start))
+    return header, commands
+
+
+def declaration_check_code(header: str, commands: list[LeanCommand], index: int) -> str:
+    """Archivo para verificar `commands[index]` con los comandos anteriores como contexto.
+
+    Los `theorem`/`lemma` anteriores se reducen a `axiom` con el mismo enunciado (las
+    declaraciones siguientes pueden usarlos sin volver a verificar su prueba), los
+    `example` y comandos `#...` se omiten y el resto se copia tal cual. Las partes
+    reemplazadas se rellenan con líneas vacías para que las posiciones de los mensajes
+    coincidan con las del archivo original.
+    """
+    parts = [header]
+    for command in commands[:index]:
+        parts.append(_as_context(command))
+    parts.append(commands[index].text)
+    return "".join(parts)
+
+
+def _as_context(command: LeanCommand) -> str:
+    newlines = command.text.count("\n")
+    if command.kind in _STANDALONE_KINDS:
+        return "\n" * newlines
+    if command.kind in _PROOF_KINDS:
+        statement = _axiom_statement(command.text, command.kind)
+        if statement is not None:
+            return statement + "\n" * max(1, newlines - statement.count("\n"))
+    return command.text
+
+
+def _axiom_statement(text: str, kind: str) -> str | None:
+    """Enunciado de un `theorem`/`lemma` como `axiom` (None si no se encuentra el `:=`)."""
+    masked = _mask_comments(text)
+    keyword = re.search(rf"(?<![\w.]){kind}(?![\w'])", masked)
+    if keyword is None:
+        return None
+    depth = 0
+    for idx in range(keyword.end(), len(masked) - 1):
+        char = masked[idx]
+        if char in _OPEN_BRACKETS:
+            depth += 1
+        elif char in _CLOSE_BRACKETS:
+            depth = max(0, depth - 1)
+        elif depth == 0 and masked.startswith(":=", idx):
+            statement = text[: keyword.start()] + "axiom" + text[keyword.end() : idx]
+            return statement.rstrip()
+    return None
+
+
+def _command_kind(masked_line: str) -> str:
+    """Comando que abre la línea, `"@"` si solo hay atributos o `""` si no es un comando."""
+    match = _COMMAND_RE.match(masked_line.strip())
+    if match is None:
+        return ""
+    word = match.group(2)
+    if word is None:
+        return "@" if match.group(1) else ""
+    return word if word in _COMMAND_KEYWORDS else ""
+
+
+def _declaration_name(text: str, kind: str) -> str:
+    if kind not in DECLARATION_KINDS or kind in ("example", "mutual"):
+        return ""
+    masked = _mask_comments(text)
+    keyword = re.search(rf"(?<![\w.]){kind}(?![\w'])", masked)
+    if keyword is None:
+        return ""
+    match = _NAME_RE.match(masked, keyword.end())
+    return match.group(1) if match else ""
+
+
+def _mask_comments(text: str) -> str:
+    """Reemplaza comentarios y literales de cadena por espacios, conservando los saltos de línea."""
+    chars = list(text)
+    idx = 0
+    length = len(text)
+    while idx < length:
+        if text.startswith("--", idx):
+            end = text.find("\n", idx)
+            end = length if end < 0 else end
+        elif text.startswith("/-", idx):
+            depth = 0
+            end = idx
+            while end < length:
+                if text.startswith("/-", end):
+                    depth += 1
+                    end += 2
+                elif text.startswith("-/", end):
+                    depth -= 1
+                    end += 2
+                    if depth == 0:
+                        break
+                else:
+                    end += 1
+        elif text[idx] == '"':
+            end = idx + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            end = min(length, end + 1)
+        else:
+            idx += 1
+            continue
+        for pos in range(idx, end):
+            if chars[pos] != "\n":
+                chars[pos] = " "
+        idx = end
+    return "".join(chars)
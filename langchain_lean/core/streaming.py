@@ -0,0 +1,141 @@
+﻿from __future__ import annotations
+
+import codecs
+import logging
+import os
+import time
+import uuid
+from typing import Callable
+
+logger = logging.getLogger("langchain-lean-env")
+
+# Recibe cada fragmento de salida ya decodificado; devolver False pide detener la ejecución.
+OutputCallback = Callable[[str], bool]
+
+# Retención del directorio de desborde: presupuesto total y antigüedad máxima de los archivos.
+DEFAULT_SPILL_MAX_BYTES = 256 * 1024**2
+DEFAULT_SPILL_MAX_AGE = 7 * 24 * 3600
+SPILL_PREFIX = "lean_output_"
+
+
+class OutputCapture:
+    """Acumula la salida de Lean en memoria hasta `max_bytes` y vuelca el exceso a disco.
+
+    Cada fragmento se reenvía a `on_output` a medida que llega, de modo que el consumidor
+    puede parsear incrementalmente y pedir que se aborte la ejecución. Antes de crear un
+    archivo de desborde se podan los anteriores (ver `prune_spill_dir`).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        spill_dir: str | None = None,
+        on_output: OutputCallback | None = None,
+        spill_max_bytes: int = DEFAULT_SPILL_MAX_BYTES,
+        spill_max_age: float = DEFAULT_SPILL_MAX_AGE,
+    ):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.on_output = on_output
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_max_age = spill_max_age
+        self.spill_path: str | None = None
+        self.spilled_bytes = 0
+        self.stop_requested = False
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._chunks: list[bytes] = []
+        self._kept_bytes = 0
+        self._spill_file = None
+
+    def write(self, data: bytes) -> bool:
+        """Agrega un fragmento crudo; devuelve False si el consumidor pidió detener."""
+        self._store(data)
+        text = self._decoder.decode(data)
+        if text and self.on_output is not None and not self.on_output(text):
+            self.stop_requested = True
+        return not self.stop_requested
+
+    def getvalue(self) -> str:
+        self.close()
+        tail = self._decoder.decode(b"", final=True)
+        if tail and self.on_output is not None:
+            self.on_output(tail)
+        text = b"".join(self._chunks).decode("utf-8", errors="replace")
+        if self.spilled_bytes:
+            text += (
+                f"\n[langchain-lean] Salida truncada: {self.spilled_bytes} bytes adicionales "
+                f"guardados en {self.spill_path}\n"
+            )
+        return text
+
+    def close(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _store(self, data: bytes) -> None:
+        if self.max_bytes is None or self._kept_bytes + len(data) <= self.max_bytes:
+            self._keep(data)
+            return
+
+        room = max(0, self.max_bytes - self._kept_bytes)
+        if room:
+            self._keep(data[:room])
+        self._spill(data[room:])
+
+    def _keep(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._kept_bytes += len(data)
+
+    def _spill(self, data: bytes) -> None:
+        self.spilled_bytes += len(data)
+        if self.spill_dir is None:
+            return
+        if self._spill_file is None:
+            try:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                prune_spill_dir(self.spill_dir, self.spill_max_bytes, self.spill_max_age)
+                self.spill_path = os.path.join(self.spill_dir, f"{SPILL_PREFIX}{uuid.uuid4().hex}.log")
+                self._spill_file = open(self.spill_path, "ab")
+            except OSError as exc:
+                logger.warning("No se pudo crear el archivo de desborde de salida: %s", exc)
+                self.spill_dir = None
+                return
+        self._spill_file.write(data)
+
+
+def prune_spill_dir(
+    spill_dir: str, max_bytes: int = DEFAULT_SPILL_MAX_BYTES, max_age: float = DEFAULT_SPILL_MAX_AGE
+) -> None:
+    """Borra los desbordes más antiguos que `max_age` y, por mtime, los que excedan `max_bytes`.
+
+    Como en `LeanResultCache`, al pasarse del presupuesto se baja al 90% de `max_bytes`.
+    """
+    entries = []
+    try:
+        names = os.listdir(spill_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(SPILL_PREFIX):
+            continue
+        path = os.path.join(spill_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, path, stat.st_size))
+    entries.sort()
+
+    cutoff = time.time() - max_age
+    total = sum(size for _, _, size in entries)
+    target = int(max_bytes * 0.9) if total > max_bytes else total
+    for mtime, path, size in entries:
+        if mtime >= cutoff and total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
@@ -0,0 +1,137 @@
+﻿from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Sequence
+
+from langchain_lean.core.goals import canonicalize_goals, rename_identifiers
+from langchain_lean.core.parser import LeanGoal, ParsedLeanOutput
+
+logger = logging.getLogger("langchain-lean-env")
+
+MEMO_FILENAME = "tactic_memo.sqlite"
+
+
+class TacticOutcomeMemo:
+    """Memo persistente `(huella canónica de metas, táctica) -> resultado`, con LRU.
+
+    Las metas se canonicalizan con `canonicalize_goals`, así que una táctica ya probada
+    sobre una meta igual salvo nombres de hipótesis (en otro intento u otro problema)
+    no vuelve a lanzar Lean. La táctica y el resultado se guardan en el espacio de
+    nombres canónico y se traducen a los nombres de la meta que consulta.
+
+    Con `path=None` el memo vive solo en memoria.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 20_000):
+        self.path = os.path.abspath(os.path.expanduser(path)) if path else None
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clock = 0
+        self._conn = self._connect()
+
+    def lookup(
+        self, goals: Sequence[LeanGoal | dict[str, Any]], tactic: str, context: str = ""
+    ) -> ParsedLeanOutput | None:
+        """Resultado memoizado de aplicar `tactic` a `goals`, con los nombres de `goals`."""
+        canonical = canonicalize_goals(goals)
+        key = (context, canonical.fingerprint, rename_identifiers(tactic, canonical.renaming))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT outcome FROM memo WHERE context = ? AND fingerprint = ? AND tactic = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Se confirma enseguida: una transacción abierta bloquearía a otros procesos.
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE memo SET last_used = ? WHERE context = ? AND fingerprint = ? AND tactic = ?",
+                    (self._tick(), *key),
+                )
+        inverse = {canonical_name: name for name, canonical_name in canonical.renaming.items()}
+        return _translate(ParsedLeanOutput.model_validate(json.loads(row[0])), inverse)
+
+    def record(
+        self,
+        goals: Sequence[LeanGoal | dict[str, Any]],
+        tactic: str,
+        outcome: ParsedLeanOutput,
+        context: str = "",
+    ) -> None:
+        canonical = canonicalize_goals(goals)
+        key = (context, canonical.fingerprint, rename_identifiers(tactic, canonical.renaming))
+        payload = json.dumps(_translate(outcome, canonical.renaming).model_dump(), ensure_ascii=False)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO memo(context, fingerprint, tactic, outcome, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*key, payload, self._tick()),
+                )
+                excess = self._conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM memo WHERE rowid IN (SELECT rowid FROM memo ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memo")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0])
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                "context TEXT NOT NULL, fingerprint TEXT NOT NULL, tactic TEXT NOT NULL, "
+                "outcome TEXT NOT NULL, last_used INTEGER NOT NULL, "
+                "PRIMARY KEY (context, fingerprint, tactic))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS memo_last_used ON memo(last_used)")
+        self._clock = int(conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM memo").fetchone()[0])
+        return conn
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+
+def _translate(outcome: ParsedLeanOutput, mapping: dict[str, str]) -> ParsedLeanOutput:
+    """Renombra hipótesis en metas y mensajes de `outcome` según `mapping`."""
+    goals = [
+        LeanGoal(
+            context=[rename_identifiers(line, mapping) for line in goal.context],
+            goal=rename_identifiers(goal.goal, mapping),
+        )
+        for goal in outcome.goals
+    ]
+    return outcome.model_copy(
+        update={
+            "goals": goals,
+            "errors": [rename_identifiers(error, mapping) for error in outcome.errors],
+            "warnings": [rename_identifiers(warning, mapping) for warning in outcome.warnings],
+            "messages": [],
+            "raw_output": "",
+        }
+    )
@@ -0,0 +1,44 @@
+﻿from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+# Fragmentos que identifican un fallo por agotar recursos (heartbeats de Lean o reloj).
+_RESOURCE_TIMEOUT_MARKERS = (
+    "maximum number of heartbeats",
+    "(deterministic) timeout",
+    "tiempo límite",
+    "timed out",
+)
+
+
+@dataclass(frozen=True)
+class EvaluationTier:
+    """Presupuesto de una pasada: `maxHeartbeats` de Lean y tiempo de reloj (segundos)."""
+
+    name: str
+    max_heartbeats: int
+    timeout: int
+
+    @property
+    def lean_options(self) -> str:
+        return f"-DmaxHeartbeats={self.max_heartbeats} "
+
+
+# Primero una pasada barata; solo si falla por recursos se repite con el presupuesto completo.
+DEFAULT_TIERS: tuple[EvaluationTier, ...] = (
+    EvaluationTier("fast", max_heartbeats=50_000, timeout=20),
+    EvaluationTier("full", max_heartbeats=400_000, timeout=240),
+)
+
+
+def is_resource_timeout(result: Any) -> bool:
+    """Si `result` falló por agotar heartbeats o tiempo (y no por un error del código)."""
+    if result.success:
+        return False
+    return any(marker in str(error) for error in result.errors for marker in _RESOURCE_TIMEOUT_MARKERS)
+
+
+def tiers_signature(tiers: Sequence[EvaluationTier]) -> str:
+    """Representación estable de los tiers para las claves de caché."""
+    return ",".join(f"{tier.name}:{tier.max_heartbeats}:{tier.timeout}" for tier in tiers)
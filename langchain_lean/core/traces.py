@@ -0,0 +1,356 @@
+﻿from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import logging
+import os
+import re
+import textwrap
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterable
+
+from langchain_lean.core.metrics import EvaluationEvent
+
+logger = logging.getLogger("langchain-lean-env")
+
+TRACE_VERSION = 1
+
+# Bloques ```lean en Markdown o dentro de strings JSON (p. ej. un backlog en JSONL).
+_FENCE_RE = re.compile(r"```lean4?[ \t]*\n(.*?)```", flags=re.DOTALL)
+# Un string de Python que contiene una declaración Lean.
+_LEAN_SNIPPET_RE = re.compile(r"^\s*(?:theorem|lemma|example|def)\s", flags=re.MULTILINE)
+
+
+def code_sha(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def outcome_summary(result: Any) -> dict[str, Any]:
+    """Resumen comparable de un `LeanExecutionResult`: flags y cantidad de errores y metas."""
+    return {
+        "success": bool(result.success),
+        "proof_complete": bool(result.proof_complete),
+        "has_sorry": bool(result.has_sorry),
+        "errors": len(result.errors),
+        "goals": len(result.goals),
+    }
+
+
+def search_outcome(output: str) -> dict[str, Any]:
+    """Resumen comparable de la respuesta JSON de `LeanSearchTool`."""
+    try:
+        payload = json.loads(output)
+    except (TypeError, ValueError):
+        return {"count": 0, "error": True}
+    return {"count": int(payload.get("count") or 0), "error": bool(payload.get("error"))}
+
+
+class TraceRecorder:
+    """Graba cada evaluación y búsqueda como una línea de un archivo JSONL.
+
+    Es un hook de métricas (`LeanEvaluator(metrics_hooks=[recorder])`); las búsquedas se
+    graban con `LeanSearchTool(trace=recorder)`. Cada línea lleva `kind`, `ts` (inicio,
+    epoch), `latency` (segundos), `source`, el sha256 del código y el resumen del
+    resultado (`outcome_summary`). Con `include_code=False` el código no se guarda: la
+    traza sirve para analizar la carga, pero esas llamadas no se pueden reproducir.
+    """
+
+    def __init__(self, path: str, include_code: bool = True):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.include_code = include_code
+        self.records = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def __call__(self, event: EvaluationEvent) -> None:
+        if not event.codes:
+            return
+        entry = self._entry("evaluate" if len(event.codes) == 1 else "evaluate_many", event.duration, event.source)
+        entry["cached"] = event.cached
+        items = [
+            {**self._code_fields(code), "outcome": outcome_summary(result)}
+            for code, result in zip(event.codes, event.results)
+        ]
+        if entry["kind"] == "evaluate":
+            entry.update(items[0] if items else self._code_fields(event.codes[0]))
+        else:
+            entry["items"] = items
+        self._write(entry)
+
+    def record_search(self, query: str, limit: int, backend: str, latency: float, output: str) -> None:
+        entry = self._entry("search", latency, "lean_search")
+        entry.update({"query": query, "limit": limit, "backend": backend, "outcome": search_outcome(output)})
+        self._write(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _entry(self, kind: str, latency: float, source: str) -> dict[str, Any]:
+        return {
+            "v": TRACE_VERSION,
+            "kind": kind,
+            "ts": round(time.time() - latency, 6),
+            "latency": round(latency, 6),
+            "source": source,
+        }
+
+    def _code_fields(self, code: str) -> dict[str, Any]:
+        fields: dict[str, Any] = {"sha": code_sha(code)}
+        if self.include_code:
+            fields["code"] = code
+        return fields
+
+    def _write(self, entry: dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records += 1
+
+
+def load_trace(path: str) -> list[dict[str, Any]]:
+    """Lee una traza JSONL; las líneas vacías o inválidas se ignoran."""
+    records: list[dict[str, Any]] = []
+    with open(os.path.expanduser(path), encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Línea %s de la traza %s no es JSON válido; se ignora.", number, path)
+                continue
+            if isinstance(record, dict) and record.get("kind"):
+                records.append(record)
+    return records
+
+
+def seed_trace(paths: Iterable[str]) -> list[dict[str, Any]]:
+    """Traza sintética con los snippets Lean encontrados en `paths`.
+
+    De los `.py` se toman los strings que contienen una declaración (`theorem`, `lemma`,
+    `example`, `def`); del resto (Markdown, JSONL...) los bloques ```lean. Los registros
+    no tienen `outcome` ni espaciado temporal: sirven para generar carga, no para diffs.
+    """
+    records: list[dict[str, Any]] = []
+    for path in paths:
+        for code in _lean_snippets(path):
+            records.append(
+                {
+                    "v": TRACE_VERSION,
+                    "kind": "evaluate",
+                    "ts": 0.0,
+                    "latency": 0.0,
+                    "source": f"seed:{os.path.basename(path)}",
+                    "sha": code_sha(code),
+                    "code": code,
+                }
+            )
+    return records
+
+
+def write_trace(records: Iterable[dict[str, Any]], path: str) -> int:
+    count = 0
+    with open(os.path.expanduser(path), "w", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def _lean_snippets(path: str) -> list[str]:
+    with open(path, encoding="utf-8-sig") as handle:
+        text = handle.read()
+    if path.endswith(".py"):
+        try:
+            tree = ast.parse(text)
+        except SyntaxError:
+            return []
+        return [
+            textwrap.dedent(node.value).strip() + "\n"
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and _LEAN_SNIPPET_RE.search(node.value)
+        ]
+    if path.endswith(".jsonl"):
+        # Los bloques viven dentro de strings JSON: se decodifica línea a línea.
+        text = "\n".join(_json_strings(line) for line in text.splitlines())
+    return [match.group(1).strip() + "\n" for match in _FENCE_RE.finditer(text)]
+
+
+def _json_strings(line: str) -> str:
+    try:
+        value = json.loads(line)
+    except json.JSONDecodeError:
+        return ""
+    stack, strings = [value], []
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            strings.append(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return "\n".join(strings)
+
+
+@dataclass
+class ReplayReport:
+    """Resultado de `TraceReplayer.replay`.
+
+    `latency` y `recorded_latency` tienen `count`, `p50_s`, `p90_s`, `p99_s` y `max_s`;
+    `diffs` lista las llamadas cuyo resumen de resultado cambió respecto a la traza.
+    """
+
+    total: int
+    replayed: int
+    skipped: int
+    failed: int
+    wall_time: float
+    throughput: float
+    latency: dict[str, float] = field(default_factory=dict)
+    recorded_latency: dict[str, float] = field(default_factory=dict)
+    diffs: list[dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class TraceReplayer:
+    """Reproduce una traza contra un evaluador (Docker, local o `RemoteLeanEvaluator`).
+
+    `speed=1` respeta el espaciado original entre llamadas, `speed=10` lo comprime diez
+    veces y `speed=0` lanza todo sin esperas. Las llamadas corren en hasta `concurrency`
+    hilos. Las búsquedas solo se reproducen si se pasa `search_tool`; las llamadas sin
+    código (trazas grabadas con `include_code=False`) se cuentan como `skipped`.
+    """
+
+    def __init__(self, evaluator: Any = None, search_tool: Any = None, speed: float = 1.0, concurrency: int = 4):
+        self.evaluator = evaluator
+        self.search_tool = search_tool
+        self.speed = max(0.0, speed)
+        self.concurrency = max(1, concurrency)
+
+    def replay(self, records: Iterable[dict[str, Any]]) -> ReplayReport:
+        ordered = sorted(records, key=lambda record: float(record.get("ts") or 0.0))
+        playable = [(index, record) for index, record in enumerate(ordered) if self._playable(record)]
+        first_ts = float(ordered[0].get("ts") or 0.0) if ordered else 0.0
+
+        started = time.monotonic()
+        submitted: list[tuple[int, dict[str, Any], Future]] = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="langchain-lean-replay") as executor:
+            for index, record in playable:
+                if self.speed > 0:
+                    delay = (float(record.get("ts") or 0.0) - first_ts) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                submitted.append((index, record, executor.submit(self._play, record)))
+
+            latencies: list[float] = []
+            diffs: list[dict[str, Any]] = []
+            failed = 0
+            for index, record, future in submitted:
+                try:
+                    latency, outcomes = future.result()
+                except Exception as exc:
+                    failed += 1
+                    logger.warning("Falló la reproducción de la llamada %s (%s): %s", index, record.get("kind"), exc)
+                    continue
+                latencies.append(latency)
+                for position, (recorded, replayed) in enumerate(zip(_recorded_outcomes(record), outcomes)):
+                    if recorded is not None and _differs(recorded, replayed):
+                        diffs.append(
+                            {
+                                "index": index,
+                                "item": position,
+                                "kind": record["kind"],
+                                "source": record.get("source"),
+                                "sha": _record_sha(record, position),
+                                "recorded": recorded,
+                                "replayed": replayed,
+                            }
+                        )
+        wall_time = time.monotonic() - started
+
+        return ReplayReport(
+            total=len(ordered),
+            replayed=len(latencies),
+            skipped=len(ordered) - len(playable),
+            failed=failed,
+            wall_time=wall_time,
+            throughput=len(latencies) / wall_time if wall_time > 0 else 0.0,
+            latency=latency_percentiles(latencies),
+            recorded_latency=latency_percentiles(
+                [float(record["latency"]) for _, record in playable if record.get("latency")]
+            ),
+            diffs=diffs,
+        )
+
+    def _playable(self, record: dict[str, Any]) -> bool:
+        kind = record.get("kind")
+        if kind == "evaluate":
+            return self.evaluator is not None and isinstance(record.get("code"), str)
+        if kind == "evaluate_many":
+            items = record.get("items") or []
+            return (
+                self.evaluator is not None
+                and bool(items)
+                and all(isinstance(item.get("code"), str) for item in items)
+            )
+        if kind == "search":
+            return self.search_tool is not None and isinstance(record.get("query"), str)
+        return False
+
+    def _play(self, record: dict[str, Any]) -> tuple[float, list[dict[str, Any]]]:
+        source = record.get("source") or "replay"
+        started = time.perf_counter()
+        if record["kind"] == "evaluate":
+            outcomes = [outcome_summary(self.evaluator.evaluate_code(record["code"], source=source))]
+        elif record["kind"] == "evaluate_many":
+            results = self.evaluator.evaluate_many([item["code"] for item in record["items"]], source=source)
+            outcomes = [outcome_summary(result) for result in results]
+        else:
+            output = self.search_tool._run(record["query"], int(record.get("limit") or 5))
+            outcomes = [search_outcome(output)]
+        return time.perf_counter() - started, outcomes
+
+
+def latency_percentiles(latencies: list[float]) -> dict[str, float]:
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+
+    def _at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50_s": _at(0.50),
+        "p90_s": _at(0.90),
+        "p99_s": _at(0.99),
+        "max_s": ordered[-1],
+    }
+
+
+def _recorded_outcomes(record: dict[str, Any]) -> list[dict[str, Any] | None]:
+    if record["kind"] == "evaluate_many":
+        return [item.get("outcome") for item in record.get("items") or []]
+    return [record.get("outcome")]
+
+
+def _record_sha(record: dict[str, Any], position: int) -> str | None:
+    if record["kind"] == "evaluate_many":
+        return (record.get("items") or [{}])[position].get("sha")
+    return record.get("sha")
+
+
+def _differs(recorded: dict[str, Any], replayed: dict[str, Any]) -> bool:
+    return any(recorded[key] != replayed[key] for key in recorded.keys() & replayed.keys())
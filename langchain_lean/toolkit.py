@@ -1,7 +1,9 @@
 ﻿from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Optional
 
+from langchain_lean.core.evaluator import LeanEvaluator
 from langchain_lean.tools.repl_tool import LeanREPLTool
 from langchain_lean.tools.run_tool import LeanRunTool
 from langchain_lean.tools.search_tool import LeanSearchTool
@@ -10,31 +12,52 @@ from langchain_lean.tools.state_tool import LeanStateTool
 
 @dataclass
 class LeanToolkit:
-    """Factory de herramientas Lean para agentes LangChain."""
+    """Factory de herramientas Lean para agentes LangChain.
+
+    Todas las tools que ejecutan Lean comparten un único `LeanEvaluator` (y por tanto un
+    único `LeanEnvironmentManager`), de modo que Docker se aprovisiona una sola vez, en la
+    primera ejecución de cualquiera de ellas.
+    """
 
     include_run: bool = True
     include_state: bool = True
     include_search: bool = True
     include_repl: bool = False
+    evaluator: Optional[LeanEvaluator] = None
+    search_backend: str = "loogle"
+    # Salida compacta en `lean_run`/`lean_state`/`lean_repl`: sin campos vacíos, errores agrupados y `raw_output` recortado.
+    compact: bool = False
 
     def get_tools(self) -> list:
         tools = []
         if self.include_run:
-            tools.append(LeanRunTool())
+            tools.append(LeanRunTool(evaluator=self.get_evaluator(), compact=self.compact))
         if self.include_state:
-            tools.append(LeanStateTool())
+            tools.append(LeanStateTool(evaluator=self.get_evaluator(), compact=self.compact))
         if self.include_search:
-            tools.append(LeanSearchTool())
+            tools.append(LeanSearchTool(backend=self.search_backend))
         if self.include_repl:
-            tools.append(LeanREPLTool())
+            tools.append(LeanREPLTool(evaluator=self.get_evaluator(), compact=self.compact))
         return tools
 
+    def get_evaluator(self) -> LeanEvaluator:
+        """Devuelve el evaluador compartido; el entorno se aprovisiona en el primer `_run`."""
+        if self.evaluator is None:
+            from langchain_lean.core.environment import LeanEnvironmentManager
+
+            env_manager = LeanEnvironmentManager()
+            self.evaluator = LeanEvaluator(environment_manager=env_manager)
+        return self.evaluator
+
 
 def create_lean_tools(
     include_run: bool = True,
     include_state: bool = True,
     include_search: bool = True,
     include_repl: bool = False,
+    evaluator: Optional[LeanEvaluator] = None,
+    search_backend: str = "loogle",
+    compact: bool = False,
 ) -> list:
     """Devuelve una lista de herramientas Lean listas para usar en un agente."""
     return LeanToolkit(
@@ -42,4 +65,7 @@ def create_lean_tools(
         include_state=include_state,
         include_search=include_search,
         include_repl=include_repl,
+        evaluator=evaluator,
+        search_backend=search_backend,
+        compact=compact,
     ).get_tools()
@@ -1,7 +1,21 @@
-﻿from langchain_lean.tools.repl_tool import LeanREPLTool
-from langchain_lean.tools.run_tool import LeanRunTool
-from langchain_lean.tools.search_tool import LeanSearchTool
-from langchain_lean.tools.state_tool import LeanStateTool
+﻿from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from langchain_lean._lazy import lazy_module_attributes
+
+if TYPE_CHECKING:
+    from langchain_lean.tools.repl_tool import LeanREPLTool
+    from langchain_lean.tools.run_tool import LeanRunTool
+    from langchain_lean.tools.search_tool import LeanSearchTool
+    from langchain_lean.tools.state_tool import LeanStateTool
+
+_LAZY_ATTRIBUTES = {
+    "LeanREPLTool": "langchain_lean.tools.repl_tool",
+    "LeanRunTool": "langchain_lean.tools.run_tool",
+    "LeanStateTool": "langchain_lean.tools.state_tool",
+    "LeanSearchTool": "langchain_lean.tools.search_tool",
+}
 
 __all__ = [
     "LeanREPLTool",
@@ -9,3 +23,5 @@ __all__ = [
     "LeanStateTool",
     "LeanSearchTool",
 ]
+
+__getattr__, __dir__ = lazy_module_attributes(__name__, _LAZY_ATTRIBUTES, globals())
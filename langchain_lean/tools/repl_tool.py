@@ -1,12 +1,24 @@
 ﻿from __future__ import annotations
 
-import json
+import asyncio
 from typing import Any, Optional, Type
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, PrivateAttr
 
+from langchain_lean.core.encoding import dedupe_messages
+from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
+from langchain_lean.core.repl_session import LeanREPLError, LeanREPLSession, parse_repl_response
+from langchain_lean.core.source import import_header_key, split_import_header
+from langchain_lean.core.tactic_memo import TacticOutcomeMemo
 from langchain_lean.tools.run_tool import LeanRunTool
+from langchain_lean.tools.state_tool import LeanStateTool
+
+
+_NO_SESSION_MESSAGE = (
+    "`stateful=True` necesita un entorno Lean local para la sesión REPL; el evaluador "
+    "remoto no lo tiene. Usa `stateful=False`."
+)
 
 
 class LeanREPLInput(BaseModel):
@@ -21,41 +33,133 @@ class LeanREPLTool(BaseTool):
         "REPL de Lean 4: ejecuta un bloque de código y devuelve éxito, metas pendientes o errores."
     )
     args_schema: Type[BaseModel] = LeanREPLInput
+    stateful: bool = Field(
+        default=False,
+        description="Si es True, usa una sesión REPL persistente donde cada bloque ve las declaraciones previas.",
+    )
+    compact: bool = Field(
+        default=False,
+        description="Si es True, agrupa los errores repetidos (`\"... (x3)\"`) para no inflar el contexto del LLM.",
+    )
 
     _run_tool: Optional[LeanRunTool] = PrivateAttr(default=None)
-
-    def __init__(self, **kwargs: Any):
+    _state_tool: Optional[LeanStateTool] = PrivateAttr(default=None)
+    _tactic_memo: Optional[TacticOutcomeMemo] = PrivateAttr(default=None)
+    _session: Optional[LeanREPLSession] = PrivateAttr(default=None)
+    _committed_env: Optional[int] = PrivateAttr(default=None)
+    _committed_header: str = PrivateAttr(default="")
+
+    def __init__(
+        self,
+        evaluator: Optional[LeanEvaluator] = None,
+        tactic_memo: Optional[TacticOutcomeMemo] = None,
+        **kwargs: Any,
+    ):
         super().__init__(**kwargs)
-        self._run_tool = LeanRunTool()
+        if self.stateful and evaluator is not None and evaluator.env_manager is None:
+            raise ValueError(_NO_SESSION_MESSAGE)
+        self._run_tool = LeanRunTool(evaluator=evaluator)
+        # Memo (meta canónica, táctica) -> resultado, consultado en modo sin estado (ver `_evaluate`).
+        self._tactic_memo = tactic_memo
 
     def _run(self, code: str) -> str:
+        if self.stateful:
+            return self._run_in_session(code)
+
+        return _format_result(self._evaluate(code), compact=self.compact)
+
+    def _evaluate(self, code: str) -> LeanExecutionResult:
+        """Evalúa un bloque sin estado; con memo, táctica a táctica como `LeanStateTool(incremental=True)`."""
         if self._run_tool is None:
             self._run_tool = LeanRunTool()
-
-        raw = self._run_tool.run(code)
+        if self._tactic_memo is None:
+            return self._run_tool.evaluate(code)
+        if self._state_tool is None:
+            self._state_tool = LeanStateTool(
+                evaluator=self._run_tool._get_evaluator(), incremental=True, tactic_memo=self._tactic_memo
+            )
+        return self._state_tool.evaluate(code)
+
+    def _run_in_session(self, code: str) -> str:
+        session = self._get_session()
+        header, body = split_import_header(code)
+        header_key = import_header_key(code)
+        env = self._committed_env
+        if env is not None and header_key and header_key != self._committed_header:
+            # El REPL solo acepta imports al inicio de un entorno nuevo: otros imports
+            # arrancan un entorno desde cero (las declaraciones previas no se ven).
+            env = None
+        if env is not None:
+            # Imports ya elaborados en el entorno: se omiten, conservando las líneas
+            # para que las posiciones de los mensajes no cambien.
+            code = "\n" * header.count("\n") + body
         try:
-            result = json.loads(raw)
-        except json.JSONDecodeError:
-            return raw
+            response = session.run_command(code, env=env)
+        except LeanREPLError as exc:
+            self._committed_env = None
+            return f"ERROR LEAN:\n{exc}"
+
+        parsed = parse_repl_response(response)
+        # Solo avanzamos el entorno cuando el bloque elaboró sin errores, para que un
+        # intento fallido no contamine los comandos siguientes.
+        if parsed.success and isinstance(response.get("env"), int):
+            if env is None:
+                self._committed_header = header_key
+            self._committed_env = response["env"]
+        return _format_result(LeanExecutionResult.from_parsed(parsed), compact=self.compact)
+
+    def reset_session(self) -> None:
+        """Cierra la sesión REPL; la próxima llamada parte de un entorno vacío."""
+        if self._session is not None:
+            self._session.close()
+        self._session = None
+        self._committed_env = None
+        self._committed_header = ""
+
+    def _get_session(self) -> LeanREPLSession:
+        if self._session is None or not self._session.is_alive:
+            if self._run_tool is None:
+                self._run_tool = LeanRunTool()
+            env_manager = self._run_tool._get_evaluator().env_manager
+            if env_manager is None:
+                raise ValueError(_NO_SESSION_MESSAGE)
+            self._session = LeanREPLSession(env_manager.repl_command(), cwd=env_manager.workspace_path)
+            self._committed_env = None
+            self._committed_header = ""
+        return self._session
 
-        if not result.get("success", False):
-            errors = "\n".join(result.get("errors") or ["Error desconocido"])
-            return f"ERROR LEAN:\n{errors}"
+    async def _arun(self, code: str) -> str:
+        if self.stateful:
+            # La sesión REPL es un único proceso serial: basta con no bloquear el loop.
+            return await asyncio.to_thread(self._run_in_session, code)
 
-        if result.get("proof_complete", False):
-            return "EXITO: demostración completa (sin metas pendientes)."
+        if self._tactic_memo is not None:
+            # El checker incremental usa una sesión REPL serial, como el modo `stateful`.
+            return _format_result(await asyncio.to_thread(self._evaluate, code), compact=self.compact)
 
-        goals = result.get("goals") or []
-        if goals:
-            lines = ["DEMOSTRACION INCOMPLETA:"]
-            for idx, goal in enumerate(goals, start=1):
-                lines.append(f"Goal {idx}: {goal.get('goal')}")
-                context = goal.get("context") or []
-                for ctx_line in context:
-                    lines.append(f"  {ctx_line}")
-            return "\n".join(lines)
+        if self._run_tool is None:
+            self._run_tool = LeanRunTool()
 
-        return "Demostración compilada, pero Lean reportó estado no final."
+        return _format_result(await self._run_tool.aevaluate(code), compact=self.compact)
 
-    async def _arun(self, code: str) -> str:
-        return self._run(code)
+
+def _format_result(result: LeanExecutionResult, compact: bool = False) -> str:
+    if not result.success:
+        messages = dedupe_messages(result.errors) if compact else result.errors
+        errors = "\n".join(messages or ["Error desconocido"])
+        return f"ERROR LEAN:\n{errors}"
+
+    if result.proof_complete:
+        return "EXITO: demostración completa (sin metas pendientes)."
+
+    goals = result.goals
+    if goals:
+        lines = ["DEMOSTRACION INCOMPLETA:"]
+        for idx, goal in enumerate(goals, start=1):
+            lines.append(f"Goal {idx}: {goal.get('goal')}")
+            context = goal.get("context") or []
+            for ctx_line in context:
+                lines.append(f"  {ctx_line}")
+        return "\n".join(lines)
+
+    return "Demostración compilada, pero Lean reportó estado no final."
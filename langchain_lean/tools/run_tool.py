@@ -1,13 +1,16 @@
 ﻿from __future__ import annotations
 
-import json
-from typing import Any, Optional, Type
+import asyncio
+from typing import TYPE_CHECKING, Any, Optional, Type
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, PrivateAttr
 
-from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
-from langchain_lean.core.environment import LeanEnvironmentManager
+from langchain_lean.core.encoding import DEFAULT_COMPACT_RAW_CHARS, encode_declarations, encode_result
+from langchain_lean.core.evaluator import LeanDeclarationResult, LeanEvaluator, LeanExecutionResult
+
+if TYPE_CHECKING:
+    from langchain_lean.core.environment import LeanEnvironmentManager
 
 
 class LeanRunInput(BaseModel):
@@ -22,24 +25,128 @@ class LeanRunTool(BaseTool):
         "Ejecuta código Lean 4 en un entorno Dockerizado y retorna JSON con success, goals, errors y warnings."
     )
     args_schema: Type[BaseModel] = LeanRunInput
+    compact: bool = Field(
+        default=False,
+        description=(
+            "Si es True, el JSON omite campos vacíos, agrupa errores repetidos y recorta "
+            "`raw_output` a `max_raw_output_chars` para no inflar el contexto del LLM."
+        ),
+    )
+    max_raw_output_chars: int = Field(default=DEFAULT_COMPACT_RAW_CHARS, description="Límite de `raw_output` en modo compacto.")
+    per_declaration: bool = Field(
+        default=False,
+        description=(
+            "Si es True, cada declaración del archivo se verifica por separado y en paralelo "
+            "(`LeanEvaluator.evaluate_declarations`) y el JSON trae un resultado por declaración."
+        ),
+    )
 
     _env_manager: Optional[LeanEnvironmentManager] = PrivateAttr(default=None)
     _evaluator: Optional[LeanEvaluator] = PrivateAttr(default=None)
 
-    def __init__(self, **kwargs: Any):
+    def __init__(self, evaluator: Optional[LeanEvaluator] = None, **kwargs: Any):
         super().__init__(**kwargs)
-        self._env_manager = LeanEnvironmentManager()
-        self._env_manager.provision_environment()
-        self._evaluator = LeanEvaluator(environment_manager=self._env_manager)
+        if evaluator is not None:
+            # Evaluador compartido (p. ej. inyectado por `LeanToolkit`): no se reprovisiona.
+            self._env_manager = evaluator.env_manager
+            self._evaluator = evaluator
+        # Sin evaluador, Docker se conecta y aprovisiona en el primer `_run`, no aquí.
 
     def _run(self, code: str) -> str:
-        if self._evaluator is None:
-            self._env_manager = LeanEnvironmentManager()
-            self._env_manager.provision_environment()
-            self._evaluator = LeanEvaluator(environment_manager=self._env_manager)
+        if self.per_declaration:
+            declarations = self._get_evaluator().evaluate_declarations(code, source=self.name)
+            return self._encode_declarations(declarations)
+        return self._encode(self.evaluate(code))
+
+    def evaluate(self, code: str) -> LeanExecutionResult:
+        """Resultado tipado, sin serializar (para otras tools en el mismo proceso)."""
+        return self._get_evaluator().evaluate_code(code, source=self.name)
+
+    async def aevaluate(self, code: str) -> LeanExecutionResult:
+        evaluator = await asyncio.to_thread(self._get_evaluator)
+        return await evaluator.aevaluate_code(code, source=self.name)
+
+    def _encode(self, result: LeanExecutionResult) -> str:
+        return encode_result(result, compact=self.compact, max_raw_output_chars=self.max_raw_output_chars)
+
+    def _encode_declarations(self, declarations: list[LeanDeclarationResult]) -> str:
+        return encode_declarations(
+            declarations, compact=self.compact, max_raw_output_chars=self.max_raw_output_chars
+        )
+
+    def _get_evaluator(self) -> LeanEvaluator:
+        self._evaluator, self._env_manager = ensure_evaluator(self._evaluator)
+        return self._evaluator
+
+    def batch(
+        self,
+        inputs: list[Any],
+        config: Any = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Verifica todos los snippets con `LeanEvaluator.evaluate_many`.
 
-        result: LeanExecutionResult = self._evaluator.evaluate_code(code)
-        return json.dumps(result.model_dump(), ensure_ascii=False)
+        Los snippets que comparten cabecera de imports se agrupan en una sola invocación
+        del contenedor; se devuelve un JSON por entrada, en el mismo orden.
+        """
+        codes = [_extract_code(item) for item in inputs]
+        if any(code is None for code in codes):
+            return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+        results = self._get_evaluator().evaluate_many(codes, source=self.name)  # type: ignore[arg-type]
+        return [self._encode(result) for result in results]
+
+    async def abatch(
+        self,
+        inputs: list[Any],
+        config: Any = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[str]:
+        codes = [_extract_code(item) for item in inputs]
+        if any(code is None for code in codes):
+            return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+        evaluator = await asyncio.to_thread(self._get_evaluator)
+        results = await evaluator.aevaluate_many(codes, source=self.name)  # type: ignore[arg-type]
+        return [self._encode(result) for result in results]
 
     async def _arun(self, code: str) -> str:
-        return self._run(code)
+        if self.per_declaration:
+            evaluator = await asyncio.to_thread(self._get_evaluator)
+            declarations = await evaluator.aevaluate_declarations(code, source=self.name)
+            return self._encode_declarations(declarations)
+        return self._encode(await self.aevaluate(code))
+
+
+def ensure_evaluator(
+    evaluator: Optional[LeanEvaluator],
+) -> tuple[LeanEvaluator, Optional["LeanEnvironmentManager"]]:
+    """Crea el evaluador si falta y se asegura de que su entorno esté aprovisionado.
+
+    Los managers inyectados (p. ej. por `LeanToolkit`) se construyen sin aprovisionar; el
+    aprovisionamiento ocurre aquí, en la primera ejecución de la tool.
+    """
+    if evaluator is None:
+        from langchain_lean.core.environment import LeanEnvironmentManager
+
+        evaluator = LeanEvaluator(environment_manager=LeanEnvironmentManager())
+    env_manager = evaluator.env_manager
+    ensure_provisioned = getattr(env_manager, "ensure_provisioned", None)
+    if ensure_provisioned is not None:
+        ensure_provisioned()
+    return evaluator, env_manager
+
+
+def _extract_code(item: Any) -> Optional[str]:
+    """Acepta `"codigo"`, `{"code": ...}` o un ToolCall `{"args": {"code": ...}}`."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        args = item.get("args", item)
+        if isinstance(args, dict) and isinstance(args.get("code"), str):
+            return args["code"]
+    return None
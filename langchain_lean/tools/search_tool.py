@@ -1,12 +1,18 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import json
-from typing import Type
-from urllib.parse import quote_plus
-from urllib.request import urlopen
+import os
+import time
+from pathlib import Path
+from typing import Any, Literal, Optional, Type
 
 from langchain.tools import BaseTool
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from langchain_lean.core.declarations import INDEX_FILENAME, LeanDeclarationIndex
+from langchain_lean.core.search_client import LoogleClient
+from langchain_lean.core.traces import TraceRecorder
 
 
 class LeanSearchInput(BaseModel):
@@ -15,61 +21,193 @@ class LeanSearchInput(BaseModel):
 
 
 class LeanSearchTool(BaseTool):
-    """Busca términos Lean en Loogle."""
+    """Busca términos Lean en Loogle o en un índice local de declaraciones.
+
+    `backend="local"` consulta un `LeanDeclarationIndex` en SQLite (ver
+    `LeanDeclarationIndex.build_from_environment`) y no necesita red.
+    """
 
     name: str = "lean_search"
     description: str = (
         "Busca definiciones y teoremas de Lean/Mathlib usando Loogle y retorna resultados en JSON."
     )
     args_schema: Type[BaseModel] = LeanSearchInput
+    backend: Literal["loogle", "local"] = "loogle"
+    index_path: Optional[str] = None
 
-    def _run(self, query: str, limit: int = 5) -> str:
-        encoded = quote_plus(query)
-        api_url = f"https://loogle.lean-lang.org/json?q={encoded}"
-        web_url = f"https://loogle.lean-lang.org/?q={encoded}"
+    _index: Optional[LeanDeclarationIndex] = PrivateAttr(default=None)
+    _client: Optional[LoogleClient] = PrivateAttr(default=None)
+    _trace: Optional[TraceRecorder] = PrivateAttr(default=None)
 
-        try:
-            with urlopen(api_url, timeout=12) as response:
-                payload = json.loads(response.read().decode("utf-8"))
-
-            if isinstance(payload, dict):
-                items = payload.get("hits") or payload.get("results") or []
-            elif isinstance(payload, list):
-                items = payload
-            else:
-                items = []
-
-            normalized = []
-            for item in items[:limit]:
-                normalized.append(
-                    {
-                        "name": item.get("name") or item.get("declName") or item.get("title"),
-                        "type": item.get("type") or item.get("signature"),
-                        "doc": item.get("doc"),
-                        "source": item.get("source") or web_url,
-                    }
-                )
+    def __init__(self, client: Optional[LoogleClient] = None, trace: Optional[TraceRecorder] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        # Cliente compartible entre tools: conexiones keep-alive y caché de respuestas.
+        self._client = client
+        # Grabación opt-in de cada búsqueda (consulta, latencia y cantidad de resultados).
+        self._trace = trace
 
+    def _run(self, query: str, limit: int = 5) -> str:
+        started = time.perf_counter()
+        if self.backend == "local":
+            output = self._search_local(query, limit)
+        else:
+            output = self._search_loogle(query, limit)
+        self._record([query], limit, started, [output])
+        return output
+
+    def _search_local(self, query: str, limit: int) -> str:
+        index = self._get_index()
+        if index.count() == 0:
             return json.dumps(
                 {
                     "query": query,
-                    "count": len(normalized),
-                    "results": normalized,
-                    "source": web_url,
+                    "count": 0,
+                    "results": [],
+                    "source": index.path,
+                    "error": "El índice local de declaraciones está vacío; constrúyelo con "
+                    "`LeanDeclarationIndex.build_from_environment`.",
                 },
                 ensure_ascii=False,
             )
+        results = index.search(query, limit=limit)
+        return json.dumps(
+            {
+                "query": query,
+                "count": len(results),
+                "results": [
+                    {"name": item["name"], "type": item["type"], "doc": item["doc"] or None, "source": item["module"]}
+                    for item in results
+                ],
+                "source": index.path,
+            },
+            ensure_ascii=False,
+        )
+
+    def _get_index(self) -> LeanDeclarationIndex:
+        if self._index is None:
+            default_path = os.path.join(Path.home(), ".cache", "langchain-lean", INDEX_FILENAME)
+            self._index = LeanDeclarationIndex(self.index_path or default_path)
+        return self._index
+
+    def search_many(self, queries: list[str], limit: int = 5) -> list[str]:
+        """Resuelve varias consultas en paralelo (conexiones y caché compartidas)."""
+        started = time.perf_counter()
+        if self.backend == "local":
+            outputs = [self._search_local(query, limit) for query in queries]
+        else:
+            payloads = self._get_client().fetch_many(queries)
+            outputs = [self._format_loogle(query, limit, payload) for query, payload in zip(queries, payloads)]
+        self._record(queries, limit, started, outputs)
+        return outputs
+
+    async def asearch_many(self, queries: list[str], limit: int = 5) -> list[str]:
+        if self.backend == "local":
+            return await asyncio.to_thread(self.search_many, queries, limit)
+        started = time.perf_counter()
+        payloads = await self._get_client().afetch_many(queries)
+        outputs = [self._format_loogle(query, limit, payload) for query, payload in zip(queries, payloads)]
+        self._record(queries, limit, started, outputs)
+        return outputs
+
+    def _record(self, queries: list[str], limit: int, started: float, outputs: list[str]) -> None:
+        if self._trace is None:
+            return
+        # Las consultas de un lote corren juntas: cada una se graba con la latencia del lote.
+        latency = time.perf_counter() - started
+        for query, output in zip(queries, outputs):
+            self._trace.record_search(query, limit, self.backend, latency, output)
+
+    def batch(
+        self,
+        inputs: list[Any],
+        config: Any = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Agrupa las consultas en `search_many` si todas comparten `limit`."""
+        parsed = [item for item in map(_extract_query, inputs) if item is not None]
+        if len(parsed) != len(inputs) or len({limit for _, limit in parsed}) > 1:
+            return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        return self.search_many([query for query, _ in parsed], limit=parsed[0][1] if parsed else 5)
+
+    async def abatch(
+        self,
+        inputs: list[Any],
+        config: Any = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[str]:
+        parsed = [item for item in map(_extract_query, inputs) if item is not None]
+        if len(parsed) != len(inputs) or len({limit for _, limit in parsed}) > 1:
+            return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        return await self.asearch_many([query for query, _ in parsed], limit=parsed[0][1] if parsed else 5)
+
+    def _get_client(self) -> LoogleClient:
+        if self._client is None:
+            self._client = LoogleClient()
+        return self._client
+
+    def _search_loogle(self, query: str, limit: int) -> str:
+        try:
+            payload: Any = self._get_client().fetch(query)
         except Exception as exc:
+            payload = exc
+        return self._format_loogle(query, limit, payload)
+
+    def _format_loogle(self, query: str, limit: int, payload: Any) -> str:
+        web_url = self._get_client().web_url(query)
+        if isinstance(payload, Exception):
             return json.dumps(
                 {
                     "query": query,
                     "count": 0,
                     "results": [],
                     "source": web_url,
-                    "error": f"No se pudo consultar Loogle API: {exc}",
+                    "error": f"No se pudo consultar Loogle API: {payload}",
                 },
                 ensure_ascii=False,
             )
 
+        if isinstance(payload, dict):
+            items = payload.get("hits") or payload.get("results") or []
+        elif isinstance(payload, list):
+            items = payload
+        else:
+            items = []
+
+        normalized = []
+        for item in items[:limit]:
+            normalized.append(
+                {
+                    "name": item.get("name") or item.get("declName") or item.get("title"),
+                    "type": item.get("type") or item.get("signature"),
+                    "doc": item.get("doc"),
+                    "source": item.get("source") or web_url,
+                }
+            )
+
+        return json.dumps(
+            {
+                "query": query,
+                "count": len(normalized),
+                "results": normalized,
+                "source": web_url,
+            },
+            ensure_ascii=False,
+        )
+
     async def _arun(self, query: str, limit: int = 5) -> str:
-        return self._run(query=query, limit=limit)
+        return await asyncio.to_thread(self._run, query=query, limit=limit)
+
+
+def _extract_query(item: Any) -> Optional[tuple[str, int]]:
+    """Acepta `"consulta"`, `{"query": ..., "limit": ...}` o un ToolCall con `args`."""
+    if isinstance(item, str):
+        return item, 5
+    if isinstance(item, dict):
+        args = item.get("args", item)
+        if isinstance(args, dict) and isinstance(args.get("query"), str):
+            return args["query"], int(args.get("limit", 5))
+    return None
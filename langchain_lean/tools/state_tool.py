@@ -1,17 +1,34 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Optional, Type
+from typing import TYPE_CHECKING, Any, Optional, Type
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field, PrivateAttr
 
-from langchain_lean.core.evaluator import LeanEvaluator
-from langchain_lean.core.environment import LeanEnvironmentManager
+from langchain_lean.core.checkpoints import IncrementalProofChecker
+from langchain_lean.core.encoding import DEFAULT_COMPACT_RAW_CHARS, STATE_FIELDS, encode_result, result_payload
+from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
+from langchain_lean.core.handles import ExecutionHandle
+from langchain_lean.core.proof_search import AlternativeResult, evaluate_alternatives
+from langchain_lean.core.repl_session import LeanREPLSession
+from langchain_lean.core.tactic_memo import TacticOutcomeMemo
+from langchain_lean.tools.run_tool import ensure_evaluator
+
+if TYPE_CHECKING:
+    from langchain_lean.core.environment import LeanEnvironmentManager
 
 
 class LeanStateInput(BaseModel):
     code: str = Field(..., description="Demostración parcial en Lean 4 para inspeccionar metas pendientes.")
+    alternatives: Optional[list[str]] = Field(
+        default=None,
+        description=(
+            "Tácticas candidatas para continuar `code`. Se prueban en paralelo y se devuelven "
+            "ordenadas (primero las que cierran la prueba, luego por metas restantes)."
+        ),
+    )
 
 
 class LeanStateTool(BaseTool):
@@ -19,36 +36,133 @@ class LeanStateTool(BaseTool):
 
     name: str = "lean_state"
     description: str = (
-        "Ejecuta una prueba Lean parcial y retorna JSON con goals abiertas, proof_complete y errores."
+        "Ejecuta una prueba Lean parcial y retorna JSON con goals abiertas, proof_complete y errores. "
+        "Con `alternatives` prueba varias tácticas siguientes en paralelo y las devuelve ordenadas."
     )
     args_schema: Type[BaseModel] = LeanStateInput
+    incremental: bool = Field(
+        default=False,
+        description=(
+            "Si es True, usa una sesión REPL y recuerda los estados por prefijo de tácticas: "
+            "una prueba que extiende otra ya vista solo ejecuta las tácticas nuevas. Con un "
+            "evaluador remoto (sin sesión local) se evalúa el archivo completo."
+        ),
+    )
+    compact: bool = Field(
+        default=False,
+        description="Si es True, omite campos vacíos, agrupa errores repetidos y recorta `raw_output`.",
+    )
+    max_raw_output_chars: int = Field(default=DEFAULT_COMPACT_RAW_CHARS, description="Límite de `raw_output` en modo compacto.")
+    stop_on_success: bool = Field(
+        default=True,
+        description=(
+            "Con `alternatives`: responder en cuanto una cierra la prueba y cancelar las demás. "
+            "Si es False se esperan todas para ordenarlas."
+        ),
+    )
 
     _env_manager: Optional[LeanEnvironmentManager] = PrivateAttr(default=None)
     _evaluator: Optional[LeanEvaluator] = PrivateAttr(default=None)
+    _checker: Optional[IncrementalProofChecker] = PrivateAttr(default=None)
+    _tactic_memo: Optional[TacticOutcomeMemo] = PrivateAttr(default=None)
 
-    def __init__(self, **kwargs: Any):
+    def __init__(
+        self,
+        evaluator: Optional[LeanEvaluator] = None,
+        tactic_memo: Optional[TacticOutcomeMemo] = None,
+        **kwargs: Any,
+    ):
         super().__init__(**kwargs)
-        self._env_manager = LeanEnvironmentManager()
-        self._env_manager.provision_environment()
-        self._evaluator = LeanEvaluator(environment_manager=self._env_manager)
+        # Memo (meta canónica, táctica) -> resultado, consultado en modo `incremental`.
+        self._tactic_memo = tactic_memo
+        if evaluator is not None:
+            # Evaluador compartido (p. ej. inyectado por `LeanToolkit`): no se reprovisiona.
+            self._env_manager = evaluator.env_manager
+            self._evaluator = evaluator
+        # Sin evaluador, Docker se conecta y aprovisiona en el primer `_run`, no aquí.
+
+    def _run(self, code: str, alternatives: Optional[list[str]] = None) -> str:
+        if alternatives:
+            return self._encode_alternatives(self.evaluate_alternatives(code, alternatives))
+        return self._encode(self.evaluate(code))
 
-    def _run(self, code: str) -> str:
-        if self._evaluator is None:
-            self._env_manager = LeanEnvironmentManager()
-            self._env_manager.provision_environment()
-            self._evaluator = LeanEvaluator(environment_manager=self._env_manager)
+    def evaluate(self, code: str) -> LeanExecutionResult:
+        """Resultado tipado, sin serializar (para otras tools en el mismo proceso)."""
+        evaluator = self._get_evaluator()
+        if self.incremental and self._env_manager is not None:
+            return LeanExecutionResult.from_parsed(self._get_checker().check(code))
+        return evaluator.evaluate_code(code, source=self.name)
 
-        result = self._evaluator.evaluate_code(code)
+    def evaluate_alternatives(
+        self, code: str, alternatives: list[str], handle: ExecutionHandle | None = None
+    ) -> list[AlternativeResult]:
+        """Prueba cada continuación de `code` en paralelo (ver `evaluate_alternatives`).
+
+        Siempre usa el evaluador, también con `incremental=True`: la sesión REPL es
+        única y serializaría las alternativas.
+        """
+        return evaluate_alternatives(
+            self._get_evaluator(),
+            code,
+            alternatives,
+            stop_on_success=self.stop_on_success,
+            handle=handle,
+            source=self.name,
+        )
+
+    def _encode_alternatives(self, alternatives: list[AlternativeResult]) -> str:
+        entries = []
+        for alternative in alternatives:
+            entry: dict[str, Any] = {"index": alternative.index, "tactic": alternative.continuation}
+            if alternative.cancelled:
+                entry["cancelled"] = True
+            else:
+                entry.update(
+                    result_payload(
+                        alternative.result,
+                        STATE_FIELDS,
+                        compact=self.compact,
+                        max_raw_output_chars=self.max_raw_output_chars,
+                    )
+                )
+            entries.append(entry)
         payload = {
-            "success": result.success,
-            "proof_complete": result.proof_complete,
-            "has_sorry": result.has_sorry,
-            "goals": result.goals,
-            "errors": result.errors,
-            "warnings": result.warnings,
-            "raw_output": result.raw_output,
+            "proof_complete": any(not alt.cancelled and alt.result.proof_complete for alt in alternatives),
+            "alternatives": entries,
         }
+        if self.compact:
+            return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
         return json.dumps(payload, ensure_ascii=False)
 
-    async def _arun(self, code: str) -> str:
-        return self._run(code)
+    def _encode(self, result: LeanExecutionResult) -> str:
+        return encode_result(
+            result, STATE_FIELDS, compact=self.compact, max_raw_output_chars=self.max_raw_output_chars
+        )
+
+    def _get_evaluator(self) -> LeanEvaluator:
+        self._evaluator, self._env_manager = ensure_evaluator(self._evaluator)
+        return self._evaluator
+
+    def _get_checker(self) -> IncrementalProofChecker:
+        if self._checker is None:
+            assert self._env_manager is not None
+            session = LeanREPLSession(self._env_manager.repl_command(), cwd=self._env_manager.workspace_path)
+            self._checker = IncrementalProofChecker(session, memo=self._tactic_memo)
+        return self._checker
+
+    async def _arun(self, code: str, alternatives: Optional[list[str]] = None) -> str:
+        if alternatives:
+            handle = ExecutionHandle()
+            task = asyncio.ensure_future(asyncio.to_thread(self.evaluate_alternatives, code, alternatives, handle))
+            try:
+                return self._encode_alternatives(await asyncio.shield(task))
+            except asyncio.CancelledError:
+                # La tarea del agente se canceló: se matan todas las alternativas en curso.
+                handle.cancel()
+                raise
+        if self.incremental:
+            return await asyncio.to_thread(self._run, code)
+
+        evaluator = await asyncio.to_thread(self._get_evaluator)
+        result = await evaluator.aevaluate_code(code, source=self.name)
+        return self._encode(result)
@@ -0,0 +1,72 @@
+﻿import threading
+import time
+
+from langchain_lean.core.backends import LocalProcessBackend
+from langchain_lean.core.environment import LeanEnvironmentManager
+from langchain_lean.core.handles import CANCELLED_MESSAGE, ExecutionHandle
+
+
+def test_local_backend_returns_exit_code_and_output(tmp_path):
+    (tmp_path / "check.lean").write_text("theorem t : True := trivial\n", encoding="utf-8")
+    backend = LocalProcessBackend(str(tmp_path))
+
+    exit_code, output = backend.run("cat check.lean; echo oops >&2; exit 3")
+
+    assert exit_code == 3
+    assert "theorem t" in output
+    assert "oops" in output
+
+
+def test_local_backend_kills_on_timeout():
+    backend = LocalProcessBackend(".")
+
+    started = time.monotonic()
+    exit_code, output = backend.run("sleep 30", timeout=1)
+
+    assert exit_code == -1
+    assert "tiempo límite de 1s" in output
+    assert time.monotonic() - started < 10
+
+
+def test_local_backend_limits_concurrent_processes(tmp_path):
+    backend = LocalProcessBackend(str(tmp_path), max_processes=2)
+    command = "echo x >> running; n=$(wc -l < running); echo $n >> peaks; sleep 0.3; sed -i '$d' running"
+    threads = [threading.Thread(target=backend.run, args=(command,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    peaks = [int(line) for line in (tmp_path / "peaks").read_text().split()]
+    assert len(peaks) == 6
+    assert max(peaks) <= 2
+
+
+def test_local_backend_cancellation():
+    backend = LocalProcessBackend(".")
+    handle = ExecutionHandle()
+    threading.Timer(0.3, handle.cancel).start()
+
+    exit_code, output = backend.run("sleep 30", timeout=60, handle=handle)
+
+    assert exit_code == -1
+    assert output == CANCELLED_MESSAGE
+
+
+def test_environment_manager_local_backend_streams_without_docker(tmp_path, monkeypatch):
+    monkeypatch.setenv("LANGCHAIN_LEAN_BACKEND", "local")
+    manager = LeanEnvironmentManager(workspace_path=str(tmp_path), cache_path=str(tmp_path / "cache"))
+    seen = []
+
+    def _on_output(chunk):
+        seen.append(chunk)
+        return "stop" not in chunk
+
+    exit_code, output = manager.run_command_in_container(
+        "echo uno; sleep 0.2; echo stop; sleep 30", timeout=60, on_output=_on_output
+    )
+
+    assert manager.client is None
+    assert exit_code == 1
+    assert "uno" in output
+    assert manager.repl_command() == ["bash", "-lc", "lake env repl"]
@@ -0,0 +1,26 @@
+﻿from benchmarks.run_benchmarks import bench_headers, compare, generate_text_output, run_all
+from langchain_lean.core.parser import parse_lean_output
+
+
+def test_generated_output_has_many_goals():
+    raw = generate_text_output(4096)
+
+    assert len(raw.encode("utf-8")) >= 4096
+    assert len(parse_lean_output(raw, 1).goals) > 10
+
+
+def test_run_all_smoke_and_compare():
+    report = run_all(sizes=[1024], repeat=1, model_iterations=5, evaluations=3)
+
+    assert {"parser.text.1024", "parser.json.1024", "model.json.10", "evaluator.cached", "headers.header"} <= set(report["metrics"])
+    assert compare(report, report, threshold=1.25) == []
+
+    slower = {"metrics": {name: dict(values) for name, values in report["metrics"].items()}}
+    slower["metrics"]["parser.text.1024"]["best_s"] *= 10
+    assert compare(slower, report, threshold=1.25)[0].startswith("parser.text.1024.best_s")
+
+
+def test_header_cache_skips_lake_startup():
+    metrics = bench_headers(evaluations=5, latency=0.0, lake_latency=0.02)
+
+    assert metrics["headers.header"]["p50_s"] < metrics["headers.no_header"]["p50_s"]
@@ -0,0 +1,141 @@
+﻿import threading
+import time
+
+from langchain_lean.core.cache import LeanResultCache
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.handles import CANCELLED_MESSAGE, ExecutionHandle
+
+
+class _FakeEnvManager:
+    def __init__(self, workspace, cache_path, delay=0.0):
+        self.workspace = str(workspace)
+        self.cache_path = str(cache_path)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def get_runtime_image_id(self):
+        return "sha256:fake"
+
+    def read_lake_manifest(self):
+        return "{}"
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return 0, ""
+
+
+def test_evaluator_cache_hits_memory_and_disk(tmp_path):
+    manager = _FakeEnvManager(tmp_path, tmp_path / "cache")
+    evaluator = LeanEvaluator(environment_manager=manager, use_cache=True)
+
+    first = evaluator.evaluate_code("theorem t : True := trivial")
+    second = evaluator.evaluate_code("theorem t : True := trivial")
+
+    assert first == second
+    assert manager.calls == 1
+    assert evaluator.cache_stats()["hits"] == 1
+    assert evaluator.cache_stats()["misses"] == 1
+
+    # Un evaluador nuevo sobre el mismo `cache_path` reutiliza el tier en disco.
+    fresh = LeanEvaluator(environment_manager=manager, use_cache=True)
+    fresh.evaluate_code("theorem t : True := trivial")
+    assert manager.calls == 1
+    assert fresh.cache_stats()["disk_hits"] == 1
+
+
+def test_cache_single_flight_shares_concurrent_evaluations(tmp_path):
+    manager = _FakeEnvManager(tmp_path, tmp_path / "cache", delay=0.2)
+    evaluator = LeanEvaluator(environment_manager=manager, use_cache=True)
+
+    threads = [threading.Thread(target=evaluator.evaluate_code, args=("example : 1 = 1 := rfl",)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.calls == 1
+
+
+class _CancellableEnvManager(_FakeEnvManager):
+    """La primera ejecución espera a `gate`; si su handle se canceló, devuelve la cancelación."""
+
+    def __init__(self, workspace, cache_path):
+        super().__init__(workspace, cache_path)
+        self.gate = threading.Event()
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            self.gate.wait(5)
+        if handle is not None and handle.cancelled:
+            return -1, CANCELLED_MESSAGE
+        return 0, ""
+
+
+def test_cancelled_flight_is_not_shared_with_waiting_callers(tmp_path):
+    manager = _CancellableEnvManager(tmp_path, tmp_path / "cache")
+    evaluator = LeanEvaluator(environment_manager=manager, use_cache=True)
+    code = "theorem t : True := trivial"
+    handle = ExecutionHandle()
+    results = {}
+
+    cancelled = threading.Thread(target=lambda: results.update(a=evaluator.evaluate_code(code, handle=handle)))
+    cancelled.start()
+    while manager.calls == 0:
+        time.sleep(0.01)
+    waiting = threading.Thread(target=lambda: results.update(b=evaluator.evaluate_code(code)))
+    waiting.start()
+    while evaluator.cache_stats()["shared_flights"] == 0:
+        time.sleep(0.01)
+
+    handle.cancel()
+    manager.gate.set()
+    cancelled.join()
+    waiting.join()
+
+    assert results["a"].success is False
+    assert results["b"].success is True
+    assert manager.calls == 2
+
+
+def test_cache_disk_eviction_respects_budget(tmp_path):
+    cache = LeanResultCache(str(tmp_path), max_memory_entries=0, max_disk_bytes=2000)
+    for idx in range(20):
+        cache.put(LeanResultCache.make_key(str(idx)), {"raw_output": "x" * 200})
+
+    total = sum(path.stat().st_size for path in tmp_path.rglob("*.json"))
+    assert total <= 2000
+
+
+class _BatchEnvManager(_FakeEnvManager):
+    """Además responde a los lotes de `evaluate_many` con sus marcadores."""
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        with self._lock:
+            self.calls += 1
+        if "BEGIN" in command:
+            paths = command.split("for f in ", 1)[1].split("; do", 1)[0].split()
+            return 0, "".join(f"<<<LANGCHAIN_LEAN_BEGIN {p}\n<<<LANGCHAIN_LEAN_END {p} 0\n" for p in paths)
+        return 0, ""
+
+
+def test_evaluate_code_and_evaluate_many_share_cache_entries(tmp_path):
+    manager = _BatchEnvManager(tmp_path, tmp_path / "cache")
+    evaluator = LeanEvaluator(environment_manager=manager, use_cache=True)
+
+    evaluator.evaluate_code("theorem a : True := trivial")
+    evaluator.evaluate_many(["theorem a : True := trivial"])
+    assert manager.calls == 1
+
+    evaluator.evaluate_many(["theorem b : True := trivial"])
+    evaluator.evaluate_code("theorem b : True := trivial")
+    assert manager.calls == 2
+    assert evaluator.cache_stats()["hits"] == 2
@@ -0,0 +1,72 @@
+﻿import sys
+import textwrap
+
+from langchain_lean.core.checkpoints import IncrementalProofChecker, split_tactic_proof
+from langchain_lean.core.repl_session import LeanREPLSession
+
+# REPL falso con modo táctico: cada táctica produce un `proofState` nuevo.
+_FAKE_REPL = textwrap.dedent(
+    """
+    import json, sys
+
+    state = 0
+    buffer = ""
+    for line in sys.stdin:
+        if line.strip():
+            buffer += line
+            continue
+        if not buffer:
+            continue
+        request = json.loads(buffer)
+        buffer = ""
+        state += 1
+        if "cmd" in request:
+            response = {"env": state, "sorries": [{"goal": "n : Nat\\n⊢ n + 0 = n", "proofState": state}]}
+        elif request["tactic"] == "fail":
+            response = {"message": "Lean error: tactic failed"}
+        elif request["tactic"] == "done":
+            response = {"proofState": state, "goals": []}
+        else:
+            response = {"proofState": state, "goals": ["n : Nat\\n⊢ after " + request["tactic"]]}
+        print(json.dumps(response))
+        print()
+        sys.stdout.flush()
+    """
+)
+
+
+def test_split_tactic_proof_groups_alternatives():
+    code = (
+        "import Mathlib\n"
+        "theorem t (n : Nat) : n + 0 = n := by\n"
+        "  induction n with\n"
+        "  | zero => simp\n"
+        "  | succ n ih =>\n"
+        "    simp\n"
+        "  done\n"
+    )
+
+    proof = split_tactic_proof(code)
+
+    assert proof.header == "import Mathlib\n"
+    assert proof.statement == "theorem t (n : Nat) : n + 0 = n := by"
+    assert proof.tactics == ("induction n with\n| zero => simp\n| succ n ih =>\n  simp", "done")
+
+
+def test_incremental_checker_only_runs_new_tactics():
+    statement = "theorem t (n : Nat) : n + 0 = n := by\n"
+    with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+        checker = IncrementalProofChecker(session)
+
+        first = checker.check(statement + "  a\n  b\n")
+        assert checker.tactics_run == 2
+        assert first.goals[0].goal == "after b"
+
+        second = checker.check(statement + "  a\n  b\n  done\n")
+        assert checker.tactics_run == 3
+        assert second.proof_complete is True
+
+        failed = checker.check(statement + "  a\n  fail\n")
+        assert checker.tactics_run == 4
+        assert failed.success is False
+        assert failed.goals[0].goal == "after a"
@@ -0,0 +1,55 @@
+﻿import json
+
+from langchain_lean.core.declarations import LeanDeclarationIndex
+from langchain_lean.tools.search_tool import LeanSearchTool
+
+_RECORDS = [
+    {"name": "Nat.add_comm", "type": "∀ (n m : ℕ), n + m = m + n", "doc": "comm", "module": "Init.Data.Nat.Basic"},
+    {"name": "Nat.add_assoc", "type": "∀ (n m k : ℕ), n + m + k = n + (m + k)", "doc": "", "module": "Init"},
+    {"name": "Nat.mul_comm", "type": "∀ (n m : ℕ), n * m = m * n", "doc": "", "module": "Init"},
+    {"name": "Nat.addXcomm", "type": "ℕ", "doc": "", "module": "Fake"},
+]
+
+
+def _index(tmp_path):
+    index = LeanDeclarationIndex(str(tmp_path / "decls.sqlite"))
+    index.build_from_records(_RECORDS, fingerprint="v1")
+    return index
+
+
+def test_name_substring_search_is_literal(tmp_path):
+    index = _index(tmp_path)
+
+    names = [item["name"] for item in index.search("add_comm")]
+
+    # `_` es comodín en LIKE, pero no debe colar `Nat.addXcomm`.
+    assert names == ["Nat.add_comm"]
+    assert index.fingerprint() == "v1"
+
+
+def test_name_search_is_not_crowded_out_by_wildcard_matches(tmp_path):
+    decoys = [{"name": f"add{idx}comm", "type": "ℕ", "doc": "", "module": "Fake"} for idx in range(30)]
+    index = LeanDeclarationIndex(str(tmp_path / "decls.sqlite"))
+    index.build_from_records(decoys + _RECORDS, fingerprint="v1")
+
+    assert [item["name"] for item in index.search("add_comm", limit=1)] == ["Nat.add_comm"]
+    assert index.search("add%comm") == []
+
+def test_type_pattern_search_requires_all_fragments(tmp_path):
+    index = _index(tmp_path)
+
+    names = [item["name"] for item in index.search("n * m = m * n")]
+
+    assert names == ["Nat.mul_comm"]
+
+
+def test_search_tool_local_backend(tmp_path):
+    path = str(tmp_path / "decls.sqlite")
+    LeanDeclarationIndex(path).build_from_records(_RECORDS)
+    tool = LeanSearchTool(backend="local", index_path=path)
+
+    result = json.loads(tool.invoke({"query": "Nat.add", "limit": 2}))
+
+    assert result["count"] == 2
+    assert result["results"][0]["name"] == "Nat.add_comm"
+    assert result["results"][0]["source"] == "Init.Data.Nat.Basic"
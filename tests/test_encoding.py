@@ -0,0 +1,68 @@
+﻿import json
+
+from langchain_lean.core.encoding import STATE_FIELDS, encode_result, result_payload, truncate_middle
+from langchain_lean.core.evaluator import LeanExecutionResult
+from langchain_lean.tools.repl_tool import LeanREPLTool
+from langchain_lean.tools.run_tool import LeanRunTool
+from langchain_lean.tools.state_tool import LeanStateTool
+
+
+class _FixedEvaluator:
+    env_manager = None
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def evaluate_code(self, lean_code, filename=None, handle=None, fail_fast=False, source="evaluate_code"):
+        self.calls += 1
+        return self.result
+
+
+def _failing_result():
+    return LeanExecutionResult(
+        success=False,
+        errors=["unknown identifier 'foo'"] * 3 + ["type mismatch"],
+        goals=[{"context": ["n : Nat"], "goal": "n = n"}],
+        raw_output="x" * 50_000,
+    )
+
+
+def test_full_payload_matches_model_dump():
+    result = _failing_result()
+
+    assert result_payload(result) == result.model_dump()
+    assert json.loads(encode_result(result, STATE_FIELDS)) == {field: getattr(result, field) for field in STATE_FIELDS}
+
+
+def test_compact_payload_dedupes_errors_and_truncates_raw_output():
+    payload = json.loads(encode_result(_failing_result(), compact=True, max_raw_output_chars=300))
+
+    assert payload["errors"] == ["unknown identifier 'foo' (x3)", "type mismatch"]
+    assert len(payload["raw_output"]) < 400
+    assert "caracteres omitidos" in payload["raw_output"]
+    assert "timings" not in payload and "warnings" not in payload
+    assert payload["proof_complete"] is False
+
+
+def test_truncate_middle_keeps_head_and_tail():
+    text = "HEAD" + "-" * 1000 + "TAIL"
+
+    assert truncate_middle(text, 90).startswith("HEAD")
+    assert truncate_middle(text, 90).endswith("TAIL")
+    assert truncate_middle(text, 0) == ""
+    assert truncate_middle("short", 90) == "short"
+
+
+def test_tools_share_typed_results_and_honor_compact_mode():
+    evaluator = _FixedEvaluator(_failing_result())
+
+    repl = LeanREPLTool(evaluator=evaluator)
+    assert repl.run("example : True := foo") == "ERROR LEAN:\n" + "\n".join(_failing_result().errors)
+    repl = LeanREPLTool(evaluator=evaluator, compact=True)
+    assert repl.run("example : True := foo") == "ERROR LEAN:\nunknown identifier 'foo' (x3)\ntype mismatch"
+    assert isinstance(LeanRunTool(evaluator=evaluator).evaluate("x"), LeanExecutionResult)
+
+    compact = json.loads(LeanStateTool(evaluator=evaluator, compact=True, max_raw_output_chars=0).run("x"))
+    assert "raw_output" not in compact
+    assert set(compact) <= set(STATE_FIELDS)
@@ -0,0 +1,57 @@
+﻿import threading
+import time
+from types import SimpleNamespace
+
+from langchain_lean.core import environment
+from langchain_lean.core.environment import LeanEnvironmentManager
+
+
+class _FakeDockerClient:
+    def __init__(self):
+        self.probe_runs = 0
+        self.images = SimpleNamespace(get=lambda name: SimpleNamespace(id="sha256:abc"))
+        self.containers = SimpleNamespace(run=self._run)
+
+    def _run(self, image, **kwargs):
+        self.probe_runs += 1
+        return b"/root/.elan/bin/lake\n"
+
+
+def test_lake_probe_is_persisted_by_image_id(monkeypatch, tmp_path):
+    client = _FakeDockerClient()
+    monkeypatch.setattr(environment.docker, "from_env", lambda: client)
+    monkeypatch.setattr(environment, "_PROBE_RESULTS", {})
+
+    manager = LeanEnvironmentManager(workspace_path=str(tmp_path / "ws"), cache_path=str(tmp_path / "cache"))
+    assert manager._image_has_lake("img") is True
+    assert client.probe_runs == 1
+
+    # Otro proceso (memo en memoria vacío) reutiliza el resultado persistido en disco.
+    monkeypatch.setattr(environment, "_PROBE_RESULTS", {})
+    other = LeanEnvironmentManager(workspace_path=str(tmp_path / "ws"), cache_path=str(tmp_path / "cache"))
+    assert other._image_has_lake("img") is True
+    assert client.probe_runs == 1
+
+
+def test_concurrent_get_pool_builds_a_single_pool(monkeypatch, tmp_path):
+    created = []
+
+    class _SlowPool:
+        def __init__(self, **kwargs):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(environment, "LeanContainerPool", _SlowPool)
+    manager = LeanEnvironmentManager(
+        workspace_path=str(tmp_path / "ws"), cache_path=str(tmp_path / "cache"), use_pool=True
+    )
+    manager._client = object()
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(manager.get_pool())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(created) == 1
+    assert all(pool is created[0] for pool in pools)
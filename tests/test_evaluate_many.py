@@ -0,0 +1,114 @@
+﻿import os
+import stat
+import subprocess
+import threading
+import time
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.handles import ExecutionHandle
+
+# `lean` falso: falla si el archivo contiene "broken", si no termina sin salida.
+_FAKE_LEAN = """#!/bin/sh
+if grep -q broken "$1"; then
+  echo "$1:1:0: error: unknown identifier 'broken'"
+  exit 1
+fi
+exit 0
+"""
+
+
+class _ShellEnvManager:
+    """Ejecuta el comando del evaluador con bash local y un `lean` falso en el PATH."""
+
+    def __init__(self, workspace, bin_dir):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.bin_dir = str(bin_dir)
+        self.commands = []
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        self.commands.append(command)
+        env = dict(os.environ, PATH=f"{self.bin_dir}:/usr/bin:/bin")
+        proc = subprocess.run(
+            ["bash", "-c", command], cwd=self.workspace, env=env, capture_output=True, text=True, timeout=timeout
+        )
+        return proc.returncode, proc.stdout + proc.stderr
+
+
+def _make_manager(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    lean = bin_dir / "lean"
+    lean.write_text(_FAKE_LEAN)
+    lean.chmod(lean.stat().st_mode | stat.S_IEXEC)
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    return _ShellEnvManager(workspace, bin_dir)
+
+
+def test_evaluate_many_groups_by_header_and_isolates_failures(tmp_path):
+    manager = _make_manager(tmp_path)
+    evaluator = LeanEvaluator(environment_manager=manager)
+    codes = [
+        "theorem a : True := trivial",
+        "import Mathlib\ntheorem b : 1 = 1 := rfl",
+        "theorem c : True := broken",
+        "import Mathlib\ntheorem d : 2 = 2 := rfl",
+    ]
+
+    results = evaluator.evaluate_many(codes)
+
+    assert len(manager.commands) == 2
+    assert [result.success for result in results] == [True, True, False, True]
+    assert results[2].errors == ["unknown identifier 'broken'"]
+    assert results[2].raw_output.startswith("check.lean:1:0:")
+
+
+class _HangingEnvManager:
+    """Cada invocación se bloquea hasta que la matan (o pasan 5 s)."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.started = 0
+        self.killed = 0
+        self._lock = threading.Lock()
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        stop = threading.Event()
+
+        def _kill():
+            with self._lock:
+                self.killed += 1
+            stop.set()
+
+        handle.attach(_kill)
+        with self._lock:
+            self.started += 1
+        stop.wait(5)
+        handle.detach()
+        return 137, ""
+
+
+def test_evaluate_many_cancel_kills_every_header_group(tmp_path):
+    manager = _HangingEnvManager(tmp_path)
+    evaluator = LeanEvaluator(environment_manager=manager, max_concurrency=4)
+    handle = ExecutionHandle()
+    codes = ["theorem a : True := trivial", "import Mathlib\ntheorem b : True := trivial"]
+
+    worker = threading.Thread(target=evaluator.evaluate_many, args=(codes,), kwargs={"handle": handle})
+    started = time.monotonic()
+    worker.start()
+    while manager.started < 2 and time.monotonic() - started < 5:
+        time.sleep(0.01)
+    handle.cancel()
+    worker.join(5)
+
+    assert manager.killed == 2
+    assert time.monotonic() - started < 4
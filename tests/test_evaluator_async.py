@@ -0,0 +1,71 @@
+﻿import asyncio
+import threading
+import time
+
+from langchain_lean.core.evaluator import LeanEvaluator
+
+
+class _SlowEnvManager:
+    """Simula un contenedor que tarda `delay` segundos y puede ser matado."""
+
+    def __init__(self, workspace, delay):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.delay = delay
+        self.killed = threading.Event()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        stop = threading.Event()
+        if handle is not None:
+            handle.attach(lambda: (self.killed.set(), stop.set()))
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            stop.wait(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+            if handle is not None:
+                handle.detach()
+        return 0, ""
+
+
+def test_aevaluate_code_runs_in_parallel_with_semaphore(tmp_path):
+    manager = _SlowEnvManager(tmp_path, delay=0.3)
+    evaluator = LeanEvaluator(environment_manager=manager, max_concurrency=4)
+
+    async def _main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(evaluator.aevaluate_code(f"example : {i} = {i} := rfl") for i in range(8)))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(_main())
+
+    assert all(result.success for result in results)
+    assert manager.max_active == 4
+    assert elapsed < 8 * 0.3
+
+
+def test_aevaluate_code_cancellation_kills_execution(tmp_path):
+    manager = _SlowEnvManager(tmp_path, delay=5)
+    evaluator = LeanEvaluator(environment_manager=manager)
+
+    async def _main():
+        task = asyncio.create_task(evaluator.aevaluate_code("example : True := by decide"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(_main()) is True
+    assert manager.killed.wait(1)
@@ -0,0 +1,40 @@
+﻿import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_lean.core.evaluator import SCRATCH_DIR, LeanEvaluator
+
+_FILE_RE = re.compile(r"lean (\S+\.lean);")
+
+
+class _EchoEnvManager:
+    """Devuelve como error el contenido del archivo que se le pidió compilar."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        relative_path = _FILE_RE.search(command).group(1)
+        time.sleep(0.01)  # Ensancha la ventana de carrera entre escritura y lectura.
+        with open(os.path.join(self.workspace, relative_path), encoding="utf-8") as file:
+            content = file.read()
+        return 1, f"{relative_path}:1:0: error: {content}\n"
+
+
+def test_parallel_evaluations_get_their_own_result(tmp_path):
+    evaluator = LeanEvaluator(environment_manager=_EchoEnvManager(tmp_path))
+    snippets = [f"theorem t{idx} : {idx} = {idx} := rfl" for idx in range(64)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(evaluator.evaluate_code, snippets))
+
+    for snippet, result in zip(snippets, results):
+        assert result.errors == [snippet]
+        assert result.raw_output.startswith("check.lean:1:0:")
+
+    assert os.listdir(tmp_path / SCRATCH_DIR) == []
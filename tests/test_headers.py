@@ -0,0 +1,107 @@
+﻿import os
+import re
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.headers import HeaderEnvironmentCache
+
+_LAKE_PATH = "/workspace/.lake/packages/mathlib/.lake/build/lib"
+_CODE = "import Mathlib.Tactic\nimport Mathlib.Data.Nat.Basic\n\ntheorem t : 1 + 1 = 2 := by\n  norm_num\n"
+
+
+class _HeaderEnvManager:
+    """Simula `lean -o`: crea el `.olean` pedido y registra los demás comandos."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.manifest = '{"packages": []}'
+        self.commands = []
+        self.sources = []
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def read_lake_manifest(self):
+        return self.manifest
+
+    def read_lean_toolchain(self):
+        return "leanprover/lean4:v4.11.0\n"
+
+    def get_runtime_image_id(self):
+        return "sha256:image"
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        self.commands.append(command)
+        if "printenv LEAN_PATH" in command:
+            return 0, _LAKE_PATH + "\n"
+        build = re.search(r"lean -o (\S+) ", command)
+        if build is not None:
+            with open(os.path.join(self.workspace, build.group(1)), "wb") as file:
+                file.write(b"olean")
+            return 0, ""
+        path = re.search(r"lean (\S+\.lean)", command).group(1)
+        with open(os.path.join(self.workspace, path), encoding="utf-8") as file:
+            self.sources.append(file.read())
+        return 0, ""
+
+
+def test_header_module_is_built_once_and_reused(tmp_path):
+    manager = _HeaderEnvManager(tmp_path)
+    evaluator = LeanEvaluator(environment_manager=manager, use_header_cache=True)
+
+    evaluator.evaluate_code(_CODE)
+    evaluator.evaluate_code(_CODE.replace("norm_num", "simp"))
+
+    assert evaluator.header_cache.builds == 1
+    assert sum("lean -o" in command for command in manager.commands) == 1
+    assert all("LEAN_PATH" in command for command in manager.commands[1:])
+    # La cabecera se reemplaza sin mover las líneas del cuerpo.
+    rewritten = manager.sources[0]
+    assert rewritten.startswith("import LangchainLeanHeader_")
+    assert rewritten.splitlines()[3] == "theorem t : 1 + 1 = 2 := by"
+
+
+def test_lean_path_is_resolved_once_per_environment(tmp_path):
+    manager = _HeaderEnvManager(tmp_path)
+    evaluator = LeanEvaluator(environment_manager=manager, use_header_cache=True)
+
+    for tactic in ("norm_num", "simp", "decide"):
+        evaluator.evaluate_code(_CODE.replace("norm_num", tactic))
+    evaluator.evaluate_many([_CODE, _CODE.replace("norm_num", "rfl")])
+
+    assert sum("printenv LEAN_PATH" in command for command in manager.commands) == 1
+    runs = [command for command in manager.commands if "lean -o" not in command and "printenv" not in command]
+    assert len(runs) == 4
+    # Con el LEAN_PATH calculado, cada evaluación corre `lean` sin arrancar lake.
+    assert all("lake env" not in command and _LAKE_PATH in command for command in runs)
+
+    manager.manifest = '{"packages": [{"rev": "new"}]}'
+    evaluator.evaluate_code(_CODE)
+    assert sum("printenv LEAN_PATH" in command for command in manager.commands) == 2
+
+
+def test_header_fingerprint_changes_with_manifest(tmp_path):
+    manager = _HeaderEnvManager(tmp_path)
+    cache = HeaderEnvironmentCache(manager)
+
+    before = cache.fingerprint("import Mathlib")
+    manager.manifest = '{"packages": [{"rev": "new"}]}'
+
+    assert cache.fingerprint("import Mathlib") != before
+
+
+def test_code_without_imports_is_left_untouched(tmp_path):
+    cache = HeaderEnvironmentCache(_HeaderEnvManager(tmp_path))
+
+    assert cache.prepare("theorem t : True := trivial") == ("theorem t : True := trivial", None)
+
+
+def test_header_after_leading_module_comment_is_precompiled(tmp_path):
+    cache = HeaderEnvironmentCache(_HeaderEnvManager(tmp_path))
+    code = "/-! Docstring del módulo. -/\n" + _CODE
+
+    rewritten, module_dir = cache.prepare(code)
+
+    assert module_dir is not None
+    assert rewritten.startswith("import LangchainLeanHeader_")
+    assert len(rewritten.splitlines()) == len(code.splitlines())
@@ -0,0 +1,64 @@
+﻿import json
+import subprocess
+import sys
+
+from langchain_lean.core import environment
+from langchain_lean.core.environment import LeanEnvironmentManager
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.tools.run_tool import LeanRunTool
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import langchain_lean
+import langchain_lean.core
+import langchain_lean.tools
+import_time = time.perf_counter() - started
+loaded = {name: name in sys.modules for name in ("docker", "langchain", "langchain_lean.core.environment")}
+started = time.perf_counter()
+langchain_lean.LeanRunTool
+first_access = time.perf_counter() - started
+print(json.dumps({"import": import_time, "first_access": first_access, "loaded": loaded}))
+"""
+
+
+def test_package_import_does_not_load_docker_or_langchain():
+    output = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+
+    assert timings["loaded"] == {"docker": False, "langchain": False, "langchain_lean.core.environment": False}
+    # El coste de langchain se paga en el primer acceso a una tool, no al importar el paquete.
+    assert timings["import"] < timings["first_access"]
+
+
+def test_toolkit_import_does_not_load_docker():
+    probe = "import json, sys; import langchain_lean.toolkit; print(json.dumps({name: name in sys.modules for name in ('docker', 'langchain_lean.core.environment')}))"
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+
+    assert json.loads(output.strip().splitlines()[-1]) == {"docker": False, "langchain_lean.core.environment": False}
+
+
+def test_manager_construction_does_not_connect_to_docker(monkeypatch, tmp_path):
+    connections = []
+    monkeypatch.setattr(environment.docker, "from_env", lambda: connections.append(1) or object())
+
+    manager = LeanEnvironmentManager(workspace_path=str(tmp_path / "ws"), cache_path=str(tmp_path / "cache"))
+    assert connections == []
+
+    client = manager.client
+    assert manager.client is client
+    assert connections == [1]
+
+
+def test_tool_defers_provisioning_until_first_run(tmp_path):
+    workspace = tmp_path / "ws"
+    manager = LeanEnvironmentManager(workspace_path=str(workspace), cache_path=str(tmp_path / "cache"), backend="local")
+    tool = LeanRunTool(evaluator=LeanEvaluator(environment_manager=manager))
+
+    assert not workspace.exists()
+
+    result = json.loads(tool.run("theorem t : True := trivial"))
+
+    assert "success" in result
+    assert (workspace / "lakefile.lean").exists()
+    assert manager._provisioned is True
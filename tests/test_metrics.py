@@ -0,0 +1,64 @@
+﻿from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.metrics import EvaluationEvent, PrometheusMetrics
+
+
+class _TimedEnvManager:
+    """Simula un contenedor que registra sus propias fases en el handle."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def get_runtime_image_id(self):
+        return "sha256:image"
+
+    def read_lake_manifest(self):
+        return ""
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        if handle is not None:
+            handle.record("lean", 0.5)
+            if handle.track_memory:
+                handle.peak_memory_bytes = 1024
+        return 0, ""
+
+
+def test_collect_timings_reports_each_phase(tmp_path):
+    evaluator = LeanEvaluator(environment_manager=_TimedEnvManager(tmp_path), collect_timings=True, track_memory=True)
+
+    result = evaluator.evaluate_code("theorem t : True := trivial")
+
+    assert {"write_file", "lean", "parse", "total"} <= set(result.timings)
+    assert result.timings["lean"] == 0.5
+    assert result.peak_memory_bytes == 1024
+
+
+def test_hooks_receive_events_and_cached_timings_are_not_stored(tmp_path):
+    events = []
+    evaluator = LeanEvaluator(
+        environment_manager=_TimedEnvManager(tmp_path), use_cache=True, collect_timings=True, metrics_hooks=[events.append]
+    )
+
+    first = evaluator.evaluate_code("theorem t : True := trivial", source="lean_run")
+    second = evaluator.evaluate_code("theorem t : True := trivial", source="lean_run")
+
+    assert [(event.source, event.cached) for event in events] == [("lean_run", False), ("lean_run", True)]
+    assert "lean" in first.timings
+    assert "lean" not in second.timings and "cache" in second.timings
+
+
+def test_prometheus_text_output():
+    metrics = PrometheusMetrics()
+    metrics(EvaluationEvent(source="lean_run", duration=0.3, success=True, timings={"lean": 0.2}))
+    metrics(EvaluationEvent(source="lean_run", duration=3.0, success=False, peak_memory_bytes=2048))
+
+    text = metrics.render()
+
+    assert 'langchain_lean_evaluations_total{source="lean_run",outcome="success"} 1' in text
+    assert 'langchain_lean_evaluation_seconds_bucket{source="lean_run",le="0.5"} 1' in text
+    assert 'langchain_lean_evaluation_seconds_count{source="lean_run"} 2' in text
+    assert 'langchain_lean_phase_seconds_count{source="lean_run",phase="lean"} 1' in text
+    assert 'langchain_lean_peak_memory_bytes{source="lean_run"} 2048' in text
@@ -1,4 +1,6 @@
-﻿from langchain_lean.core.parser import parse_lean_output
+﻿import json
+
+from langchain_lean.core.parser import parse_lean_json_output, parse_lean_output
 
 
 def test_parse_success_complete():
@@ -34,3 +36,47 @@ def test_parse_syntax_error():
     assert parsed.success is False
     assert parsed.proof_complete is False
     assert parsed.errors == ["expected token"]
+
+
+def _json_message(severity, line, column, data):
+    return json.dumps(
+        {
+            "severity": severity,
+            "pos": {"line": line, "column": column},
+            "endPos": {"line": line, "column": column + 5},
+            "fileName": "check.lean",
+            "data": data,
+            "caption": "",
+        },
+        ensure_ascii=False,
+    )
+
+
+def test_parse_json_messages_with_positions_and_goals():
+    raw = "\n".join(
+        [
+            _json_message("error", 4, 14, "unsolved goals\ncase succ\nn : Nat\nih : n + 0 = n\n⊢ n + 1 + 0 = n + 1"),
+            _json_message("error", 7, 2, "type mismatch\n  h\nhas type\n  a = b : Prop"),
+            "",
+        ]
+    )
+    parsed = parse_lean_json_output(raw, exit_code=1)
+
+    assert parsed.success is False
+    assert parsed.errors[1] == "type mismatch\n  h\nhas type\n  a = b : Prop"
+    assert [(m.line, m.column, m.severity) for m in parsed.messages] == [(4, 14, "error"), (7, 2, "error")]
+    assert parsed.goals[0].context == ["case succ", "n : Nat", "ih : n + 0 = n"]
+    assert parsed.goals[0].goal == "n + 1 + 0 = n + 1"
+
+
+def test_parse_json_sorry_only_from_warning():
+    # Un mensaje informativo que menciona "sorry" no marca la prueba como incompleta.
+    info = _json_message("information", 3, 0, "theorem sorry_free : True := trivial") + "\n"
+    assert parse_lean_output(info, exit_code=0).has_sorry is True
+    assert parse_lean_json_output(info, exit_code=0).has_sorry is False
+
+    raw = _json_message("warning", 9, 0, "declaration uses 'sorry'") + "\n"
+    parsed = parse_lean_json_output(raw, exit_code=0)
+    assert parsed.success is True
+    assert parsed.has_sorry is True
+    assert parsed.proof_complete is False
@@ -0,0 +1,165 @@
+﻿import json
+import os
+import stat
+import subprocess
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.source import declaration_check_code, import_header_key, split_commands, split_import_header
+from langchain_lean.tools.run_tool import LeanRunTool
+
+# `lean` falso: reporta la línea de cada "broken" del archivo y guarda una copia de lo que verificó.
+_FAKE_LEAN = """#!/bin/sh
+cp "$1" "$(mktemp "$CHECKED_DIR/XXXXXX")"
+if grep -n broken "$1" > /dev/null; then
+  grep -n broken "$1" | cut -d: -f1 | while read line; do
+    echo "$1:$line:0: error: unknown identifier 'broken'"
+  done
+  exit 1
+fi
+exit 0
+"""
+
+_SOURCE = """import Mathlib
+
+open Nat
+
+/-- Un docstring con := dentro. -/
+theorem first (n : ℕ) : n + 0 = n := by
+  broken
+
+def double (n : ℕ) : ℕ :=
+  n + n
+
+example : double 1 = 2 := rfl
+
+@[simp]
+lemma second : double 0 = 0 := by
+  simp [double, first]
+"""
+
+
+class _ShellEnvManager:
+    def __init__(self, workspace, bin_dir, checked_dir):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.bin_dir = str(bin_dir)
+        self.checked_dir = str(checked_dir)
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        env = dict(os.environ, PATH=f"{self.bin_dir}:/usr/bin:/bin", CHECKED_DIR=self.checked_dir)
+        proc = subprocess.run(
+            ["bash", "-c", command], cwd=self.workspace, env=env, capture_output=True, text=True, timeout=timeout
+        )
+        return proc.returncode, proc.stdout + proc.stderr
+
+
+def _make_evaluator(tmp_path, **kwargs):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    lean = bin_dir / "lean"
+    lean.write_text(_FAKE_LEAN)
+    lean.chmod(lean.stat().st_mode | stat.S_IEXEC)
+    workspace = tmp_path / "ws"
+    workspace.mkdir()
+    checked = tmp_path / "checked"
+    checked.mkdir()
+    manager = _ShellEnvManager(workspace, bin_dir, checked)
+    return LeanEvaluator(environment_manager=manager, **kwargs), checked
+
+
+def test_split_commands_round_trips_and_attaches_comments():
+    header, commands = split_commands(_SOURCE)
+
+    assert header == "import Mathlib\n"
+    assert header + "".join(command.text for command in commands) == _SOURCE
+    assert [(command.kind, command.name, command.line) for command in commands] == [
+        ("open", "", 2),
+        ("theorem", "first", 5),
+        ("def", "double", 9),
+        ("example", "", 12),
+        ("lemma", "second", 14),
+    ]
+    assert commands[1].text.startswith("/-- Un docstring")
+    assert commands[4].text.startswith("@[simp]\nlemma second")
+
+
+def test_import_header_skips_leading_block_comments():
+    code = "/-\nCopyright (c) 2024. -- no es un comentario de línea\n-/\nimport Mathlib /- inline -/\n\n/-! # Docs -/\n\ntheorem t : True := trivial\n"
+
+    header, body = split_import_header(code)
+
+    assert header == "/-\nCopyright (c) 2024. -- no es un comentario de línea\n-/\nimport Mathlib /- inline -/\n"
+    assert body == "\n/-! # Docs -/\n\ntheorem t : True := trivial\n"
+    assert import_header_key(code) == "import Mathlib"
+
+def test_mutual_block_is_a_single_command():
+    code = "mutual\ndef even : Nat → Bool\n  | 0 => true\n  | n+1 => odd n\ndef odd : Nat → Bool\n  | 0 => false\n  | n+1 => even n\nend\n\ntheorem t : True := trivial\n"
+
+    _, commands = split_commands(code)
+
+    assert [command.kind for command in commands] == ["mutual", "theorem"]
+    assert commands[0].text.rstrip().endswith("end")
+
+
+def test_check_code_turns_previous_theorems_into_axioms_and_keeps_lines():
+    header, commands = split_commands(_SOURCE)
+
+    code = declaration_check_code(header, commands, 4)
+
+    assert "axiom first (n : ℕ) : n + 0 = n\n" in code
+    assert "broken" not in code
+    assert "example" not in code
+    assert "def double (n : ℕ) : ℕ :=\n  n + n" in code
+    assert code.splitlines()[13:15] == _SOURCE.splitlines()[13:15]
+    assert len(code.splitlines()) == len(_SOURCE.splitlines())
+
+
+def test_evaluate_declarations_isolates_broken_proofs(tmp_path):
+    evaluator, checked = _make_evaluator(tmp_path, max_concurrency=4)
+
+    results = evaluator.evaluate_declarations(_SOURCE)
+
+    assert [(item.kind, item.name, item.line) for item in results] == [
+        ("theorem", "first", 5),
+        ("def", "double", 9),
+        ("example", "", 12),
+        ("lemma", "second", 14),
+    ]
+    assert [item.result.success for item in results] == [False, True, True, True]
+    # La posición del error es la del archivo original.
+    assert results[0].result.raw_output.startswith("check.lean:7:0:")
+    assert len(list(checked.iterdir())) == 4
+
+
+def test_evaluate_declarations_without_declarations_checks_whole_file(tmp_path):
+    evaluator, _ = _make_evaluator(tmp_path)
+
+    results = evaluator.evaluate_declarations("#eval broken\n")
+
+    assert [(item.kind, item.result.success) for item in results] == [("file", False)]
+
+
+def test_run_tool_per_declaration_returns_one_entry_per_declaration(tmp_path):
+    evaluator, _ = _make_evaluator(tmp_path)
+    tool = LeanRunTool(evaluator=evaluator, per_declaration=True, compact=True)
+
+    payload = json.loads(tool._run(_SOURCE))
+
+    assert payload["success"] is False
+    assert [item["name"] for item in payload["declarations"]] == ["first", "double", "", "second"]
+    assert payload["declarations"][0]["errors"] == ["unknown identifier 'broken'"]
+
+
+def test_evaluate_declarations_keeps_header_after_leading_comment(tmp_path):
+    evaluator, checked = _make_evaluator(tmp_path)
+    source = "/- Copyright (c) 2024. -/\nimport Mathlib\n\ntheorem a : True := by\n  broken\n\ntheorem b : True := a\n"
+
+    results = evaluator.evaluate_declarations(source)
+
+    assert [(item.name, item.line, item.result.success) for item in results] == [("a", 3, False), ("b", 7, True)]
+    assert results[0].result.raw_output.startswith("check.lean:5:0:")
+    for path in checked.iterdir():
+        assert path.read_text().splitlines()[:2] == ["/- Copyright (c) 2024. -/", "import Mathlib"]
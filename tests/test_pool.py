@@ -0,0 +1,66 @@
+﻿from types import SimpleNamespace
+
+from langchain_lean.core.pool import LeanContainerPool
+
+
+class _FakeContainer:
+    def __init__(self):
+        self.status = "running"
+        self.commands = []
+        self.removed = False
+
+    def exec_run(self, cmd, workdir=None):
+        self.commands.append(cmd)
+        return SimpleNamespace(exit_code=0, output=b"ok\n")
+
+    def reload(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class _FakeClient:
+    def __init__(self):
+        self.created = []
+        self.containers = self
+
+    def run(self, image, **kwargs):
+        container = _FakeContainer()
+        self.created.append(container)
+        return container
+
+
+def test_pool_reuses_warm_container():
+    client = _FakeClient()
+    pool = LeanContainerPool(client, image="img", volumes={}, size=1)
+
+    assert pool.run("lean check.lean") == (0, "ok\n")
+    assert pool.run("lean check.lean") == (0, "ok\n")
+
+    assert len(client.created) == 1
+    assert len(client.created[0].commands) == 2
+
+
+def test_pool_recycles_after_max_runs():
+    client = _FakeClient()
+    pool = LeanContainerPool(client, image="img", volumes={}, size=1, max_runs_per_worker=2)
+
+    for _ in range(3):
+        pool.run("true")
+
+    assert len(client.created) == 2
+    assert client.created[0].removed is True
+
+
+def test_pool_replaces_unhealthy_worker():
+    client = _FakeClient()
+    pool = LeanContainerPool(client, image="img", volumes={}, size=1, health_check_interval=0)
+
+    pool.run("true")
+    client.created[0].status = "exited"
+    pool.run("true")
+
+    assert len(client.created) == 2
+    pool.shutdown()
+    assert client.created[1].removed is True
@@ -0,0 +1,178 @@
+﻿import json
+import threading
+import time
+
+from langchain_lean.core.evaluator import LeanExecutionResult
+from langchain_lean.core.proof_search import BestFirstProofSearch, evaluate_alternatives
+from langchain_lean.tools.state_tool import LeanStateTool
+
+THEOREM = "theorem t (a b : Nat) : a + b = b + a := by"
+
+
+class _PuzzleEvaluator:
+    """Simula Lean: `split`/`fork` abren una meta, `close` cierra una, `nop` no cambia nada,
+    `bad` falla y `slow` tarda hasta que se cancela."""
+
+    env_manager = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def evaluate_code(self, lean_code, filename=None, handle=None, fail_fast=False, source="evaluate_code"):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            return self._evaluate(lean_code, handle)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _evaluate(self, lean_code, handle):
+        tactics = [line.strip() for line in lean_code.split(":= by", 1)[1].splitlines() if line.strip()]
+        if "slow" in tactics:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not (handle is not None and handle.cancelled):
+                time.sleep(0.01)
+            self.cancelled += int(handle is not None and handle.cancelled)
+        elif self.delay:
+            time.sleep(self.delay)
+        goals = 1
+        for tactic in tactics:
+            if tactic == "bad":
+                return LeanExecutionResult(success=False, errors=["unknown tactic"])
+            if tactic in ("split", "fork"):
+                goals += 1
+            elif tactic == "close":
+                goals -= 1
+            if goals == 0 and tactic != tactics[-1]:
+                return LeanExecutionResult(success=False, errors=["no goals to be proved"])
+        if goals == 0:
+            return LeanExecutionResult(success=True, proof_complete=True)
+        state = "|".join(tactic for tactic in tactics if tactic not in ("nop", "skip"))
+        return LeanExecutionResult(
+            success=False,
+            errors=["unsolved goals"],
+            goals=[{"context": ["a b : Nat"], "goal": f"goal {idx} after {state}"} for idx in range(goals)],
+        )
+
+
+def test_finds_first_complete_proof_with_stats():
+    evaluator = _PuzzleEvaluator()
+    search = BestFirstProofSearch(evaluator, lambda goals, tactics: ["bad", "split", "close"], max_workers=3)
+
+    result = search.search(THEOREM)
+
+    assert result.success is True
+    assert result.stop_reason == "proved"
+    assert result.tactics == ["close"]
+    assert result.code.endswith("  close\n")
+    assert result.stats.candidates_evaluated >= 1
+    assert result.stats.nodes_expanded == 1
+
+
+def test_scores_guide_expansion_order():
+    expanded = []
+
+    def generator(goals, tactics):
+        expanded.append(tactics)
+        return [("split", 1.0), ("fork", 3.0)] if not tactics else [("close", 0.0)]
+
+    result = BestFirstProofSearch(_PuzzleEvaluator(), generator, max_workers=1).search(THEOREM)
+
+    assert result.success is True
+    assert result.tactics == ["fork", "close", "close"]
+    assert expanded == [(), ("fork",), ("fork", "close")]
+
+
+def test_repeated_states_are_pruned():
+    result = BestFirstProofSearch(_PuzzleEvaluator(), lambda goals, tactics: ["nop", "bad"]).search(THEOREM)
+
+    assert result.success is False
+    assert result.stop_reason == "exhausted"
+    assert result.stats.duplicate_states == 1
+    assert result.stats.failed_candidates == 1
+
+
+def test_evaluates_candidates_in_parallel():
+    evaluator = _PuzzleEvaluator(delay=0.2)
+    generator = lambda goals, tactics: ["bad", "split", "fork", "nop"] if not tactics else ["close"]
+
+    started = time.monotonic()
+    result = BestFirstProofSearch(evaluator, generator, max_workers=4).search(THEOREM)
+
+    assert result.success is True
+    assert evaluator.max_running == 4
+    assert time.monotonic() - started < 1.5
+
+
+def test_node_budget_stops_search():
+    result = BestFirstProofSearch(_PuzzleEvaluator(), lambda goals, tactics: ["split"], node_budget=5).search(THEOREM)
+
+    assert result.success is False
+    assert result.stop_reason == "node_budget"
+    assert result.stats.candidates_evaluated == 5
+
+
+def test_time_budget_cancels_running_evaluations():
+    evaluator = _PuzzleEvaluator()
+    search = BestFirstProofSearch(evaluator, lambda goals, tactics: ["slow"], max_workers=2, time_budget=0.3)
+
+    started = time.monotonic()
+    result = search.search(THEOREM)
+
+    assert result.stop_reason == "time_budget"
+    assert time.monotonic() - started < 2
+    time.sleep(0.2)
+    assert evaluator.cancelled == 1
+
+
+def test_invalid_statement_is_reported():
+    evaluator = _PuzzleEvaluator()
+    result = BestFirstProofSearch(evaluator, lambda goals, tactics: ["close"]).search(f"{THEOREM}\n  bad")
+
+    assert result.success is False
+    assert result.stop_reason == "invalid_statement"
+    assert result.errors == ["unknown tactic"]
+
+
+def test_alternatives_are_ranked_by_remaining_goals():
+    evaluator = _PuzzleEvaluator()
+
+    results = evaluate_alternatives(
+        evaluator, f"{THEOREM}\n  split", ["bad", "nop", "close", "split"], stop_on_success=False
+    )
+
+    assert [alternative.continuation for alternative in results] == ["close", "nop", "split", "bad"]
+    assert [len(alternative.result.goals) for alternative in results[:3]] == [1, 2, 3]
+    assert results[0].code.endswith("  split\n  close\n")
+
+
+def test_first_successful_alternative_cancels_the_rest():
+    evaluator = _PuzzleEvaluator()
+
+    started = time.monotonic()
+    results = evaluate_alternatives(evaluator, THEOREM, ["slow", "close"], max_workers=2)
+
+    assert time.monotonic() - started < 2
+    assert results[0].continuation == "close"
+    assert results[0].result.proof_complete is True
+    assert results[1].cancelled is True
+    time.sleep(0.2)
+    assert evaluator.cancelled == 1
+
+
+def test_state_tool_accepts_alternatives():
+    tool = LeanStateTool(evaluator=_PuzzleEvaluator(), compact=True, stop_on_success=False)
+
+    payload = json.loads(tool.invoke({"code": f"{THEOREM}\n  split", "alternatives": ["bad", "close", "close\nclose"]}))
+
+    assert payload["proof_complete"] is True
+    assert [entry["tactic"] for entry in payload["alternatives"]] == ["close\nclose", "close", "bad"]
+    assert payload["alternatives"][2]["errors"] == ["unknown tactic"]
@@ -0,0 +1,102 @@
+﻿import sys
+import textwrap
+
+from langchain_lean.core.repl_session import LeanREPLSession, parse_repl_response
+from langchain_lean.tools.repl_tool import LeanREPLTool
+
+# REPL falso que habla el mismo protocolo (JSON separado por líneas en blanco).
+_FAKE_REPL = textwrap.dedent(
+    """
+    import json, os, sys
+
+    env = 0
+    buffer = ""
+    for line in sys.stdin:
+        if line.strip():
+            buffer += line
+            continue
+        if not buffer:
+            continue
+        request = json.loads(buffer)
+        buffer = ""
+        response = {"env": env, "messages": [], "pid": os.getpid(), "base": request.get("env")}
+        if "sorry" in request["cmd"]:
+            response["sorries"] = [{"goal": "n : Nat\\n⊢ n + 0 = n", "proofState": 0}]
+        env += 1
+        print(json.dumps(response, indent=2))
+        print()
+        sys.stdout.flush()
+    """
+)
+
+
+def test_session_keeps_process_and_tracks_env():
+    with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+        first = session.run_command("import Mathlib")
+        second = session.run_command("def x := 1", env=first["env"])
+
+    assert first["pid"] == second["pid"]
+    assert second["base"] == first["env"]
+    assert session.env is None
+
+
+def test_parse_repl_response_with_sorry_goal():
+    parsed = parse_repl_response(
+        {
+            "env": 1,
+            "messages": [{"severity": "warning", "data": "declaration uses 'sorry'"}],
+            "sorries": [{"goal": "n : Nat\n⊢ n + 0 = n", "proofState": 0}],
+        }
+    )
+
+    assert parsed.success is True
+    assert parsed.proof_complete is False
+    assert parsed.has_sorry is True
+    assert parsed.goals[0].goal == "n + 0 = n"
+    assert parsed.goals[0].context == ["n : Nat"]
+
+
+# Como el REPL real: `import` sobre un entorno existente es un error (y `x` solo existe
+# en el entorno donde se declaró).
+_IMPORT_CHECKING_REPL = textwrap.dedent(
+    """
+    import json, sys
+
+    env = 0
+    buffer = ""
+    for line in sys.stdin:
+        if line.strip():
+            buffer += line
+            continue
+        if not buffer:
+            continue
+        request = json.loads(buffer)
+        buffer = ""
+        messages = []
+        if "env" in request and "import " in request["cmd"]:
+            messages.append({"severity": "error", "data": "invalid 'import' command, it must be used in the beginning of the file"})
+        if "env" not in request and "x = 1" in request["cmd"]:
+            messages.append({"severity": "error", "data": "unknown identifier 'x'"})
+        print(json.dumps({"env": env, "messages": messages}))
+        print()
+        sys.stdout.flush()
+        env += 1
+    """
+)
+
+
+def test_stateful_repl_tool_accepts_repeated_imports():
+    tool = LeanREPLTool(stateful=True)
+    tool._session = LeanREPLSession([sys.executable, "-c", _IMPORT_CHECKING_REPL], timeout=10)
+    tool._session.start()
+    try:
+        first = tool.invoke({"code": "import Mathlib\n\ndef x := 1"})
+        second = tool.invoke({"code": "import Mathlib\n\ntheorem t : x = 1 := rfl"})
+        third = tool.invoke({"code": "import Aesop\n\ndef y := 2"})
+    finally:
+        tool.reset_session()
+
+    assert not first.startswith("ERROR")
+    assert not second.startswith("ERROR")
+    # Otros imports no se pueden agregar a un entorno existente: arrancan uno nuevo.
+    assert not third.startswith("ERROR")
@@ -1,42 +1,92 @@
 ﻿import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
+import pytest
+
+from langchain_lean.core.search_client import LoogleClient
 from langchain_lean.tools.search_tool import LeanSearchTool
 
 
-class _FakeResponse:
-    def __init__(self, payload: str):
-        self._payload = payload.encode("utf-8")
+class _LoogleHandler(BaseHTTPRequestHandler):
+    """Sustituto local de Loogle: responde con un hit por consulta y cuenta conexiones."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
 
-    def read(self):
-        return self._payload
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)["q"][0]
+        self.server.requests.append(query)
+        body = json.dumps(
+            {
+                "hits": [
+                    {"name": query, "type": "(n m k : Nat) : _", "doc": "assoc"},
+                    {"name": f"{query}'", "type": "(n m : Nat) : _", "doc": "comm"},
+                ]
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-    def __enter__(self):
-        return self
+    def log_message(self, format, *args):
+        pass
 
-    def __exit__(self, exc_type, exc, tb):
-        return False
 
+@pytest.fixture
+def loogle_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LoogleHandler)
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
 
-def test_search_tool_with_mocked_loogle(monkeypatch):
-    payload = json.dumps(
-        {
-            "hits": [
-                {"name": "Nat.add_assoc", "type": "(n m k : Nat) : _", "doc": "assoc"},
-                {"name": "Nat.add_comm", "type": "(n m : Nat) : _", "doc": "comm"},
-            ]
-        }
-    )
 
-    def _fake_urlopen(url, timeout=12):
-        assert "loogle.lean-lang.org/json" in url
-        return _FakeResponse(payload)
+def _client(server, **kwargs):
+    return LoogleClient(base_url=f"http://127.0.0.1:{server.server_port}", **kwargs)
 
-    monkeypatch.setattr("langchain_lean.tools.search_tool.urlopen", _fake_urlopen)
 
-    tool = LeanSearchTool()
+def test_search_tool_with_local_loogle(loogle_server):
+    tool = LeanSearchTool(client=_client(loogle_server))
     raw = tool.invoke({"query": "Nat.add_assoc", "limit": 1})
     result = json.loads(raw)
 
     assert result["query"] == "Nat.add_assoc"
     assert result["count"] == 1
     assert result["results"][0]["name"] == "Nat.add_assoc"
+
+
+def test_client_reuses_connection_and_caches(loogle_server, tmp_path):
+    client = _client(loogle_server, cache_dir=str(tmp_path))
+
+    client.fetch("Nat.add_comm")
+    client.fetch("Nat.add_comm")
+    client.fetch("Nat.mul_comm")
+
+    assert loogle_server.requests == ["Nat.add_comm", "Nat.mul_comm"]
+    assert loogle_server.connections == 1
+
+    # Un cliente nuevo lee la respuesta del tier en disco.
+    fresh = _client(loogle_server, cache_dir=str(tmp_path))
+    assert fresh.fetch("Nat.add_comm")["hits"][0]["name"] == "Nat.add_comm"
+    assert len(loogle_server.requests) == 2
+
+
+def test_search_many_fans_out_and_keeps_order(loogle_server):
+    tool = LeanSearchTool(client=_client(loogle_server, max_connections=3))
+    queries = [f"Nat.lemma_{idx}" for idx in range(6)]
+
+    results = [json.loads(raw) for raw in tool.batch([{"query": query, "limit": 1} for query in queries])]
+
+    assert [result["results"][0]["name"] for result in results] == queries
+    assert sorted(loogle_server.requests) == sorted(queries)
+    assert loogle_server.connections <= 3
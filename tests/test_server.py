@@ -0,0 +1,232 @@
+﻿import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.handles import CANCELLED_MESSAGE, ExecutionHandle
+from langchain_lean.core.metrics import PrometheusMetrics
+from langchain_lean.core.pool import LeanContainerPool
+from langchain_lean.core.remote import RemoteLeanEvaluator
+from langchain_lean.core.server import LeanEvaluationServer
+from langchain_lean.tools.repl_tool import LeanREPLTool
+from langchain_lean.tools.run_tool import LeanRunTool
+from langchain_lean.tools.state_tool import LeanStateTool
+
+
+class _BlockingEnvManager:
+    """Devuelve un error si el código contiene `broken`; puede bloquearse con `gate`."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def get_runtime_image_id(self):
+        return "sha256:image"
+
+    def read_lake_manifest(self):
+        return ""
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        self.gate.wait(5)
+        if "BEGIN" in command:
+            paths = command.split("for f in ", 1)[1].split("; do", 1)[0].split()
+            return 0, "".join(f"<<<LANGCHAIN_LEAN_BEGIN {p}\n<<<LANGCHAIN_LEAN_END {p} 0\n" for p in paths)
+        return 0, ""
+
+
+def _server(tmp_path, **kwargs):
+    manager = _BlockingEnvManager(tmp_path)
+    evaluator = LeanEvaluator(environment_manager=manager, use_cache=True)
+    server = LeanEvaluationServer(evaluator, port=0, **kwargs).start()
+    return manager, server
+
+
+def test_remote_evaluator_round_trip(tmp_path):
+    _, server = _server(tmp_path, metrics=PrometheusMetrics())
+    client = RemoteLeanEvaluator(server.url)
+    try:
+        result = client.evaluate_code("theorem t : True := trivial", source="lean_run")
+        assert result.success is True and result.proof_complete is True
+
+        many = client.evaluate_many(["theorem a : True := trivial", "theorem b : True := trivial"])
+        assert [item.success for item in many] == [True, True]
+
+        stats = client.stats()
+        assert stats["completed"] == 2
+        assert stats["queue_depth"] == 0
+        assert "hits" in stats["cache"]
+
+        assert 'source="lean_run"' in client.metrics_text()
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_server_reports_queue_depth(tmp_path):
+    manager, server = _server(tmp_path, max_concurrency=1)
+    client = RemoteLeanEvaluator(server.url)
+    manager.gate.clear()
+    try:
+        threads = [
+            threading.Thread(target=client.evaluate_code, args=(f"theorem t{idx} : True := trivial",))
+            for idx in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for _ in range(100):
+            stats = client.stats()
+            if stats["running"] == 1 and stats["queue_depth"] == 2:
+                break
+            threading.Event().wait(0.02)
+        assert (stats["running"], stats["queue_depth"]) == (1, 2)
+    finally:
+        manager.gate.set()
+        for thread in threads:
+            thread.join(5)
+        client.close()
+        server.shutdown()
+
+
+def test_remote_evaluator_reports_unreachable_server():
+    client = RemoteLeanEvaluator("http://127.0.0.1:9", timeout=2)
+
+    result = client.evaluate_code("theorem t : True := trivial")
+
+    assert result.success is False
+    assert result.errors[0].startswith("Error del servidor de evaluación:")
+
+
+class _FakePoolClient:
+    """Cliente Docker mínimo: cada contenedor responde `ok` a cualquier `exec`."""
+
+    def __init__(self):
+        self.containers = self
+
+    def run(self, image, **kwargs):
+        return SimpleNamespace(
+            status="running",
+            exec_run=lambda cmd, workdir=None: SimpleNamespace(exit_code=0, output=b"ok\n"),
+            reload=lambda: None,
+            remove=lambda force=False: None,
+        )
+
+
+def test_stats_reports_pool_workers(tmp_path):
+    manager, server = _server(tmp_path)
+    manager._pool = LeanContainerPool(_FakePoolClient(), image="img", volumes={}, size=2)
+    manager._pool.run("lean check.lean")
+    client = RemoteLeanEvaluator(server.url)
+    try:
+        assert client.stats()["pool_workers"] == 1
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_stats_failure_returns_json_500(tmp_path):
+    _, server = _server(tmp_path)
+
+    def _broken_stats():
+        raise RuntimeError("caché rota")
+
+    server.evaluator.cache_stats = _broken_stats
+    client = RemoteLeanEvaluator(server.url)
+    try:
+        with pytest.raises(RuntimeError, match="HTTP 500.*caché rota"):
+            client.stats()
+        assert client.evaluate_code("theorem t : True := trivial").success is True
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_remote_evaluator_checks_declarations(tmp_path):
+    _, server = _server(tmp_path)
+    client = RemoteLeanEvaluator(server.url)
+    code = "theorem a : True := trivial\n\ntheorem b : True := a\n"
+    try:
+        declarations = client.evaluate_declarations(code)
+        assert [(item.name, item.line, item.result.success) for item in declarations] == [("a", 1, True), ("b", 3, True)]
+
+        tool = LeanRunTool(evaluator=client, per_declaration=True)
+        payload = json.loads(tool.invoke({"code": code}))
+        assert [item["name"] for item in payload["declarations"]] == ["a", "b"]
+        payload = json.loads(asyncio.run(tool.ainvoke({"code": code})))
+        assert payload["success"] is True
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_remote_declarations_report_unreachable_server():
+    client = RemoteLeanEvaluator("http://127.0.0.1:9", timeout=2)
+
+    declarations = client.evaluate_declarations("theorem a : True := trivial")
+
+    assert [item.kind for item in declarations] == ["file"]
+    assert declarations[0].result.errors[0].startswith("Error del servidor de evaluación:")
+
+
+class _CancellableEnvManager(_BlockingEnvManager):
+    """Bloqueado en `gate` hasta que se cancele el handle de la ejecución."""
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        if handle is not None:
+            handle.attach(self.gate.set)
+        self.gate.wait(5)
+        if handle is not None and handle.cancelled:
+            return -1, CANCELLED_MESSAGE
+        return 0, ""
+
+
+def test_cancelling_remote_handle_cancels_server_evaluation(tmp_path):
+    manager = _CancellableEnvManager(tmp_path)
+    manager.gate.clear()
+    server = LeanEvaluationServer(LeanEvaluator(environment_manager=manager), port=0).start()
+    client = RemoteLeanEvaluator(server.url)
+    handle = ExecutionHandle()
+    results = []
+    try:
+        thread = threading.Thread(
+            target=lambda: results.append(client.evaluate_code("theorem t : True := trivial", handle=handle))
+        )
+        thread.start()
+        for _ in range(100):
+            if client.stats()["running"] == 1:
+                break
+            threading.Event().wait(0.02)
+
+        handle.cancel()
+        thread.join(2)
+
+        assert not thread.is_alive()
+        assert results[0].success is False
+        assert server._handles == {}
+    finally:
+        manager.gate.set()
+        client.close()
+        server.shutdown()
+
+
+def test_session_modes_with_remote_evaluator(tmp_path):
+    _, server = _server(tmp_path)
+    client = RemoteLeanEvaluator(server.url)
+    try:
+        # Sin sesión REPL local, el modo incremental evalúa el archivo completo en el servidor.
+        payload = json.loads(LeanStateTool(evaluator=client, incremental=True).run("theorem t : True := trivial"))
+        assert payload["success"] is True
+
+        with pytest.raises(ValueError, match="stateful"):
+            LeanREPLTool(evaluator=client, stateful=True)
+        assert LeanREPLTool(evaluator=client).run("theorem t : True := trivial").startswith("EXITO")
+    finally:
+        client.close()
+        server.shutdown()
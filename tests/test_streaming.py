@@ -0,0 +1,93 @@
+﻿import os
+import time
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.parser import IncrementalLeanParser, parse_lean_output
+from langchain_lean.core.streaming import OutputCapture, prune_spill_dir
+
+_RAW = (
+    "check.lean:4:16: error: unexpected end of input\n"
+    "check.lean:4:14: error: unsolved goals\n"
+    "case succ\n"
+    "n : Nat\n"
+    "ih : n + 0 = n\n"
+    "⊢ n + 1 + 0 = n + 1\n"
+    "check.lean:9:0: warning: declaration uses 'sorry'\n"
+)
+
+
+def test_incremental_parser_matches_batch_parser_on_any_chunking():
+    expected = parse_lean_output(_RAW, 1)
+    for size in (1, 7, 64):
+        parser = IncrementalLeanParser()
+        for start in range(0, len(_RAW), size):
+            parser.feed(_RAW[start : start + size])
+        assert parser.finish(1, raw_output=_RAW) == expected
+
+
+def test_output_capture_spills_excess_to_disk(tmp_path):
+    capture = OutputCapture(max_bytes=10, spill_dir=str(tmp_path))
+    capture.write(b"0123456789abcdef")
+
+    text = capture.getvalue()
+
+    assert text.startswith("0123456789\n[langchain-lean] Salida truncada: 6 bytes")
+    with open(capture.spill_path, "rb") as file:
+        assert file.read() == b"abcdef"
+
+
+
+def test_spill_dir_is_pruned_by_age_and_size(tmp_path):
+    now = time.time()
+    for idx, age in enumerate((30 * 24 * 3600, 300, 200, 100)):
+        path = tmp_path / f"lean_output_{idx}.log"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+    (tmp_path / "other.txt").write_bytes(b"x" * 1000)
+
+    prune_spill_dir(str(tmp_path), max_bytes=250, max_age=24 * 3600)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["lean_output_2.log", "lean_output_3.log", "other.txt"]
+
+
+def test_output_capture_prunes_previous_spills(tmp_path):
+    for _ in range(5):
+        capture = OutputCapture(max_bytes=10, spill_dir=str(tmp_path), spill_max_bytes=100)
+        capture.write(b"0123456789" + b"y" * 60)
+        capture.getvalue()
+
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 120
+    assert os.path.exists(capture.spill_path)
+
+class _StreamingEnvManager:
+    """Emite una línea por fragmento y se detiene si el consumidor lo pide."""
+
+    def __init__(self, workspace, lines):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.lines = lines
+        self.emitted = 0
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None, on_output=None, max_output_bytes=None):
+        output = ""
+        for line in self.lines:
+            self.emitted += 1
+            output += line
+            if on_output is not None and not on_output(line):
+                return 1, output
+        return 1, output
+
+
+def test_fail_fast_stops_after_first_error(tmp_path):
+    lines = ["check.lean:1:0: error: first\n"] + [f"check.lean:{i}:0: error: later\n" for i in range(2, 50)]
+    manager = _StreamingEnvManager(tmp_path, lines)
+    evaluator = LeanEvaluator(environment_manager=manager)
+
+    result = evaluator.evaluate_code("theorem broken : False := by simp", fail_fast=True)
+
+    assert manager.emitted == 1
+    assert result.success is False
+    assert result.errors == ["first"]
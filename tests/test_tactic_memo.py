@@ -0,0 +1,182 @@
+﻿import sys
+import textwrap
+
+from langchain_lean.core.checkpoints import IncrementalProofChecker
+from langchain_lean.core.goals import canonicalize_goals
+from langchain_lean.core.parser import LeanGoal, ParsedLeanOutput
+from langchain_lean.core.repl_session import LeanREPLSession
+from langchain_lean.core.tactic_memo import TacticOutcomeMemo
+from langchain_lean.tools.repl_tool import LeanREPLTool
+
+# REPL falso: la meta inicial es siempre la misma y la táctica `fail` falla.
+_FAKE_REPL = textwrap.dedent(
+    """
+    import json, sys
+
+    state = 0
+    buffer = ""
+    for line in sys.stdin:
+        if line.strip():
+            buffer += line
+            continue
+        if not buffer:
+            continue
+        request = json.loads(buffer)
+        buffer = ""
+        state += 1
+        if "cmd" in request:
+            response = {"env": state, "sorries": [{"goal": "n : Nat\\n⊢ n + 0 = n", "proofState": state}]}
+        elif request["tactic"] == "fail":
+            response = {"message": "Lean error: tactic failed"}
+        elif request["tactic"] == "slow":
+            response = {"message": "Lean error: (deterministic) timeout, maximum number of heartbeats (200000) reached"}
+        else:
+            response = {"proofState": state, "goals": ["n : Nat\\n⊢ after " + request["tactic"]]}
+        print(json.dumps(response))
+        print()
+        sys.stdout.flush()
+    """
+)
+
+
+def _goal(context, goal):
+    return LeanGoal(context=context, goal=goal)
+
+
+def test_canonical_fingerprint_ignores_names_order_and_whitespace():
+    first = canonicalize_goals([_goal(["a b : Nat", "h : a < b"], "∀ x, x + a < x + b")])
+    second = canonicalize_goals([_goal(["h₁ : n  <  m", "n m : Nat"], "∀ y,   y + n < y + m")])
+    different = canonicalize_goals([_goal(["a b : Nat", "h : a < b"], "∀ x, x + b < x + a")])
+
+    assert first.fingerprint == second.fingerprint
+    assert first.fingerprint != different.fingerprint
+    assert second.renaming["h₁"] == first.renaming["h"]
+
+
+def test_memo_translates_tactic_and_outcome_between_renamed_goals(tmp_path):
+    memo = TacticOutcomeMemo(str(tmp_path / "memo.sqlite"))
+    outcome = ParsedLeanOutput(
+        success=True,
+        proof_complete=False,
+        goals=[_goal(["a b : Nat", "h : a < b"], "a ≤ b")],
+    )
+    memo.record([_goal(["a b : Nat", "h : a < b"], "a < b + 1")], "apply Nat.lt_succ_of_lt h", outcome)
+
+    hit = memo.lookup([_goal(["p q : Nat", "hpq : p < q"], "p < q + 1")], "apply Nat.lt_succ_of_lt hpq")
+
+    assert hit is not None
+    assert hit.goals[0].goal == "p ≤ q"
+    assert hit.goals[0].context == ["p q : Nat", "hpq : p < q"]
+    assert memo.lookup([_goal(["p q : Nat", "hpq : p < q"], "p < q + 1")], "omega") is None
+    memo.close()
+
+    reopened = TacticOutcomeMemo(str(tmp_path / "memo.sqlite"))
+    assert reopened.lookup([_goal(["x y : Nat", "h : x < y"], "x < y + 1")], "apply Nat.lt_succ_of_lt h")
+    assert reopened.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+
+def test_memo_evicts_least_recently_used():
+    memo = TacticOutcomeMemo(max_entries=2)
+    failure = ParsedLeanOutput(success=False, proof_complete=False, errors=["tactic failed"])
+    goals = [_goal(["n : Nat"], "n = n")]
+    for tactic in ("simp", "omega", "decide"):
+        memo.record(goals, tactic, failure)
+        if tactic == "omega":
+            memo.lookup(goals, "simp")
+
+    assert len(memo) == 2
+    assert memo.lookup(goals, "simp") is not None
+    assert memo.lookup(goals, "omega") is None
+
+
+def test_checker_skips_lean_for_memoized_failures_across_sessions():
+    memo = TacticOutcomeMemo()
+    statement = "theorem t (n : Nat) : n + 0 = n := by\n"
+
+    with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+        checker = IncrementalProofChecker(session, memo=memo)
+        assert checker.check(statement + "  fail\n").success is False
+        assert checker.tactics_run == 1
+
+    with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+        checker = IncrementalProofChecker(session, memo=memo)
+        failed = checker.check(statement + "  fail\n")
+        assert checker.tactics_run == 0
+        extended = checker.check(statement + "  a\n  fail\n")
+
+    assert failed.success is False
+    assert failed.errors == ["Lean error: tactic failed"]
+    assert failed.goals[0].goal == "n + 0 = n"
+    # Tras `a` las metas son otras: la táctica `fail` sí se ejecuta.
+    assert extended.success is False
+    assert checker.tactics_run == 2
+
+
+def test_checker_memo_is_scoped_by_local_preamble():
+    memo = TacticOutcomeMemo()
+    statement = "theorem t (n : Nat) : n + 0 = n := by\n"
+
+    with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+        checker = IncrementalProofChecker(session, memo=memo)
+        checker.check("def helper := 1\n\n" + statement + "  fail\n")
+        checker.check("open Nat\n\n" + statement + "  fail\n")
+        checker.check(statement + "  fail\n")
+        assert checker.tactics_run == 3
+        # El mismo preámbulo sí reutiliza el resultado.
+        checker.check("def helper := 1\n\n" + statement + "  fail\n")
+        assert checker.tactics_run == 3
+
+
+def test_checker_does_not_memoize_resource_timeouts():
+    memo = TacticOutcomeMemo()
+    statement = "theorem t (n : Nat) : n + 0 = n := by\n"
+
+    for _ in range(2):
+        with LeanREPLSession([sys.executable, "-c", _FAKE_REPL], timeout=10) as session:
+            checker = IncrementalProofChecker(session, memo=memo)
+            assert checker.check(statement + "  slow\n").success is False
+            assert checker.tactics_run == 1
+
+    assert len(memo) == 0
+
+
+class _FakeREPLEnvManager:
+    def __init__(self, workspace):
+        self.workspace_path = str(workspace)
+
+    def repl_command(self):
+        return [sys.executable, "-c", _FAKE_REPL]
+
+
+class _FakeEvaluator:
+    def __init__(self, workspace):
+        self.env_manager = _FakeREPLEnvManager(workspace)
+
+
+def test_repl_tool_consults_memo_before_launching_lean(tmp_path):
+    memo = TacticOutcomeMemo()
+    code = "theorem t (n : Nat) : n + 0 = n := by\n  fail\n"
+
+    first = LeanREPLTool(evaluator=_FakeEvaluator(tmp_path), tactic_memo=memo)
+    second = LeanREPLTool(evaluator=_FakeEvaluator(tmp_path), tactic_memo=memo)
+
+    assert first.run(code) == "ERROR LEAN:\nLean error: tactic failed"
+    assert second.run(code) == "ERROR LEAN:\nLean error: tactic failed"
+    assert first._state_tool._checker.tactics_run == 1
+    assert second._state_tool._checker.tactics_run == 0
+    for tool in (first, second):
+        tool._state_tool._checker.session.close()
+
+def test_memo_lookup_does_not_leave_a_write_transaction_open(tmp_path):
+    path = str(tmp_path / "memo.sqlite")
+    goals = [_goal(["n : Nat"], "n = n")]
+    failure = ParsedLeanOutput(success=False, proof_complete=False, errors=["tactic failed"])
+    reader = TacticOutcomeMemo(path)
+    reader.record(goals, "simp", failure)
+
+    assert reader.lookup(goals, "simp") is not None
+    writer = TacticOutcomeMemo(path)
+    writer._conn.execute("PRAGMA busy_timeout = 100")
+    writer.record(goals, "omega", failure)
+
+    assert len(reader) == 2
@@ -0,0 +1,81 @@
+﻿import re
+
+from langchain_lean.core.evaluator import LeanEvaluator
+from langchain_lean.core.tiers import DEFAULT_TIERS, EvaluationTier
+
+_HEARTBEATS = (
+    "check.lean:2:2: error: (deterministic) timeout at `whnf`, maximum number of heartbeats (50000) "
+    "has been reached\n"
+)
+
+
+class _BudgetEnvManager:
+    """Falla por heartbeats si el presupuesto es menor que `needed`."""
+
+    def __init__(self, workspace, needed):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+        self.needed = needed
+        self.calls = []
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        budgets = [int(value) for value in re.findall(r"-DmaxHeartbeats=(\d+)", command)]
+        self.calls.append((budgets[0], timeout))
+        if "BEGIN" in command:
+            paths = re.search(r"for f in (.+?); do", command).group(1).split()
+            return 0, "".join(self._batch_section(path, budgets[0]) for path in paths)
+        if budgets[0] < self.needed:
+            return 1, _HEARTBEATS
+        return 0, ""
+
+    def _batch_section(self, path, budget):
+        slow = "slow" in open(f"{self.workspace}/{path}", encoding="utf-8").read()
+        body, code = (_HEARTBEATS, 1) if slow and budget < self.needed else ("", 0)
+        return f"<<<LANGCHAIN_LEAN_BEGIN {path}\n{body}<<<LANGCHAIN_LEAN_END {path} {code}\n"
+
+
+def test_fast_tier_is_enough_for_cheap_snippets(tmp_path):
+    manager = _BudgetEnvManager(tmp_path, needed=10_000)
+    evaluator = LeanEvaluator(environment_manager=manager, tiers=DEFAULT_TIERS)
+
+    result = evaluator.evaluate_code("theorem t : True := trivial")
+
+    assert result.success is True
+    assert result.tier == "fast"
+    assert manager.calls == [(50_000, 20)]
+
+
+def test_escalates_only_on_resource_timeout(tmp_path):
+    manager = _BudgetEnvManager(tmp_path, needed=300_000)
+    evaluator = LeanEvaluator(environment_manager=manager, tiers=DEFAULT_TIERS)
+
+    result = evaluator.evaluate_code("theorem t : True := by decide")
+
+    assert result.success is True
+    assert result.tier == "full"
+    assert manager.calls == [(50_000, 20), (400_000, 240)]
+
+
+def test_last_tier_failure_is_reported(tmp_path):
+    manager = _BudgetEnvManager(tmp_path, needed=10**9)
+    tiers = [EvaluationTier("tiny", 1_000, 5), EvaluationTier("small", 2_000, 10)]
+    evaluator = LeanEvaluator(environment_manager=manager, tiers=tiers)
+
+    result = evaluator.evaluate_code("theorem t : True := by decide")
+
+    assert result.success is False
+    assert result.tier == "small"
+    assert "maximum number of heartbeats" in result.errors[0]
+
+
+def test_batch_escalates_only_slow_snippets(tmp_path):
+    manager = _BudgetEnvManager(tmp_path, needed=300_000)
+    evaluator = LeanEvaluator(environment_manager=manager, tiers=DEFAULT_TIERS)
+
+    results = evaluator.evaluate_many(["theorem a : True := trivial", "theorem slow : True := by decide"])
+
+    assert [(result.success, result.tier) for result in results] == [(True, "fast"), (True, "full")]
+    assert manager.calls[1:] == [(400_000, 240)]
@@ -2,17 +2,50 @@
 
 
 class _DummyTool:
-    pass
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
 
 
-def test_toolkit_returns_expected_tools(monkeypatch):
+class _DummyEnvManager:
+    instances = 0
+
+    def __init__(self):
+        _DummyEnvManager.instances += 1
+
+    def provision_environment(self):
+        pass
+
+
+class _DummyEvaluator:
+    def __init__(self, environment_manager):
+        self.env_manager = environment_manager
+
+
+def _patch_toolkit(monkeypatch):
     monkeypatch.setattr("langchain_lean.toolkit.LeanRunTool", _DummyTool)
     monkeypatch.setattr("langchain_lean.toolkit.LeanStateTool", _DummyTool)
     monkeypatch.setattr("langchain_lean.toolkit.LeanSearchTool", _DummyTool)
     monkeypatch.setattr("langchain_lean.toolkit.LeanREPLTool", _DummyTool)
+    monkeypatch.setattr("langchain_lean.core.environment.LeanEnvironmentManager", _DummyEnvManager)
+    monkeypatch.setattr("langchain_lean.toolkit.LeanEvaluator", _DummyEvaluator)
+    _DummyEnvManager.instances = 0
+
+
+def test_toolkit_returns_expected_tools(monkeypatch):
+    _patch_toolkit(monkeypatch)
 
     toolkit = LeanToolkit(include_run=True, include_state=True, include_search=True, include_repl=False)
     tools = toolkit.get_tools()
 
     assert len(tools) == 3
     assert all(isinstance(tool, _DummyTool) for tool in tools)
+
+
+def test_toolkit_shares_one_evaluator(monkeypatch):
+    _patch_toolkit(monkeypatch)
+
+    tools = LeanToolkit(include_run=True, include_state=True, include_search=False, include_repl=True).get_tools()
+
+    evaluators = {id(tool.kwargs["evaluator"]) for tool in tools}
+    assert len(evaluators) == 1
+    assert _DummyEnvManager.instances == 1
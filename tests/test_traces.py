@@ -0,0 +1,133 @@
+﻿import json
+import time
+
+from langchain_lean.core.evaluator import LeanEvaluator, LeanExecutionResult
+from langchain_lean.core.traces import TraceRecorder, TraceReplayer, load_trace, seed_trace
+from langchain_lean.tools.search_tool import LeanSearchTool
+
+
+class _QuietEnvManager:
+    """Lean falso que termina sin salida (todo compila)."""
+
+    def __init__(self, workspace):
+        self.workspace = str(workspace)
+        self.cache_path = str(workspace)
+
+    def get_workspace_abs_path(self):
+        return self.workspace
+
+    def run_command_in_container(self, command, timeout=180, handle=None):
+        return 0, ""
+
+
+class _FakeEvaluator:
+    """Falla el código que contiene "broken"; cuenta llamadas simultáneas."""
+
+    def __init__(self):
+        self.calls = []
+
+    def evaluate_code(self, lean_code, source="evaluate_code", **kwargs):
+        self.calls.append((time.monotonic(), source))
+        if "broken" in lean_code:
+            return LeanExecutionResult(success=False, errors=["unknown identifier 'broken'"])
+        return LeanExecutionResult(success=True, proof_complete=True)
+
+    def evaluate_many(self, codes, source="evaluate_many", **kwargs):
+        return [self.evaluate_code(code, source=source) for code in codes]
+
+
+def test_recorder_writes_one_line_per_call(tmp_path):
+    path = tmp_path / "traces" / "trace.jsonl"
+    recorder = TraceRecorder(str(path))
+    evaluator = LeanEvaluator(environment_manager=_QuietEnvManager(tmp_path), metrics_hooks=[recorder])
+
+    evaluator.evaluate_code("theorem t : True := trivial", source="lean_run")
+    evaluator.evaluate_many(["theorem a : True := trivial", "theorem b : True := trivial"])
+    recorder.close()
+
+    first, second = load_trace(str(path))
+    assert first["kind"] == "evaluate"
+    assert first["source"] == "lean_run"
+    assert first["code"] == "theorem t : True := trivial"
+    assert len(first["sha"]) == 64
+    assert first["outcome"] == {"success": True, "proof_complete": True, "has_sorry": False, "errors": 0, "goals": 0}
+    assert first["latency"] >= 0 and first["ts"] <= time.time()
+    assert second["kind"] == "evaluate_many"
+    assert [item["code"] for item in second["items"]] == ["theorem a : True := trivial", "theorem b : True := trivial"]
+
+
+def test_hash_only_traces_are_skipped_on_replay(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    recorder = TraceRecorder(str(path), include_code=False)
+    LeanEvaluator(environment_manager=_QuietEnvManager(tmp_path), metrics_hooks=[recorder]).evaluate_code("x")
+    recorder.close()
+
+    records = load_trace(str(path))
+    report = TraceReplayer(_FakeEvaluator(), speed=0).replay(records)
+
+    assert "code" not in records[0]
+    assert (report.total, report.replayed, report.skipped) == (1, 0, 1)
+
+
+def test_replay_reports_latency_and_outcome_diffs():
+    records = [
+        {"kind": "evaluate", "ts": 100.0, "latency": 2.0, "source": "lean_run", "code": "ok",
+         "outcome": {"success": True, "proof_complete": True, "has_sorry": False, "errors": 0, "goals": 0}},
+        {"kind": "evaluate", "ts": 100.5, "latency": 1.0, "source": "lean_state", "code": "broken",
+         "outcome": {"success": True, "proof_complete": True, "has_sorry": False, "errors": 0, "goals": 0}},
+        {"kind": "evaluate_many", "ts": 101.0, "latency": 3.0, "source": "evaluate_many",
+         "items": [{"code": "ok"}, {"code": "broken", "outcome": {"success": False, "errors": 1}}]},
+    ]
+    evaluator = _FakeEvaluator()
+
+    report = TraceReplayer(evaluator, speed=0, concurrency=2).replay(records)
+
+    assert (report.total, report.replayed, report.skipped, report.failed) == (3, 3, 0, 0)
+    assert report.latency["count"] == 3
+    assert report.recorded_latency["max_s"] == 3.0
+    assert report.throughput > 0
+    assert [(diff["index"], diff["source"]) for diff in report.diffs] == [(1, "lean_state")]
+    assert report.diffs[0]["replayed"]["errors"] == 1
+
+
+def test_replay_speed_compresses_original_spacing():
+    records = [{"kind": "evaluate", "ts": ts, "code": "ok"} for ts in (0.0, 1.0, 2.0)]
+
+    evaluator = _FakeEvaluator()
+    report = TraceReplayer(evaluator, speed=10).replay(records)
+
+    starts = [started for started, _ in evaluator.calls]
+    assert report.replayed == 3
+    assert 0.15 <= starts[-1] - starts[0] < 1.0
+
+
+def test_search_calls_are_recorded_and_replayed(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    recorder = TraceRecorder(str(path))
+    tool = LeanSearchTool(backend="local", index_path=str(tmp_path / "index.sqlite"), trace=recorder)
+
+    tool.invoke({"query": "Nat.add_comm", "limit": 3})
+    recorder.close()
+
+    records = load_trace(str(path))
+    assert records[0]["kind"] == "search"
+    assert (records[0]["query"], records[0]["limit"], records[0]["backend"]) == ("Nat.add_comm", 3, "local")
+    assert records[0]["outcome"] == {"count": 0, "error": True}
+
+    report = TraceReplayer(search_tool=tool, speed=0).replay(records)
+    assert (report.replayed, report.diffs) == (1, [])
+
+
+def test_seed_trace_collects_snippets_from_examples_and_documents(tmp_path):
+    example = tmp_path / "example.py"
+    example.write_text('CODE = """\ntheorem demo : 1 = 1 := by\n  rfl\n"""\nOTHER = "no es Lean"\n')
+    notes = tmp_path / "notes.jsonl"
+    notes.write_text(json.dumps({"body": "Ver:\n```lean\nexample : True := trivial\n```"}) + "\n")
+
+    records = seed_trace([str(example), str(notes)])
+
+    assert [record["code"] for record in records] == [
+        "theorem demo : 1 = 1 := by\n  rfl\n",
+        "example : True := trivial\n",
+    ]
+    assert records[0]["source"] == "seed:example.py"